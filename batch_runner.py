@@ -0,0 +1,263 @@
+"""Headless batch scoring of KYC document pairs.
+
+Reads a CSV, Parquet or JSONL file of document pairs, scores it in chunks across a
+process pool with KYCMatcher.compare_batch and writes the score columns in input order.
+
+CSV and Parquet inputs hold one pair per row with the fields suffixed by document,
+e.g. Name_a, Address_a, DOB_a, Gender_a, Name_b, ... JSONL lines may use the same flat
+keys or nest the documents as {"doc_a": {...}, "doc_b": {...}} like the sample cases.
+An optional id column is copied to the output. A pair that cannot be scored gets empty
+scores and the exception in the error column instead of stopping the run.
+
+    python batch_runner.py pairs.csv scores.csv --workers 32 --chunk-size 20000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from kyc_matcher import KYCMatcher
+
+FIELDS = ('Name', 'Address', 'DOB', 'Gender')
+SCORE_COLUMNS = ('name_similarity', 'address_similarity', 'dob_similarity', 'gender_match',
+                 'overall_confidence', 'match_category')
+FORMATS = ('csv', 'jsonl', 'parquet')
+
+# Matcher owned by this process; pool workers build theirs once in _init_worker
+_matcher = None
+
+
+def detect_format(path):
+    """Infer csv/jsonl/parquet from a file extension"""
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('json', 'ndjson'):
+        extension = 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f"Cannot infer format of {path!r}; expected one of {', '.join(FORMATS)}")
+    return extension
+
+
+def _flatten_record(record):
+    """Turn a nested {"doc_a": ..., "doc_b": ...} JSONL record into flat suffixed keys"""
+    if 'doc_a' not in record and 'doc_b' not in record:
+        return record
+    flat = {key: value for key, value in record.items() if key not in ('doc_a', 'doc_b')}
+    for suffix in ('a', 'b'):
+        for field, value in (record.get('doc_' + suffix) or {}).items():
+            flat[f'{field}_{suffix}'] = value
+    return flat
+
+
+def iter_jsonl_records(path):
+    """Yield flat pair records from a JSONL file, one line at a time"""
+    with open(path) as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield _flatten_record(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path}:{line_number}: invalid JSON ({e})") from None
+
+
+def read_pair_chunks(path, chunk_size, fmt=None):
+    """Yield DataFrames of at most chunk_size pairs with flat Field_a/Field_b columns"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+    elif fmt == 'parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        batch = []
+        for record in iter_jsonl_records(path):
+            batch.append(record)
+            if len(batch) == chunk_size:
+                yield pd.DataFrame(batch)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch)
+
+
+def split_pairs(frame):
+    """Split a flat pair frame into the two column mappings compare_batch expects"""
+    docs_a = {field: frame[field + '_a'] for field in FIELDS if field + '_a' in frame}
+    docs_b = {field: frame[field + '_b'] for field in FIELDS if field + '_b' in frame}
+    if not docs_a or not docs_b:
+        raise ValueError("Input needs at least one of Name/Address/DOB/Gender with _a and _b suffixes")
+    return docs_a, docs_b
+
+
+def _init_worker(cache_size):
+    global _matcher
+    _matcher = KYCMatcher(cache_size=cache_size)
+
+
+def _row_documents(docs, size):
+    """The rows of a column mapping as compare_documents dicts, with missing values as ''"""
+    columns = {field: ['' if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v) for v in values]
+               for field, values in docs.items()}
+    return [{field: values[i] for field, values in columns.items()} for i in range(size)]
+
+
+def score_rows(docs_a, docs_b, size):
+    """Score a chunk one pair at a time; a pair that raises gets None scores and its error"""
+    rows = []
+    failed = False
+    for doc_a, doc_b in zip(_row_documents(docs_a, size), _row_documents(docs_b, size)):
+        try:
+            result = _matcher.compare_documents(doc_a, doc_b)
+        except Exception as e:
+            rows.append(dict(dict.fromkeys(SCORE_COLUMNS), error=f"{type(e).__name__}: {e}"))
+            failed = True
+            continue
+        rows.append(dict(result['detailed_scores'], overall_confidence=result['overall_confidence'],
+                         match_category=result['match_category'], error=''))
+    # Object columns keep the scores integers next to the None of the failed rows
+    scores = pd.DataFrame(rows, columns=SCORE_COLUMNS + ('error',), dtype=object)
+    return scores if failed else scores.infer_objects()
+
+
+def score_chunk(frame, id_column='id'):
+    """Score one chunk of pairs with this process's matcher.
+
+    The output ends with an error column, empty for scored pairs. If compare_batch fails,
+    the chunk is scored again pair by pair so only the failing pairs lose their scores.
+    """
+    if _matcher is None:
+        _init_worker(65536)
+    docs_a, docs_b = split_pairs(frame)
+    try:
+        scores = _matcher.compare_batch(docs_a, docs_b)
+        scores['error'] = ''
+    except Exception:
+        scores = score_rows(docs_a, docs_b, len(frame))
+    if id_column and id_column in frame:
+        scores.insert(0, id_column, list(frame[id_column]))
+    return scores
+
+
+class ResultWriter:
+    """Append score frames to a CSV, JSONL or Parquet file in the order they are written"""
+
+    def __init__(self, path, fmt=None):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        self.rows = 0
+        self._file = None
+        self._parquet_writer = None
+        if self.fmt != 'parquet':
+            self._file = open(path, 'w', newline='')
+
+    def write(self, frame):
+        if self.fmt == 'csv':
+            frame.to_csv(self._file, header=self.rows == 0, index=False)
+        elif self.fmt == 'jsonl':
+            for record in frame.to_dict(orient='records'):
+                self._file.write(json.dumps(record) + '\n')
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pq.ParquetWriter(self.path, table.schema)
+            elif not table.schema.equals(self._parquet_writer.schema, check_metadata=False):
+                # Chunks with unscored pairs hold object columns, which Arrow types differently
+                table = table.cast(self._parquet_writer.schema)
+            self._parquet_writer.write_table(table)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        elif self._parquet_writer is not None:
+            self._parquet_writer.close()
+        else:
+            # Nothing was written; still leave a valid (empty) Parquet file behind
+            pd.DataFrame().to_parquet(self.path, index=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def score_file(input_path, output_path, workers=None, chunk_size=10000, max_pending=None,
+               input_format=None, output_format=None, id_column='id', cache_size=65536):
+    """Score every pair in input_path and write the results to output_path in input order.
+
+    With workers=1 the chunks are scored in this process; otherwise a pool of workers
+    (default: one per CPU) each build a KYCMatcher once and score chunks as they arrive.
+    At most max_pending chunks (default: twice the worker count) are in flight at a time.
+    Returns a summary dict with the row count and elapsed time.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_pending = max_pending or workers * 2
+    started = time.perf_counter()
+    chunks = read_pair_chunks(input_path, chunk_size, input_format)
+    chunk_count = 0
+
+    with ResultWriter(output_path, output_format) as writer:
+        if workers == 1:
+            _init_worker(cache_size)
+            for chunk in chunks:
+                writer.write(score_chunk(chunk, id_column))
+                chunk_count += 1
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(cache_size,)) as pool:
+                pending = deque()
+                for chunk in chunks:
+                    pending.append(pool.submit(score_chunk, chunk, id_column))
+                    if len(pending) >= max_pending:
+                        writer.write(pending.popleft().result())
+                        chunk_count += 1
+                while pending:
+                    writer.write(pending.popleft().result())
+                    chunk_count += 1
+
+    elapsed = time.perf_counter() - started
+    return {
+        'rows': writer.rows,
+        'chunks': chunk_count,
+        'workers': workers,
+        'seconds': round(elapsed, 3),
+        'pairs_per_second': round(writer.rows / elapsed, 1) if elapsed else 0.0,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Score KYC document pairs from a CSV, Parquet or JSONL file.")
+    parser.add_argument('input', help="pair file (.csv, .parquet, .jsonl)")
+    parser.add_argument('output', help="result file (.csv, .parquet, .jsonl)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="pairs per chunk (default: 10000)")
+    parser.add_argument('--max-pending', type=int, default=None,
+                        help="chunks in flight at once (default: 2 x workers)")
+    parser.add_argument('--input-format', choices=FORMATS, help="override the input format")
+    parser.add_argument('--output-format', choices=FORMATS, help="override the output format")
+    parser.add_argument('--id-column', default='id', help="column copied to the output (default: id)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.chunk_size < 1 or (args.workers is not None and args.workers < 1):
+        print("--chunk-size and --workers must be positive", file=sys.stderr)
+        return 2
+    summary = score_file(args.input, args.output, workers=args.workers, chunk_size=args.chunk_size,
+                         max_pending=args.max_pending, input_format=args.input_format,
+                         output_format=args.output_format, id_column=args.id_column)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
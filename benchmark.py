@@ -0,0 +1,220 @@
+"""Benchmark KYCMatcher.compare_documents on seeded synthetic KYC pairs.
+
+Reports overall pairs/sec, latency percentiles per field scorer and for the whole
+comparison, and peak traced memory, and writes everything to a JSON file so runs can
+be diffed over time:
+
+    python benchmark.py --pairs 20000 --seed 42 --output bench.json
+
+Import time and cold start (import, build a matcher, score a first pair) are measured in
+fresh interpreters, since process-pool spawns and serverless cold starts pay them on
+every start. With --cold-start-only the exit status says whether they fit the budgets:
+
+    python benchmark.py --cold-start-only --import-budget-ms 50 --cold-start-budget-ms 150
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+from kyc_matcher import KYCMatcher
+from synthetic import FAMILIES, KYCPairGenerator
+
+PERCENTILES = (50, 90, 99)
+
+# Libraries the core matcher should not pull in unless a code path needs them
+HEAVY_MODULES = ('streamlit', 'pandas', 'numpy', 'fuzzywuzzy', 'dateutil')
+
+# Run in a fresh interpreter: time the import and the first comparison, report what got loaded
+_COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import kyc_matcher
+imported = time.perf_counter()
+matcher = kyc_matcher.KYCMatcher()
+matcher.compare_documents(
+    {'Name': 'Rajeev Kumar Sharma', 'Address': '12 MG Rd, Bangalore 560001', 'DOB': '03/04/1985', 'Gender': 'M'},
+    {'Name': 'Rajiv Sharma', 'Address': '12 M.G. Road, Bengaluru 560001', 'DOB': '4 March 1985', 'Gender': 'M'})
+finished = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'cold_start_ms': (finished - started) * 1000,
+    'loaded': sorted(name for name in %r if name in sys.modules),
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _latency_summary(samples_ns):
+    samples = np.asarray(samples_ns, dtype=np.float64) / 1000.0
+    summary = {f'p{p}_us': round(float(np.percentile(samples, p)), 2) for p in PERCENTILES}
+    summary['mean_us'] = round(float(samples.mean()), 2)
+    summary['max_us'] = round(float(samples.max()), 2)
+    return summary
+
+
+def _field_scorers(matcher):
+    """The per-field steps of compare_documents, each as f(doc_a, doc_b)"""
+    return {
+        'name': lambda a, b: matcher.get_name_similarity(a.get('Name', ''), b.get('Name', '')),
+        'address': lambda a, b: matcher.get_address_similarity(a.get('Address', ''), b.get('Address', '')),
+        'dob': lambda a, b: matcher.compare_dates(a.get('DOB', ''), b.get('DOB', '')),
+        'gender': lambda a, b: 100 if a.get('Gender', '').lower() == b.get('Gender', '').lower() else 0,
+    }
+
+
+def measure_throughput(pairs):
+    """Pairs/sec of compare_documents on a fresh (cold-cache) matcher"""
+    matcher = KYCMatcher()
+    started = time.perf_counter()
+    for pair in pairs:
+        matcher.compare_documents(pair['doc_a'], pair['doc_b'])
+    elapsed = time.perf_counter() - started
+    return {
+        'pairs': len(pairs),
+        'seconds': round(elapsed, 4),
+        'pairs_per_second': round(len(pairs) / elapsed, 1),
+        'cache_stats': matcher.cache_stats(),
+    }
+
+
+def measure_latency(pairs):
+    """Per-pair latency percentiles of each field scorer and of compare_documents"""
+    timer = time.perf_counter_ns
+    matcher = KYCMatcher()
+    fields = {name: [] for name in _field_scorers(matcher)}
+    for name, scorer in _field_scorers(matcher).items():
+        samples = fields[name]
+        for pair in pairs:
+            started = timer()
+            scorer(pair['doc_a'], pair['doc_b'])
+            samples.append(timer() - started)
+
+    matcher = KYCMatcher()
+    overall = []
+    by_family = {}
+    for pair in pairs:
+        started = timer()
+        matcher.compare_documents(pair['doc_a'], pair['doc_b'])
+        elapsed = timer() - started
+        overall.append(elapsed)
+        by_family.setdefault(pair['family'], []).append(elapsed)
+
+    return {
+        'fields': {name: _latency_summary(samples) for name, samples in fields.items()},
+        'compare_documents': _latency_summary(overall),
+        'by_family': {family: _latency_summary(samples) for family, samples in sorted(by_family.items())},
+    }
+
+
+def measure_memory(pairs):
+    """Peak Python heap allocated while scoring the pairs on a fresh matcher"""
+    tracemalloc.start()
+    try:
+        matcher = KYCMatcher()
+        for pair in pairs:
+            matcher.compare_documents(pair['doc_a'], pair['doc_b'])
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'peak_traced_mb': round(peak / 2 ** 20, 3), 'retained_traced_mb': round(current / 2 ** 20, 3)}
+
+
+def measure_cold_start(runs=5):
+    """Median import time and cold-start time of kyc_matcher over fresh interpreters"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', _COLD_START_SCRIPT], capture_output=True,
+                                text=True, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        samples.append(json.loads(output.stdout))
+    return {
+        'runs': runs,
+        'import_ms': round(float(np.median([s['import_ms'] for s in samples])), 2),
+        'cold_start_ms': round(float(np.median([s['cold_start_ms'] for s in samples])), 2),
+        'heavy_modules_after_first_pair': samples[-1]['loaded'],
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(n_pairs=10000, seed=42, memory_pairs=None):
+    """Generate n_pairs synthetic pairs and return the full benchmark report as a dict"""
+    generator = KYCPairGenerator(KYCMatcher().address_abbreviations, seed=seed)
+    pairs = list(generator.pairs(n_pairs))
+    families = {family: 0 for family in FAMILIES}
+    for pair in pairs:
+        families[pair['family']] += 1
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': seed,
+            'pairs': n_pairs,
+            'families': families,
+        },
+        'cold_start': measure_cold_start(),
+        'throughput': measure_throughput(pairs),
+        'latency': measure_latency(pairs),
+        # tracemalloc slows scoring down considerably, so memory is measured on a prefix
+        'memory': measure_memory(pairs[:memory_pairs or min(n_pairs, 5000)]),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark compare_documents on synthetic KYC pairs.")
+    parser.add_argument('--pairs', type=int, default=10000, help="number of synthetic pairs (default: 10000)")
+    parser.add_argument('--seed', type=int, default=42, help="generator seed (default: 42)")
+    parser.add_argument('--memory-pairs', type=int, default=None,
+                        help="pairs scored under tracemalloc (default: min(pairs, 5000))")
+    parser.add_argument('--output', default='benchmark_results.json', help="JSON report path")
+    parser.add_argument('--cold-start-only', action='store_true',
+                        help="only measure import and cold-start time, and check them against the budgets")
+    parser.add_argument('--import-budget-ms', type=float, default=50,
+                        help="largest acceptable median import time (default: 50)")
+    parser.add_argument('--cold-start-budget-ms', type=float, default=150,
+                        help="largest acceptable median cold start (default: 150)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.cold_start_only:
+        cold_start = measure_cold_start()
+        print(json.dumps(cold_start))
+        over = []
+        if cold_start['import_ms'] > args.import_budget_ms:
+            over.append(f"import {cold_start['import_ms']}ms > {args.import_budget_ms}ms")
+        if cold_start['cold_start_ms'] > args.cold_start_budget_ms:
+            over.append(f"cold start {cold_start['cold_start_ms']}ms > {args.cold_start_budget_ms}ms")
+        if over:
+            print("Over budget: " + "; ".join(over), file=sys.stderr)
+            return 1
+        return 0
+
+    report = run_benchmark(args.pairs, args.seed, args.memory_pairs)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    throughput = report['throughput']
+    latency = report['latency']['compare_documents']
+    print(f"{throughput['pairs_per_second']:.0f} pairs/sec, compare_documents p50 {latency['p50_us']}us "
+          f"p99 {latency['p99_us']}us, peak {report['memory']['peak_traced_mb']} MB -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
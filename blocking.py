@@ -0,0 +1,197 @@
+import json
+from collections import defaultdict
+
+# Soundex digit for each consonant; vowels, h, w and y have no code
+_SOUNDEX_CODES = {}
+for _digit, _letters in (('1', 'bfpv'), ('2', 'cgjkqsxz'), ('3', 'dt'), ('4', 'l'), ('5', 'mn'), ('6', 'r')):
+    for _letter in _letters:
+        _SOUNDEX_CODES[_letter] = _digit
+
+
+def soundex(token):
+    """American Soundex code of a lowercase token (e.g. 'mehta' -> 'm300'), or '' if it has no letters"""
+    letters = [c for c in token if 'a' <= c <= 'z']
+    if not letters:
+        return ""
+    code = letters[0]
+    previous = _SOUNDEX_CODES.get(letters[0], '')
+    for letter in letters[1:]:
+        digit = _SOUNDEX_CODES.get(letter, '')
+        if digit and digit != previous:
+            code += digit
+            if len(code) == 4:
+                break
+        # h and w do not separate letters with the same code; vowels do
+        if letter not in 'hw':
+            previous = digit
+    return code.ljust(4, '0')
+
+
+class BlockingIndex:
+    """Candidate generation for record linkage, built on KYCMatcher's normalizers.
+
+    Every indexed record is filed under a few blocking keys: its postal code, its date of
+    birth (with day and month sorted, so DD/MM vs MM/DD swaps share a key), and the prefix
+    and Soundex code of each normalized name token. The optional compound keys pair the
+    surname's Soundex code with the postal code or the birth year, for books where the
+    single-field keys are too common. A query is only scored against records that share
+    at least one key with it. Keys held by more than max_block_size records are too common
+    to narrow anything down and are ignored at query time.
+
+    Record ids must be strings or integers so the index can be saved as JSON.
+    """
+
+    KEY_TYPES = ('postal', 'dob', 'prefix', 'phonetic', 'surname_postal', 'surname_year')
+    DEFAULT_KEY_TYPES = ('postal', 'dob', 'prefix', 'phonetic')
+
+    def __init__(self, matcher, key_types=DEFAULT_KEY_TYPES, prefix_length=4, min_token_length=3,
+                 max_block_size=1000):
+        unknown = set(key_types) - set(self.KEY_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown blocking key types: {sorted(unknown)}")
+        self.matcher = matcher
+        self.key_types = tuple(key_types)
+        self.prefix_length = prefix_length
+        self.min_token_length = min_token_length
+        self.max_block_size = max_block_size
+        self.blocks = defaultdict(list)
+        self.size = 0
+
+    def blocking_keys(self, doc):
+        """Return the set of blocking keys for a document dict"""
+        keys = set()
+        key_types = self.key_types
+        postal_code = self.matcher._extract_postal_code(doc.get('Address') or '')
+        parsed = self.matcher.date_engine.parse(doc.get('DOB') or '')
+        tokens = [token.replace('.', '') for token in self.matcher.normalize_name(doc.get('Name') or '').split()]
+        tokens = [token for token in tokens if len(token) >= self.min_token_length]
+        surname = soundex(tokens[-1]) if tokens else ''
+
+        if postal_code and 'postal' in key_types:
+            keys.add('pc:' + postal_code)
+        if parsed and 'dob' in key_types:
+            low, high = sorted((parsed.month, parsed.day))
+            keys.add(f'dob:{parsed.year}:{low}:{high}')
+        for token in tokens:
+            if 'prefix' in key_types:
+                keys.add('np:' + token[:self.prefix_length])
+            if 'phonetic' in key_types:
+                code = soundex(token)
+                if code:
+                    keys.add('sx:' + code)
+        # Compound keys stay selective in large books where single fields repeat a lot
+        if surname and postal_code and 'surname_postal' in key_types:
+            keys.add(f'sp:{surname}:{postal_code}')
+        if surname and parsed and 'surname_year' in key_types:
+            keys.add(f'sy:{surname}:{parsed.year}')
+        return keys
+
+    def add(self, record_id, doc):
+        """Index one existing record"""
+        for key in self.blocking_keys(doc):
+            self.blocks[key].append(record_id)
+        self.size += 1
+
+    def add_many(self, records):
+        """Index (record_id, doc) pairs, or every item of a mapping of record_id to doc"""
+        if hasattr(records, 'items'):
+            records = records.items()
+        for record_id, doc in records:
+            self.add(record_id, doc)
+
+    def candidates(self, doc):
+        """Return the ids of indexed records sharing a usable blocking key with doc"""
+        found = set()
+        for key in self.blocking_keys(doc):
+            block = self.blocks.get(key)
+            if block and len(block) <= self.max_block_size:
+                found.update(block)
+        return found
+
+    def link(self, queries, existing, threshold=70):
+        """Score each query only against its candidates with compare_documents.
+
+        queries is an iterable of (query_id, doc) pairs (or a mapping); existing maps the
+        indexed record ids back to their documents. Returns (matches, stats) where matches
+        lists every candidate pair whose overall confidence reaches threshold, best first
+        per query, and stats reports how many pairs were compared and skipped.
+        """
+        if hasattr(queries, 'items'):
+            queries = queries.items()
+        matches = []
+        query_count = 0
+        compared = 0
+        for query_id, doc in queries:
+            query_count += 1
+            scored = []
+            for record_id in self.candidates(doc):
+                compared += 1
+                result = self.matcher.compare_documents(doc, existing[record_id])
+                if result['overall_confidence'] >= threshold:
+                    scored.append({
+                        'query_id': query_id,
+                        'record_id': record_id,
+                        'overall_confidence': result['overall_confidence'],
+                        'match_category': result['match_category'],
+                    })
+            scored.sort(key=lambda match: match['overall_confidence'], reverse=True)
+            matches.extend(scored)
+        return matches, self._pair_stats(query_count, compared)
+
+    def evaluate(self, queries, true_pairs):
+        """Measure blocking recall against known matches without scoring anything.
+
+        true_pairs is an iterable of (query_id, record_id) pairs that are known to refer to
+        the same person. Returns the fraction of them that blocking would keep, alongside
+        the number of pairs compared and skipped.
+        """
+        if hasattr(queries, 'items'):
+            queries = queries.items()
+        true_pairs = set(true_pairs)
+        query_count = 0
+        compared = 0
+        found = 0
+        for query_id, doc in queries:
+            query_count += 1
+            candidates = self.candidates(doc)
+            compared += len(candidates)
+            found += sum(1 for record_id in candidates if (query_id, record_id) in true_pairs)
+        stats = self._pair_stats(query_count, compared)
+        stats['true_pairs'] = len(true_pairs)
+        stats['true_pairs_found'] = found
+        stats['recall'] = found / len(true_pairs) if true_pairs else 1.0
+        return stats
+
+    def _pair_stats(self, query_count, compared):
+        total = query_count * self.size
+        return {
+            'queries': query_count,
+            'indexed_records': self.size,
+            'total_pairs': total,
+            'pairs_compared': compared,
+            'pairs_skipped': total - compared,
+            'reduction_ratio': 1 - compared / total if total else 0.0,
+        }
+
+    def save(self, path):
+        """Write the index configuration and blocks to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump({
+                'key_types': list(self.key_types),
+                'prefix_length': self.prefix_length,
+                'min_token_length': self.min_token_length,
+                'max_block_size': self.max_block_size,
+                'size': self.size,
+                'blocks': self.blocks,
+            }, f)
+
+    @classmethod
+    def load(cls, path, matcher):
+        """Read an index written by save, attaching it to matcher"""
+        with open(path) as f:
+            data = json.load(f)
+        index = cls(matcher, key_types=data['key_types'], prefix_length=data['prefix_length'],
+                    min_token_length=data['min_token_length'], max_block_size=data['max_block_size'])
+        index.blocks.update(data['blocks'])
+        index.size = data['size']
+        return index
@@ -0,0 +1,225 @@
+import json
+import sqlite3
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Bounded least-recently-used cache with hit/miss counters.
+
+    A maxsize of 0 disables caching: every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, maxsize=65536):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def get(self, key, default=None):
+        """Return the cached value for key (marking it recently used), or default"""
+        value = self._data.get(key, _MISSING)
+        if value is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entry when full"""
+        if not self.maxsize:
+            return
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute(key) and storing it on a miss"""
+        value = self._data.get(key, _MISSING)
+        if value is not _MISSING:
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+        self.misses += 1
+        value = compute(key)
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self):
+        """Return a dict of size, hit/miss/eviction counts and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class TTLCache(LRUCache):
+    """LRUCache whose entries also expire ttl seconds after they were stored (ttl None: never)"""
+
+    def __init__(self, maxsize=65536, ttl=None):
+        super().__init__(maxsize)
+        self.ttl = ttl
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Return the cached value for key unless it has expired, else default"""
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING and entry[0] is not None and entry[0] <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            entry = _MISSING
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        """Store value under key with a fresh expiry time"""
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        super().put(key, (expires, value))
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        super().clear()
+        self.expirations = 0
+
+    def stats(self):
+        return dict(super().stats(), ttl=self.ttl, expirations=self.expirations)
+
+
+class DiskCache:
+    """SQLite-backed cache of JSON-serializable values with LRU and TTL eviction.
+
+    Same interface and statistics as TTLCache, but entries survive restarts and can be
+    shared by processes on one host. The size bound is enforced per process, so it is
+    approximate when several processes write to the same file.
+    """
+
+    def __init__(self, path, maxsize=1000000, ttl=None):
+        if maxsize < 0:
+            raise ValueError("maxsize must be >= 0")
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=OFF")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored REAL NOT NULL, used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS cache_used ON cache (used)")
+        self.size = self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, key):
+        return self.conn.execute("SELECT 1 FROM cache WHERE key = ?", (key,)).fetchone() is not None
+
+    def get(self, key, default=None):
+        """Return the cached value for key unless it has expired, else default"""
+        row = self.conn.execute("SELECT value, stored FROM cache WHERE key = ?", (key,)).fetchone()
+        now = time.time()
+        if row is not None and self.ttl is not None and row[1] + self.ttl <= now:
+            self.conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self.size -= 1
+            self.expirations += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return default
+        self.conn.execute("UPDATE cache SET used = ? WHERE key = ?", (now, key))
+        self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries when full"""
+        if not self.maxsize:
+            return
+        now = time.time()
+        data = json.dumps(value)
+        updated = self.conn.execute("UPDATE cache SET value = ?, stored = ?, used = ? WHERE key = ?",
+                                    (data, now, now, key)).rowcount
+        if updated:
+            return
+        self.conn.execute("INSERT INTO cache VALUES (?, ?, ?, ?)", (key, data, now, now))
+        self.size += 1
+        if self.size > self.maxsize:
+            excess = self.size - self.maxsize
+            self.conn.execute("DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used LIMIT ?)",
+                              (excess,))
+            self.size -= excess
+            self.evictions += excess
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for key, calling compute(key) and storing it on a miss"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """Drop all entries and reset the counters"""
+        self.conn.execute("DELETE FROM cache")
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def stats(self):
+        """Return a dict of size, hit/miss/eviction/expiration counts and hit rate"""
+        lookups = self.hits + self.misses
+        return {
+            'size': self.size,
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'ttl': self.ttl,
+            'expirations': self.expirations,
+        }
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,339 @@
+"""Single-pass sweeps over the weights, penalties and category thresholds.
+
+Tuning compare_documents used to mean rescoring a labeled pair set once per candidate
+configuration. The field scores (name, address, DOB, gender) do not depend on that
+configuration, so a ScoreTable scores every pair once with KYCMatcher.batch_field_scores
+and keeps only the distinct combinations of field scores, flags and label, with counts.
+evaluate then applies a whole block of configurations at once, broadcasting the same
+kernels compare_batch uses over (configurations x combinations), so each configuration's
+categories are exactly the ones compare_documents would give:
+
+    python calibration.py labeled_pairs.csv grid.json report.csv --label-column label
+
+The configuration file is either a JSON list of overrides, e.g.
+[{"weights": {"name": 0.5, "address": 0.2}}, {"category_thresholds": {"high": 85}}], or a
+grid of dotted parameter names and candidate values that is expanded to every combination,
+e.g. {"weights.name": [0.3, 0.4, 0.5], "penalties.dob_mismatch": [0.5, 0.7]}. Anything not
+overridden keeps the matcher's value.
+
+Labels are either match category names or yes/no outcomes. Category labels are compared
+with the predicted category; yes/no labels with whether the prediction is at or above the
+--match-from category, reporting precision and recall as well.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import kernels
+from batch_runner import FORMATS, ResultWriter, read_pair_chunks, split_pairs
+from kyc_matcher import MATCH_CATEGORIES, KYCMatcher
+
+
+CONFIG_SECTIONS = ('weights', 'penalties', 'category_thresholds')
+
+NO_LABEL = -1
+_YES_NO_LABELS = {'1': 1, 'true': 1, 'yes': 1, 'y': 1, '0': 0, 'false': 0, 'no': 0, 'n': 0}
+_CATEGORY_LABELS = {category.lower(): code for code, category in enumerate(MATCH_CATEGORIES)}
+
+# Largest (configurations x combinations) matrix evaluated at once
+_BLOCK_CELLS = 1 << 22
+
+_TABLE_COLUMNS = ('name_similarity', 'address_similarity', 'dob_similarity', 'gender_match',
+                  'has_caution', 'genders_given', 'dobs_given', 'labels')
+
+
+def parse_labels(values):
+    """(codes, kind) for a column of labels: kind is 'category' when every given label names a
+    match category, 'yes_no' when every one is a yes/no value, None when none is given.
+    Missing labels get NO_LABEL."""
+    labels = ['' if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v).strip().lower()
+              for v in values]
+    given = {label for label in labels if label}
+    if not given:
+        return np.full(len(labels), NO_LABEL, dtype=np.int64), None
+    for kind, lookup in (('category', _CATEGORY_LABELS), ('yes_no', _YES_NO_LABELS)):
+        if given <= lookup.keys():
+            return np.array([lookup[label] if label else NO_LABEL for label in labels], dtype=np.int64), kind
+    unknown = sorted(given - _CATEGORY_LABELS.keys() - _YES_NO_LABELS.keys())[:5]
+    raise ValueError(f"Labels must all be match categories or all yes/no values, got {unknown or sorted(given)[:5]}")
+
+
+def _merge_label_kinds(*kinds):
+    given = {kind for kind in kinds if kind}
+    if len(given) > 1:
+        raise ValueError("Labels mix match categories and yes/no values")
+    return given.pop() if given else None
+
+
+class ScoreTable:
+    """Distinct (field scores, flags, label) combinations of a pair set and how often each occurs"""
+
+    def __init__(self, name_similarity, address_similarity, dob_similarity, gender_match,
+                 has_caution, genders_given, dobs_given, labels, counts, label_kind=None, fingerprint=None):
+        self.name_similarity = np.asarray(name_similarity, dtype=np.int64)
+        self.address_similarity = np.asarray(address_similarity, dtype=np.int64)
+        self.dob_similarity = np.asarray(dob_similarity, dtype=np.int64)
+        self.gender_match = np.asarray(gender_match, dtype=np.int64)
+        self.has_caution = np.asarray(has_caution, dtype=bool)
+        self.genders_given = np.asarray(genders_given, dtype=bool)
+        self.dobs_given = np.asarray(dobs_given, dtype=bool)
+        self.labels = np.asarray(labels, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        self.label_kind = label_kind
+        # KYCMatcher.config_fingerprint of the matcher that computed the field scores
+        self.fingerprint = fingerprint
+
+    @classmethod
+    def from_scores(cls, scores, labels=None, label_kind=None, fingerprint=None):
+        """Collapse the arrays of KYCMatcher.batch_field_scores (and optional label codes) to a table"""
+        size = len(scores['name_similarity'])
+        columns = (
+            scores['name_similarity'], scores['address_similarity'],
+            scores['dob_similarity'], scores['gender_match'],
+            scores['middle_name_discrepancy'] | (scores['dob_similarity'] == 50),
+            scores['genders_given'], scores['dobs_given'],
+            np.full(size, NO_LABEL, dtype=np.int64) if labels is None else labels,
+        )
+        return cls._from_keys(cls._pack(*columns), np.ones(size, dtype=np.int64), label_kind, fingerprint)
+
+    @classmethod
+    def score(cls, matcher, docs_a, docs_b, labels=None):
+        """Score a batch once and collapse it; labels are category names or yes/no values"""
+        label_codes, label_kind = parse_labels(labels) if labels is not None else (None, None)
+        return cls.from_scores(matcher.batch_field_scores(docs_a, docs_b), label_codes, label_kind,
+                               matcher.config_fingerprint())
+
+    @classmethod
+    def concat(cls, parts):
+        """Merge the tables of consecutive batches"""
+        parts = list(parts)
+        fingerprints = {part.fingerprint for part in parts if part.fingerprint}
+        if len(fingerprints) > 1:
+            raise ValueError("Score tables were computed with different matcher configurations")
+        keys = np.concatenate([part._keys() for part in parts]) if parts else np.zeros(0, dtype=np.int64)
+        counts = np.concatenate([part.counts for part in parts]) if parts else np.zeros(0, dtype=np.int64)
+        return cls._from_keys(keys, counts, _merge_label_kinds(*(part.label_kind for part in parts)),
+                              fingerprints.pop() if fingerprints else None)
+
+    @staticmethod
+    def _pack(name, address, dob, gender, has_caution, genders_given, dobs_given, labels):
+        # Scores in base 101, then the three flags, then the label shifted past NO_LABEL
+        key = np.asarray(name, dtype=np.int64)
+        for score in (address, dob, gender):
+            key = key * 101 + score
+        for flag in (has_caution, genders_given, dobs_given):
+            key = key * 2 + np.asarray(flag, dtype=np.int64)
+        return key * (len(MATCH_CATEGORIES) + 1) + (np.asarray(labels, dtype=np.int64) + 1)
+
+    def _keys(self):
+        return self._pack(*(getattr(self, column) for column in _TABLE_COLUMNS))
+
+    @classmethod
+    def _from_keys(cls, keys, counts, label_kind, fingerprint):
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1), weights=counts, minlength=len(keys)).astype(np.int64)
+        keys, labels = np.divmod(keys, len(MATCH_CATEGORIES) + 1)
+        flags = []
+        for _ in range(3):
+            keys, flag = np.divmod(keys, 2)
+            flags.append(flag.astype(bool))
+        scores = []
+        for _ in range(3):
+            keys, score = np.divmod(keys, 101)
+            scores.append(score)
+        return cls(keys, *scores[::-1], *flags[::-1], labels - 1, counts, label_kind, fingerprint)
+
+    def __len__(self):
+        return len(self.counts)
+
+    @property
+    def pairs(self):
+        """Number of pairs the table was built from"""
+        return int(self.counts.sum())
+
+    def save(self, path):
+        """Write the table to an .npz file"""
+        np.savez_compressed(path, counts=self.counts, label_kind=str(self.label_kind or ''),
+                            fingerprint=str(self.fingerprint or ''),
+                            **{column: getattr(self, column) for column in _TABLE_COLUMNS})
+
+    @classmethod
+    def load(cls, path):
+        """Read a table written by save"""
+        with np.load(path) as data:
+            return cls(*(data[column] for column in _TABLE_COLUMNS), data['counts'],
+                       str(data['label_kind']) or None, str(data['fingerprint']) or None)
+
+
+def build_score_table(path, matcher, label_column=None, chunk_size=50000, fmt=None):
+    """Score every pair of a CSV/Parquet/JSONL pair file once and collapse it to a ScoreTable"""
+    parts = []
+    for frame in read_pair_chunks(path, chunk_size, fmt):
+        docs_a, docs_b = split_pairs(frame)
+        labels = frame[label_column] if label_column and label_column in frame else None
+        parts.append(ScoreTable.score(matcher, docs_a, docs_b, labels))
+        if len(parts) >= 64:
+            parts = [ScoreTable.concat(parts)]
+    return ScoreTable.concat(parts)
+
+
+def resolve_config(matcher, overrides):
+    """The matcher's weights, penalties and category thresholds with overrides applied"""
+    config = {section: dict(getattr(matcher, section)) for section in CONFIG_SECTIONS}
+    for section, values in overrides.items():
+        if section not in config:
+            raise ValueError(f"Unknown configuration section {section!r}; expected one of {', '.join(CONFIG_SECTIONS)}")
+        unknown = set(values) - config[section].keys()
+        if unknown:
+            raise ValueError(f"Unknown {section} {', '.join(sorted(unknown))}")
+        config[section].update(values)
+    return config
+
+
+def apply_config(matcher, overrides):
+    """Install a configuration found by a sweep on a matcher"""
+    for section, values in resolve_config(matcher, overrides).items():
+        setattr(matcher, section, values)
+
+
+def expand_grid(grid):
+    """Every combination of a {"section.parameter": [values, ...]} grid as a list of overrides"""
+    names = list(grid)
+    for name in names:
+        if name.count('.') != 1:
+            raise ValueError(f"Grid parameters look like 'weights.name', got {name!r}")
+    configs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = {}
+        for name, value in zip(names, values):
+            section, parameter = name.split('.')
+            config.setdefault(section, {})[parameter] = value
+        configs.append(config)
+    return configs
+
+
+def load_configs(path):
+    """Configurations from a JSON file holding a list of overrides or a parameter grid"""
+    with open(path) as f:
+        configs = json.load(f)
+    return expand_grid(configs) if isinstance(configs, dict) else configs
+
+
+def evaluate(table, matcher, configs, match_from="Medium-to-high confidence match"):
+    """One row per configuration: its parameters, the number of pairs in each match category
+    and, when the table is labeled, the agreement with the labels.
+
+    With yes/no labels a pair is predicted a match from the match_from category up, and
+    precision and recall are reported next to the agreement (accuracy).
+    """
+    resolved = [resolve_config(matcher, overrides) for overrides in configs]
+    labeled = table.labels != NO_LABEL
+    positive = table.labels == 1
+    match_code = MATCH_CATEGORIES.index(match_from)
+    block = max(1, _BLOCK_CELLS // max(len(table), 1))
+    rows = []
+    for start in range(0, len(resolved), block):
+        chunk = resolved[start:start + block]
+        # Each parameter becomes a (configs, 1) column that broadcasts against the table
+        parameters = {
+            section: {key: np.array([config[section][key] for config in chunk], dtype=np.float64)[:, None]
+                      for key in chunk[0][section]}
+            for section in CONFIG_SECTIONS
+        }
+        confidence = kernels.overall_confidences(
+            table.name_similarity, table.address_similarity, table.dob_similarity, table.gender_match,
+            table.has_caution, table.genders_given, table.dobs_given,
+            parameters['weights'], parameters['penalties'])
+        codes = kernels.match_category_codes(confidence, table.has_caution, parameters['category_thresholds'])
+        distribution = np.stack([np.where(codes == code, table.counts, 0).sum(axis=1)
+                                 for code in range(len(MATCH_CATEGORIES))], axis=1)
+        if table.label_kind == 'category':
+            agreed = np.where((codes == table.labels) & labeled, table.counts, 0).sum(axis=1)
+        elif table.label_kind == 'yes_no':
+            predicted = codes >= match_code
+            agreed = np.where((predicted == positive) & labeled, table.counts, 0).sum(axis=1)
+            true_positives = np.where(predicted & positive, table.counts, 0).sum(axis=1)
+            predicted_positives = np.where(predicted & labeled, table.counts, 0).sum(axis=1)
+        labeled_pairs = int(table.counts[labeled].sum())
+        actual_positives = int(table.counts[positive].sum())
+
+        for i, config in enumerate(chunk):
+            row = {'config': start + i}
+            row.update({f'{section}.{key}': value
+                        for section in CONFIG_SECTIONS for key, value in config[section].items()})
+            row.update(zip(MATCH_CATEGORIES, distribution[i].tolist()))
+            if table.label_kind:
+                row['labeled'] = labeled_pairs
+                row['agreement'] = agreed[i] / labeled_pairs if labeled_pairs else float('nan')
+            if table.label_kind == 'yes_no':
+                row['precision'] = (true_positives[i] / predicted_positives[i]
+                                    if predicted_positives[i] else float('nan'))
+                row['recall'] = true_positives[i] / actual_positives if actual_positives else float('nan')
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Score labeled KYC pairs once and evaluate many weight/penalty/threshold configurations.")
+    parser.add_argument('input', help="pair file (.csv, .parquet, .jsonl), as for batch_runner.py")
+    parser.add_argument('configs', help="JSON list of configuration overrides, or a grid of dotted parameters")
+    parser.add_argument('output', help="report with one row per configuration (.csv, .parquet, .jsonl)")
+    parser.add_argument('--label-column', default='label', help="column with the expected outcome (default: label)")
+    parser.add_argument('--match-from', default="Medium-to-high confidence match", choices=MATCH_CATEGORIES,
+                        help="lowest category counted as a match for yes/no labels")
+    parser.add_argument('--scores', help="reuse the field scores saved in this .npz file, or save them there")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="pairs scored per batch (default: 50000)")
+    parser.add_argument('--input-format', choices=FORMATS, help="override the input format")
+    parser.add_argument('--output-format', choices=FORMATS, help="override the output format")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.chunk_size < 1:
+        print("--chunk-size must be positive", file=sys.stderr)
+        return 2
+    matcher = KYCMatcher()
+    configs = load_configs(args.configs)
+    started = time.perf_counter()
+
+    if args.scores and os.path.exists(args.scores):
+        table = ScoreTable.load(args.scores)
+        if table.fingerprint != matcher.config_fingerprint():
+            print(f"{args.scores} was scored with other lexicons or rules; delete it to rescore", file=sys.stderr)
+            return 2
+    else:
+        table = build_score_table(args.input, matcher, args.label_column, args.chunk_size, args.input_format)
+        if args.scores:
+            table.save(args.scores)
+    scored = time.perf_counter()
+
+    report = evaluate(table, matcher, configs, args.match_from)
+    with ResultWriter(args.output, args.output_format) as writer:
+        writer.write(report)
+
+    summary = {
+        'pairs': table.pairs,
+        'combinations': len(table),
+        'configs': len(report),
+        'labels': table.label_kind,
+        'scoring_seconds': round(scored - started, 3),
+        'evaluation_seconds': round(time.perf_counter() - scored, 3),
+    }
+    if table.label_kind and report['agreement'].notna().any():
+        best = report.loc[report['agreement'].idxmax()]
+        summary['best_config'] = int(best['config'])
+        summary['best_agreement'] = round(float(best['agreement']), 4)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import datetime
+import re
+from collections import namedtuple
+
+from caching import LRUCache
+
+# DD/MM/YYYY, MM/DD/YYYY and their '-' and '.' variants; the separator must repeat
+_NUMERIC_DATE = re.compile(r'([0-9]{1,2})([/.-])([0-9]{1,2})\2([0-9]{4})')
+# YYYY-MM-DD and its '/' and '.' variants
+_ISO_DATE = re.compile(r'([0-9]{4})([/.-])([0-9]{1,2})\2([0-9]{1,2})')
+
+# ordinal: proleptic Gregorian day number (datetime.date.toordinal)
+# swapped_ordinal: ordinal of the date with day and month exchanged, or None if day > 12
+ParsedDate = namedtuple('ParsedDate', ['ordinal', 'year', 'month', 'day', 'swapped_ordinal'])
+
+
+class DateEngine:
+    """Parse dates of birth into ordinals, with a fast path for the common KYC formats.
+
+    Numeric dates are read the way dateutil.parser.parse reads them with its defaults
+    (month first unless the first field cannot be a month), so the fast path and the
+    dateutil fallback agree. Results, including failures, are cached by input string.
+    """
+
+    def __init__(self, cache_size=65536):
+        self.cache = LRUCache(cache_size)
+        self.fast_path = 0
+        self.fallback = 0
+
+    def parse(self, date_str):
+        """Return a ParsedDate for date_str, or None if it is empty or cannot be parsed"""
+        if not date_str:
+            return None
+        return self.cache.get_or_compute(date_str, self._parse)
+
+    def _parse(self, date_str):
+        text = date_str.strip() if isinstance(date_str, str) else date_str
+
+        match = _NUMERIC_DATE.fullmatch(text) if isinstance(text, str) else None
+        if match:
+            self.fast_path += 1
+            first, second, year = int(match.group(1)), int(match.group(3)), int(match.group(4))
+            if 1 <= first <= 12:
+                return self._build(year, first, second)
+            return self._build(year, second, first)
+
+        match = _ISO_DATE.fullmatch(text) if isinstance(text, str) else None
+        if match:
+            self.fast_path += 1
+            return self._build(int(match.group(1)), int(match.group(3)), int(match.group(4)))
+
+        self.fallback += 1
+        # Imported here since most inputs never need it and it slows down process start-up
+        import dateutil.parser
+        try:
+            parsed = dateutil.parser.parse(date_str)
+        except:
+            return None
+        return self._build(parsed.year, parsed.month, parsed.day)
+
+    @staticmethod
+    def _build(year, month, day):
+        try:
+            ordinal = datetime.date(year, month, day).toordinal()
+        except ValueError:
+            return None
+        swapped_ordinal = datetime.date(year, day, month).toordinal() if day <= 12 else None
+        return ParsedDate(ordinal, year, month, day, swapped_ordinal)
+
+    def stats(self):
+        """Return cache statistics plus how many parses took the fast path or fell back to dateutil"""
+        return dict(self.cache.stats(), fast_path=self.fast_path, fallback=self.fallback)
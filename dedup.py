@@ -0,0 +1,268 @@
+"""Find duplicate customer identities inside one customer book.
+
+Candidate pairs come from a BlockingIndex instead of all N^2 pairs, are scored with
+compare_documents, and pairs at or above the threshold are merged into clusters with
+union-find. The state (records, blocking index and clusters) can be saved and loaded,
+so each day's new records are only compared against the existing book:
+
+    python dedup.py customers.csv clusters.csv --state book_state.json
+    python dedup.py todays_customers.csv clusters.csv --state book_state.json
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from batch_runner import detect_format, iter_jsonl_records
+from blocking import BlockingIndex
+from feature_store import FeatureStore
+from kyc_matcher import KYCMatcher
+
+
+# Within one book single-field name keys match far too many records; surname-based
+# compound keys plus the DOB key (which also covers swapped name order) keep blocks small
+DEDUP_KEY_TYPES = ('dob', 'surname_postal', 'surname_year')
+
+
+def _id_order(record_id):
+    """Sort key for record ids, which may mix integers and strings"""
+    return isinstance(record_id, str), record_id
+
+
+class UnionFind:
+    """Disjoint sets over hashable ids with path halving and union by size"""
+
+    def __init__(self):
+        self.parent = {}
+        self.size = {}
+
+    def add(self, item):
+        if item not in self.parent:
+            self.parent[item] = item
+            self.size[item] = 1
+
+    def find(self, item):
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a, b):
+        """Merge the sets of a and b; returns False if they were already together"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size.pop(root_b)
+        return True
+
+    def groups(self):
+        """Return {root: [members]} for every set"""
+        groups = {}
+        for item in self.parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return groups
+
+
+class DuplicateClusterer:
+    """Incrementally cluster duplicate identities using blocking and KYCMatcher scores.
+
+    Each new record is scored against the blocking candidates among the records seen so
+    far. Candidates already in the new record's cluster are skipped, since linking them
+    again would not change anything. Candidates are visited in id order, so the same
+    input always produces the same cluster ids. Record ids must be strings or integers.
+    """
+
+    def __init__(self, matcher, threshold=70, key_types=DEDUP_KEY_TYPES, feature_store=None, **blocking_options):
+        self.matcher = matcher
+        self.feature_store = feature_store
+        self.threshold = threshold
+        self.index = BlockingIndex(matcher, key_types=key_types, **blocking_options)
+        self.records = {}
+        # Stored features of self.records when a feature store is used, and their fingerprint
+        self.features = {}
+        self.features_fingerprint = None
+        self.clusters = UnionFind()
+        self.stats = {'records': 0, 'pairs_compared': 0, 'pairs_skipped_same_cluster': 0, 'matches': 0}
+
+    def add_records(self, records):
+        """Add (record_id, doc) pairs (or a mapping) and return the matching pairs found.
+
+        Each match is a dict with both ids, the overall confidence and the category.
+        """
+        if hasattr(records, 'items'):
+            records = records.items()
+        new_features = None
+        if self.feature_store is not None:
+            # Fetch or compute the new records' features in one pass instead of per comparison
+            records = list(records)
+            new_features = self.feature_store.get_many([doc for _, doc in records])
+            if self.feature_store.fingerprint != self.features_fingerprint:
+                # First batch after loading, or the lexicons changed: refetch the book's features
+                self.features = dict(zip(self.records, self.feature_store.get_many(list(self.records.values()))))
+                self.features_fingerprint = self.feature_store.fingerprint
+        matches = []
+        for position, (record_id, doc) in enumerate(records):
+            features = new_features[position] if new_features is not None else None
+            if record_id in self.records:
+                raise ValueError(f"Duplicate record id: {record_id!r}")
+            self.clusters.add(record_id)
+            # Any order reaches the same clusters, but a fixed one keeps the cluster ids stable
+            for candidate_id in sorted(self.index.candidates(doc), key=_id_order):
+                if self.clusters.find(candidate_id) == self.clusters.find(record_id):
+                    self.stats['pairs_skipped_same_cluster'] += 1
+                    continue
+                self.stats['pairs_compared'] += 1
+                if features is not None:
+                    result = self.matcher.compare_features(features, self.features[candidate_id])
+                else:
+                    result = self.matcher.compare_documents(doc, self.records[candidate_id])
+                if result['overall_confidence'] >= self.threshold:
+                    self.clusters.union(record_id, candidate_id)
+                    self.stats['matches'] += 1
+                    matches.append({
+                        'record_id': record_id,
+                        'matched_id': candidate_id,
+                        'overall_confidence': result['overall_confidence'],
+                        'match_category': result['match_category'],
+                    })
+            self.index.add(record_id, doc)
+            self.records[record_id] = doc
+            if features is not None:
+                self.features[record_id] = features
+            self.stats['records'] += 1
+        return matches
+
+    def cluster_id(self, record_id):
+        """Representative id of the cluster a record belongs to"""
+        return self.clusters.find(record_id)
+
+    def duplicate_clusters(self, min_size=2):
+        """Return the clusters with at least min_size records, largest first"""
+        groups = [members for members in self.clusters.groups().values() if len(members) >= min_size]
+        return sorted(groups, key=len, reverse=True)
+
+    def save(self, path):
+        """Write records, blocking index and clusters to a JSON file"""
+        with open(path, 'w') as f:
+            json.dump({
+                'threshold': self.threshold,
+                'blocking': {
+                    'key_types': list(self.index.key_types),
+                    'prefix_length': self.index.prefix_length,
+                    'min_token_length': self.index.min_token_length,
+                    'max_block_size': self.index.max_block_size,
+                },
+                'records': [[record_id, doc] for record_id, doc in self.records.items()],
+                'parents': [[item, parent] for item, parent in self.clusters.parent.items()],
+                'blocks': self.index.blocks,
+                'stats': self.stats,
+            }, f)
+
+    @classmethod
+    def load(cls, path, matcher, feature_store=None):
+        """Read state written by save"""
+        with open(path) as f:
+            data = json.load(f)
+        clusterer = cls(matcher, threshold=data['threshold'], feature_store=feature_store, **data['blocking'])
+        clusterer.records = {record_id: doc for record_id, doc in data['records']}
+        clusterer.index.blocks.update(data['blocks'])
+        clusterer.index.size = len(clusterer.records)
+        clusters = clusterer.clusters
+        for item, parent in data['parents']:
+            clusters.parent[item] = parent
+        for item in clusters.parent:
+            root = clusters.find(item)
+            clusters.size[root] = clusters.size.get(root, 0) + 1
+        clusterer.stats.update(data['stats'])
+        return clusterer
+
+
+def iter_customer_records(path, id_column='id', first_row_id=0):
+    """Yield (record_id, doc) from a CSV or JSONL customer file.
+
+    Without an id column the id is the row number plus first_row_id, which lets later files
+    continue the numbering of a saved book.
+    """
+    fmt = detect_format(path)
+    if fmt == 'csv':
+        f = open(path, newline='')
+        rows = csv.DictReader(f)
+    elif fmt == 'jsonl':
+        f = None
+        rows = iter_jsonl_records(path)
+    else:
+        raise ValueError("Customer files must be CSV or JSONL")
+    try:
+        for row_number, row in enumerate(rows):
+            record_id = row.get(id_column, first_row_id + row_number)
+            yield record_id, {field: row.get(field) or '' for field in ('Name', 'Address', 'DOB', 'Gender')}
+    finally:
+        if f is not None:
+            f.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Cluster duplicate identities in a customer book.")
+    parser.add_argument('input', help="customer records (.csv or .jsonl) with Name, Address, DOB, Gender")
+    parser.add_argument('output', help="CSV of record id and cluster id")
+    parser.add_argument('--threshold', type=float, default=70, help="overall confidence to merge (default: 70)")
+    parser.add_argument('--state', help="JSON state file to resume from and update (incremental mode)")
+    parser.add_argument('--id-column', default='id',
+                        help="record id column (default: id, else the row number, continuing a saved book's numbering)")
+    parser.add_argument('--key-types', nargs='+', default=list(DEDUP_KEY_TYPES), choices=BlockingIndex.KEY_TYPES,
+                        help="blocking keys (default: %(default)s)")
+    parser.add_argument('--max-block-size', type=int, default=1000,
+                        help="ignore blocking keys shared by more records than this (default: 1000)")
+    parser.add_argument('--features', help="SQLite feature store to reuse normalized records across runs")
+    return parser
+
+
+def warn_about_ignored_options(args, clusterer):
+    """A resumed book keeps its saved settings; say so when the command line asks for others"""
+    saved = {
+        '--threshold': (clusterer.threshold, args.threshold),
+        '--key-types': (list(clusterer.index.key_types), list(args.key_types)),
+        '--max-block-size': (clusterer.index.max_block_size, args.max_block_size),
+    }
+    for option, (kept, given) in saved.items():
+        if kept != given:
+            print(f"warning: {option} {given} ignored; {args.state} was built with {kept}", file=sys.stderr)
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    matcher = KYCMatcher()
+    feature_store = FeatureStore(args.features, matcher) if args.features else None
+    if args.state and os.path.exists(args.state):
+        clusterer = DuplicateClusterer.load(args.state, matcher, feature_store=feature_store)
+        warn_about_ignored_options(args, clusterer)
+    else:
+        clusterer = DuplicateClusterer(matcher, threshold=args.threshold, key_types=args.key_types,
+                                       max_block_size=args.max_block_size, feature_store=feature_store)
+    # Row-number ids continue after the largest one already in the book
+    first_row_id = max((i for i in clusterer.records if isinstance(i, int)), default=-1) + 1
+    clusterer.add_records(iter_customer_records(args.input, args.id_column, first_row_id))
+    if feature_store is not None:
+        feature_store.close()
+    if args.state:
+        clusterer.save(args.state)
+
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['record_id', 'cluster_id', 'cluster_size'])
+        groups = clusterer.clusters.groups()
+        for root, members in groups.items():
+            for member in members:
+                writer.writerow([member, root, len(members)])
+    summary = dict(clusterer.stats, duplicate_clusters=len(clusterer.duplicate_clusters()))
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
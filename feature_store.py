@@ -0,0 +1,204 @@
+"""Persistent store of pre-normalized document features.
+
+Normalizing names and addresses and parsing dates is most of the work in scoring a pair.
+A FeatureStore keeps the output of KYCMatcher.document_features in SQLite, keyed by a hash
+of the document content and the matcher's config fingerprint, so a customer book that is
+matched again and again is only normalized once:
+
+    python feature_store.py customers.csv features.db
+
+Editing the matcher's lexicons (or bumping RULES_VERSION) changes the fingerprint, so
+features computed under the old rules are simply never read again; purge_stale removes them.
+Computing the fingerprint hashes the whole lexicon, so it is done once per batch (get_many,
+compare_pairs); single-pair compare only checks the fingerprint of the matcher's normalizer.
+"""
+import argparse
+import hashlib
+import json
+import sqlite3
+import sys
+
+from dates import ParsedDate
+from kyc_matcher import DocumentFeatures, KYCMatcher
+
+
+DOCUMENT_FIELDS = ('Name', 'Address', 'DOB', 'Gender')
+
+# SQLite limits the number of bound parameters per statement
+_QUERY_CHUNK = 500
+
+
+def content_hash(doc):
+    """Stable hash of the fields of a document that scoring looks at"""
+    values = [doc.get(field, '') for field in DOCUMENT_FIELDS]
+    return hashlib.sha1(json.dumps(values, default=str).encode()).hexdigest()
+
+
+def encode_features(features):
+    """Serialize DocumentFeatures to JSON"""
+    return json.dumps([
+        features.name, list(features.name_parts), features.address, sorted(features.abbreviation_hits),
+        features.postal_code, list(features.dob) if features.dob else None, features.gender,
+        features.has_name, features.has_address, features.has_dob, features.has_gender,
+    ])
+
+
+def decode_features(data):
+    """Inverse of encode_features"""
+    (name, name_parts, address, hits, postal_code, dob, gender,
+     has_name, has_address, has_dob, has_gender) = json.loads(data)
+    return DocumentFeatures(
+        name, tuple(name_parts), address, frozenset(hits), postal_code,
+        ParsedDate(*dob) if dob else None, gender,
+        has_name, has_address, has_dob, has_gender,
+    )
+
+
+class FeatureStore:
+    """SQLite-backed cache of KYCMatcher.document_features.
+
+    Features read or computed in this process are also kept in memory. The matcher's
+    fingerprint is checked at the start of every batch, so lexicon edits take effect with
+    the next batch: the normalizer is rebuilt if it was compiled from older lexicons and
+    the in-memory features are dropped. compare picks up edits once the normalizer has been
+    rebuilt (refresh_normalizer, load_lexicon_files, or the next batch).
+    """
+
+    def __init__(self, path, matcher):
+        self.path = path
+        self.matcher = matcher
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS features ("
+            "content_hash TEXT NOT NULL, fingerprint TEXT NOT NULL, features TEXT NOT NULL, "
+            "PRIMARY KEY (content_hash, fingerprint))"
+        )
+        self.conn.commit()
+        self.fingerprint = None
+        self.memory = {}
+        self.unflushed = 0
+        self.stats = {'memory_hits': 0, 'store_hits': 0, 'computed': 0}
+
+    def _check_fingerprint(self):
+        fingerprint = self.matcher.config_fingerprint()
+        if fingerprint != self.matcher.normalizer_fingerprint:
+            self.matcher.refresh_normalizer()
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.memory.clear()
+        return fingerprint
+
+    def get(self, doc):
+        """Features of one document"""
+        return self.get_many([doc])[0]
+
+    def get_many(self, docs):
+        """Features of each document, computing and storing the ones not seen before"""
+        return self._get_many(docs, self._check_fingerprint())
+
+    def _get_many(self, docs, fingerprint):
+        hashes = [content_hash(doc) for doc in docs]
+        missing = {h for h in hashes if h not in self.memory}
+        self.stats['memory_hits'] += len(hashes) - len(missing)
+
+        if missing:
+            missing = list(missing)
+            for start in range(0, len(missing), _QUERY_CHUNK):
+                chunk = missing[start:start + _QUERY_CHUNK]
+                rows = self.conn.execute(
+                    "SELECT content_hash, features FROM features WHERE fingerprint = ? AND content_hash IN (%s)"
+                    % ','.join('?' * len(chunk)),
+                    [fingerprint] + chunk,
+                )
+                for h, data in rows:
+                    self.memory[h] = decode_features(data)
+                    self.stats['store_hits'] += 1
+
+            new_rows = []
+            for h, doc in zip(hashes, docs):
+                if h not in self.memory:
+                    features = self.matcher.document_features(doc)
+                    self.memory[h] = features
+                    new_rows.append((h, fingerprint, encode_features(features)))
+                    self.stats['computed'] += 1
+            if new_rows:
+                self.conn.executemany("INSERT OR REPLACE INTO features VALUES (?, ?, ?)", new_rows)
+                self.unflushed += len(new_rows)
+                if self.unflushed >= _QUERY_CHUNK:
+                    self.flush()
+
+        return [self.memory[h] for h in hashes]
+
+    def flush(self):
+        """Commit features computed since the last flush"""
+        self.conn.commit()
+        self.unflushed = 0
+
+    def compare(self, doc_a, doc_b):
+        """compare_documents using stored features"""
+        # Like ResultCache, only hash the lexicons again once the normalizer has changed
+        if self.fingerprint != self.matcher.normalizer_fingerprint:
+            self._check_fingerprint()
+        features_a, features_b = self._get_many([doc_a, doc_b], self.fingerprint)
+        return self.matcher.compare_features(features_a, features_b)
+
+    def compare_pairs(self, pairs):
+        """compare_documents for each (doc_a, doc_b), fetching all features in one pass"""
+        pairs = list(pairs)
+        features = self.get_many([doc for pair in pairs for doc in pair])
+        return [self.matcher.compare_features(features[i], features[i + 1]) for i in range(0, len(features), 2)]
+
+    def purge_stale(self):
+        """Delete features computed under any other fingerprint; returns the number removed"""
+        fingerprint = self._check_fingerprint()
+        removed = self.conn.execute("DELETE FROM features WHERE fingerprint != ?", (fingerprint,)).rowcount
+        self.conn.commit()
+        return removed
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM features").fetchone()[0]
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Precompute normalized features for a customer book.")
+    parser.add_argument('input', help="customer records (.csv or .jsonl) with Name, Address, DOB, Gender")
+    parser.add_argument('store', help="SQLite feature store to create or update")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="records per write (default: 10000)")
+    parser.add_argument('--purge', action='store_true', help="delete features from older lexicons or rules")
+    return parser
+
+
+def main(argv=None):
+    from dedup import iter_customer_records
+
+    args = build_parser().parse_args(argv)
+    with FeatureStore(args.store, KYCMatcher()) as store:
+        chunk = []
+        for _, doc in iter_customer_records(args.input):
+            chunk.append(doc)
+            if len(chunk) >= args.chunk_size:
+                store.get_many(chunk)
+                store.memory.clear()
+                chunk = []
+        if chunk:
+            store.get_many(chunk)
+        summary = dict(store.stats, fingerprint=store.fingerprint)
+        if args.purge:
+            summary['purged'] = store.purge_stale()
+        summary['stored'] = len(store)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,173 @@
+import time
+from functools import wraps
+
+# Matcher methods timed under each stage; the stages do not call into each other
+STAGE_METHODS = {
+    'normalization': ('normalize_name', 'normalize_address', 'normalize_company_name'),
+    'fuzzy': ('_fuzzy_score',),
+    'scoring': ('_overall_confidence', '_match_category'),
+}
+ENTRY_POINTS = ('compare_documents', 'compare_batch')
+
+NAME_BRANCHES = ('exact', 'swapped', 'middle_name', 'containment', 'initials', 'fuzzy')
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Instrumentation:
+    """Per-stage timers and decision counters for a KYCMatcher.
+
+    install() shadows the matcher's stage methods with timing wrappers on the instance;
+    uninstall() removes them again, so a matcher without instrumentation runs its plain
+    methods with no added cost. Use KYCMatcher.enable_instrumentation() rather than
+    installing this directly.
+
+    Stages are 'normalization' (names, addresses, companies), 'date_parsing', 'fuzzy'
+    (token sort/set ratios) and 'scoring' (weights, penalties and category), plus the
+    compare_documents/compare_batch entry points as a whole. get_name_similarity
+    decisions are counted per branch and final categories per category.
+    """
+
+    def __init__(self, matcher):
+        self.matcher = matcher
+        self.installed = False
+        self.timers = {}
+        self.name_branches = dict.fromkeys(NAME_BRANCHES, 0)
+        self.categories = {}
+
+    def reset(self):
+        """Zero every timer and counter.
+
+        The installed wrappers hold these very objects, so they are cleared in place.
+        """
+        for entry in self.timers.values():
+            entry[0] = entry[1] = 0
+        for branch in self.name_branches:
+            self.name_branches[branch] = 0
+        self.categories.clear()
+
+    def add_name_branches(self, counts):
+        """Count name decisions made outside _match_names, given as (branch, count) pairs"""
+        for branch, count in counts:
+            self.name_branches[branch] += count
+
+    def add_categories(self, counts):
+        """Count categories assigned outside _match_category, given as (category, count) pairs"""
+        for category, count in counts:
+            self.categories[category] = self.categories.get(category, 0) + count
+
+    def add_time(self, key, calls, elapsed_ns):
+        """Add work timed outside the wrapped methods to a stage"""
+        entry = self.timers.setdefault(key, [0, 0])
+        entry[0] += calls
+        entry[1] += elapsed_ns
+
+    def _timed(self, key, func):
+        timers = self.timers
+        timers.setdefault(key, [0, 0])
+        clock = time.perf_counter_ns
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                entry = timers[key]
+                entry[0] += 1
+                entry[1] += clock() - started
+        return wrapper
+
+    def install(self):
+        if self.installed:
+            return
+        matcher = self.matcher
+        for stage, methods in STAGE_METHODS.items():
+            for name in methods:
+                setattr(matcher, name, self._timed(stage, getattr(matcher, name)))
+        for name in ENTRY_POINTS:
+            setattr(matcher, name, self._timed(name, getattr(matcher, name)))
+
+        match_names = matcher._match_names
+        name_branches = self.name_branches
+
+        @wraps(match_names)
+        def counted_match_names(norm1, norm2):
+            result = match_names(norm1, norm2)
+            name_branches[result[1]] += 1
+            return result
+        matcher._match_names = counted_match_names
+
+        match_category = matcher._match_category
+        categories = self.categories
+
+        @wraps(match_category)
+        def counted_match_category(overall_confidence, has_caution):
+            category = match_category(overall_confidence, has_caution)
+            categories[category] = categories.get(category, 0) + 1
+            return category
+        matcher._match_category = counted_match_category
+
+        # The date engine is its own object, so its parse method is wrapped there
+        date_engine = matcher.date_engine
+        date_engine.parse = self._timed('date_parsing', date_engine.parse)
+        self._date_engine = date_engine
+        self.installed = True
+
+    def uninstall(self):
+        if not self.installed:
+            return
+        matcher = self.matcher
+        for name in [n for methods in STAGE_METHODS.values() for n in methods] + list(ENTRY_POINTS):
+            matcher.__dict__.pop(name, None)
+        matcher.__dict__.pop('_match_names', None)
+        matcher.__dict__.pop('_match_category', None)
+        self._date_engine.__dict__.pop('parse', None)
+        self.installed = False
+
+    def stats(self):
+        """Return timers, branch and category counters and cache statistics as a dict"""
+        stages = {}
+        for key, (calls, total_ns) in self.timers.items():
+            stages[key] = {
+                'calls': calls,
+                'seconds': total_ns / 1e9,
+                'mean_us': total_ns / calls / 1000 if calls else 0.0,
+            }
+        return {
+            'stages': stages,
+            'name_branches': dict(self.name_branches),
+            'match_categories': dict(self.categories),
+            'caches': self.matcher.cache_stats(),
+        }
+
+    def prometheus(self, prefix='kyc'):
+        """Render the current statistics in the Prometheus text exposition format"""
+        stats = self.stats()
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f'# HELP {prefix}_{name} {help_text}')
+            lines.append(f'# TYPE {prefix}_{name} {kind}')
+            for labels, value in samples:
+                label_text = ','.join(f'{k}="{_escape_label(v)}"' for k, v in labels.items())
+                lines.append(f'{prefix}_{name}{{{label_text}}} {value}')
+
+        metric('stage_seconds_total', 'counter', 'Time spent in each matcher stage.',
+               [({'stage': stage}, f"{s['seconds']:.9f}") for stage, s in sorted(stats['stages'].items())])
+        metric('stage_calls_total', 'counter', 'Calls into each matcher stage.',
+               [({'stage': stage}, s['calls']) for stage, s in sorted(stats['stages'].items())])
+        metric('name_branch_total', 'counter', 'Name comparisons decided by each get_name_similarity rule.',
+               [({'branch': branch}, count) for branch, count in stats['name_branches'].items()])
+        metric('match_category_total', 'counter', 'Comparisons per match category.',
+               [({'category': category}, count) for category, count in sorted(stats['match_categories'].items())])
+        caches = sorted(stats['caches'].items())
+        metric('cache_hits_total', 'counter', 'Cache hits per matcher cache.',
+               [({'cache': cache}, s['hits']) for cache, s in caches])
+        metric('cache_misses_total', 'counter', 'Cache misses per matcher cache.',
+               [({'cache': cache}, s['misses']) for cache, s in caches])
+        metric('cache_hit_ratio', 'gauge', 'Hit ratio per matcher cache.',
+               [({'cache': cache}, f"{s['hit_rate']:.6f}") for cache, s in caches])
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,385 @@
+"""Resumable, checkpointed scoring jobs for pair files that take hours.
+
+A job lives in a directory shared by every worker. `init` splits the input into shards
+and records them in a SQLite work queue (queue.db); `work` starts worker processes that
+claim shards, score them with KYCMatcher.compare_batch and checkpoint each finished
+shard's output; `merge` writes the shard outputs, in input order, to the final file.
+Workers on several hosts can run `work` against the same directory on a shared
+filesystem (one with working file locks, which SQLite needs).
+
+A shard's output is written to a temporary file and renamed into place before the shard
+is marked done, so a crash never leaves a partial shard behind. A claimed shard holds a
+lease that the worker renews between chunks; if the worker dies, the lease runs out and
+another worker takes the shard over. Workers on the same host notice when a worker's
+process is gone and take its shards back straight away. Rerunning the same command
+resumes the job:
+
+    python jobs.py run pairs.csv job_dir scores.csv --shard-size 100000 --workers 8
+    python jobs.py work job_dir --workers 8        # on more hosts
+    python jobs.py status job_dir
+
+A pair that cannot be scored keeps its row with the exception in the error column. A
+shard that cannot be processed at all (or keeps killing its worker) is marked failed after
+MAX_ATTEMPTS claims, with its error shown by status; `retry` queues failed shards again.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import sys
+import time
+
+import pandas as pd
+
+import batch_runner
+from batch_runner import FORMATS, ResultWriter, read_pair_chunks, score_chunk
+
+QUEUE_FILE = 'queue.db'
+STATUSES = ('pending', 'running', 'done', 'failed')
+
+# Claims of one shard before it is marked failed instead of being handed out again
+MAX_ATTEMPTS = 3
+
+# Columns added to the shards table after the first release, with their types
+_ADDED_SHARD_COLUMNS = (('error', 'TEXT'), ('error_rows', 'INTEGER'))
+
+
+def _connect(job_dir):
+    conn = sqlite3.connect(os.path.join(job_dir, QUEUE_FILE), timeout=60, isolation_level=None)
+    conn.execute("PRAGMA busy_timeout = 60000")
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(shards)")}
+    if columns:
+        for name, kind in _ADDED_SHARD_COLUMNS:
+            if name not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE shards ADD COLUMN {name} {kind}")
+                except sqlite3.OperationalError:
+                    pass  # another worker added it first
+    return conn
+
+
+def _shard_path(job_dir, kind, shard_id):
+    return os.path.join(job_dir, kind, f'shard-{shard_id:06d}.pkl')
+
+
+def init_job(input_path, job_dir, shard_size=100000, input_format=None, id_column='id', chunk_size=10000):
+    """Split input_path into shards under job_dir and queue them; returns the number of shards.
+
+    Does nothing (and returns the existing shard count) if job_dir already holds a job for
+    the same input and settings, so it is safe to call again when resuming; a job for
+    anything else raises ValueError.
+    """
+    os.makedirs(os.path.join(job_dir, 'inputs'), exist_ok=True)
+    os.makedirs(os.path.join(job_dir, 'outputs'), exist_ok=True)
+    conn = _connect(job_dir)
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            "shard_id INTEGER PRIMARY KEY, rows INTEGER NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+            "owner TEXT, lease_expires REAL, attempts INTEGER NOT NULL DEFAULT 0, output_rows INTEGER, "
+            "error TEXT, error_rows INTEGER)"
+        )
+        ready = conn.execute("SELECT value FROM meta WHERE key = 'ready'").fetchone()
+        if ready:
+            meta = {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+            given = {'input': os.path.abspath(input_path), 'shard_size': shard_size, 'id_column': id_column,
+                     'chunk_size': chunk_size}
+            different = [f"{key} {value!r} (job has {meta.get(key)!r})" for key, value in given.items()
+                         if meta.get(key) != value]
+            if different:
+                raise ValueError(f"{job_dir} holds a job with other settings: {', '.join(different)}; "
+                                 f"use a new job directory or the job's own settings")
+            return conn.execute("SELECT COUNT(*) FROM shards").fetchone()[0]
+
+        # Interrupted splitting starts over; shard files are simply overwritten
+        conn.execute("DELETE FROM shards")
+        shard_count = 0
+        for shard in read_pair_chunks(input_path, shard_size, input_format):
+            shard.reset_index(drop=True).to_pickle(_shard_path(job_dir, 'inputs', shard_count))
+            conn.execute("INSERT INTO shards (shard_id, rows) VALUES (?, ?)", (shard_count, len(shard)))
+            shard_count += 1
+        meta = {'input': os.path.abspath(input_path), 'shard_size': shard_size, 'id_column': id_column,
+                'chunk_size': chunk_size, 'created': time.time(), 'ready': 1}
+        conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                         [(key, json.dumps(value)) for key, value in meta.items()])
+        return shard_count
+    finally:
+        conn.close()
+
+
+def job_meta(job_dir):
+    """The settings recorded by init_job"""
+    conn = _connect(job_dir)
+    try:
+        return {key: json.loads(value) for key, value in conn.execute("SELECT key, value FROM meta")}
+    finally:
+        conn.close()
+
+
+def claim_shard(conn, owner, lease_seconds, max_attempts=MAX_ATTEMPTS):
+    """Atomically take a pending shard (or one whose lease ran out); returns its id or None.
+
+    A shard that has already been claimed max_attempts times is marked failed instead,
+    so a shard that keeps killing its worker cannot hold up the job forever.
+    """
+    now = time.time()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(
+            "UPDATE shards SET status = 'failed', lease_expires = NULL, "
+            "error = COALESCE(error, 'worker stopped without finishing the shard ' || attempts || ' times') "
+            "WHERE (status = 'pending' OR (status = 'running' AND lease_expires < ?)) AND attempts >= ?",
+            (now, max_attempts))
+        row = conn.execute(
+            "SELECT shard_id FROM shards WHERE status = 'pending' "
+            "OR (status = 'running' AND lease_expires < ?) ORDER BY shard_id LIMIT 1", (now,)
+        ).fetchone()
+        if row is not None:
+            conn.execute("UPDATE shards SET status = 'running', owner = ?, lease_expires = ?, "
+                         "attempts = attempts + 1 WHERE shard_id = ?", (owner, now + lease_seconds, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return row[0] if row is not None else None
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def release_dead_local_shards(conn):
+    """Put back shards held by workers on this host that no longer exist (e.g. after a crash or
+    restart), instead of waiting for their leases to run out; returns how many were released"""
+    host = socket.gethostname()
+    released = 0
+    for shard_id, owner in conn.execute("SELECT shard_id, owner FROM shards WHERE status = 'running'").fetchall():
+        owner_host, _, pid = owner.rpartition('-')
+        if owner_host == host and pid.isdigit() and not _pid_alive(int(pid)):
+            released += conn.execute("UPDATE shards SET status = 'pending', lease_expires = NULL "
+                                     "WHERE shard_id = ? AND owner = ? AND status = 'running'",
+                                     (shard_id, owner)).rowcount
+    return released
+
+
+def _renew_lease(conn, shard_id, owner, lease_seconds):
+    """Extend our lease; False if another worker has taken the shard over"""
+    return conn.execute("UPDATE shards SET lease_expires = ? WHERE shard_id = ? AND owner = ? AND status = 'running'",
+                        (time.time() + lease_seconds, shard_id, owner)).rowcount == 1
+
+
+def process_shard(job_dir, conn, shard_id, owner, lease_seconds, chunk_size, id_column):
+    """Score one claimed shard and checkpoint its output; returns the rows written, or None
+    if the lease was lost to another worker part way through"""
+    shard = pd.read_pickle(_shard_path(job_dir, 'inputs', shard_id))
+    frames = []
+    for start in range(0, len(shard), chunk_size):
+        frames.append(score_chunk(shard.iloc[start:start + chunk_size], id_column))
+        if not _renew_lease(conn, shard_id, owner, lease_seconds):
+            return None
+    output = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    # Pairs score_chunk could not score keep their row, with the exception in the error column
+    error_rows = int((output['error'] != '').sum()) if 'error' in output else 0
+
+    final_path = _shard_path(job_dir, 'outputs', shard_id)
+    temp_path = f'{final_path}.{owner}.tmp'
+    output.to_pickle(temp_path)
+    os.replace(temp_path, final_path)
+    # A worker whose lease ran out may still finish the same shard; both outputs are identical
+    conn.execute("UPDATE shards SET status = 'done', lease_expires = NULL, output_rows = ?, error = NULL, "
+                 "error_rows = ? WHERE shard_id = ?", (len(output), error_rows, shard_id))
+    return len(output)
+
+
+def fail_shard(conn, shard_id, owner, error, max_attempts=MAX_ATTEMPTS):
+    """Record why a claimed shard could not be scored: it goes back to the queue, or is marked
+    failed once it has been tried max_attempts times"""
+    conn.execute("UPDATE shards SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                 "lease_expires = NULL, error = ? WHERE shard_id = ? AND owner = ? AND status = 'running'",
+                 (max_attempts, error, shard_id, owner))
+
+
+def work(job_dir, lease_seconds=600, cache_size=65536, max_attempts=MAX_ATTEMPTS):
+    """Claim and score shards until none are left; returns the number of shards this process scored"""
+    meta = job_meta(job_dir)
+    owner = f'{socket.gethostname()}-{os.getpid()}'
+    batch_runner._init_worker(cache_size)
+    conn = _connect(job_dir)
+    scored = 0
+    try:
+        release_dead_local_shards(conn)
+        while True:
+            shard_id = claim_shard(conn, owner, lease_seconds, max_attempts)
+            if shard_id is None:
+                return scored
+            try:
+                written = process_shard(job_dir, conn, shard_id, owner, lease_seconds,
+                                        meta['chunk_size'], meta['id_column'])
+            except Exception as e:
+                fail_shard(conn, shard_id, owner, f"{type(e).__name__}: {e}", max_attempts)
+                continue
+            if written is not None:
+                scored += 1
+    finally:
+        conn.close()
+
+
+def retry_failed(job_dir):
+    """Queue failed shards again with a fresh attempt count; returns how many were queued"""
+    conn = _connect(job_dir)
+    try:
+        return conn.execute("UPDATE shards SET status = 'pending', attempts = 0, error = NULL "
+                            "WHERE status = 'failed'").rowcount
+    finally:
+        conn.close()
+
+
+def run_workers(job_dir, workers=1, lease_seconds=600, cache_size=65536):
+    """Run work() in this process (workers=1) or in that many child processes"""
+    if workers == 1:
+        return work(job_dir, lease_seconds, cache_size)
+    processes = [multiprocessing.Process(target=work, args=(job_dir, lease_seconds, cache_size))
+                 for _ in range(workers)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    failed = [process.exitcode for process in processes if process.exitcode]
+    if failed:
+        raise RuntimeError(f"{len(failed)} worker processes failed (exit codes {failed})")
+
+
+def job_status(job_dir):
+    """Shard and row counts per status, the errors of failed shards and the number of pairs
+    that could not be scored in finished ones"""
+    conn = _connect(job_dir)
+    try:
+        status = {name: {'shards': 0, 'rows': 0} for name in STATUSES}
+        for name, shards, rows in conn.execute("SELECT status, COUNT(*), SUM(rows) FROM shards GROUP BY status"):
+            status[name] = {'shards': shards, 'rows': rows}
+        expired = conn.execute("SELECT COUNT(*) FROM shards WHERE status = 'running' AND lease_expires < ?",
+                               (time.time(),)).fetchone()[0]
+        failures = dict(conn.execute("SELECT shard_id, error FROM shards WHERE status = 'failed' ORDER BY shard_id"))
+        error_rows = conn.execute("SELECT COALESCE(SUM(error_rows), 0) FROM shards WHERE status = 'done'").fetchone()[0]
+        return dict(status, expired_leases=expired, failed_shards=failures, error_rows=error_rows)
+    finally:
+        conn.close()
+
+
+def merge_job(job_dir, output_path, output_format=None):
+    """Write every shard's output to output_path in input order; returns the row count.
+
+    Refuses to run until all shards are done (naming the error of any failed shard), and
+    checks each shard's output has exactly as many rows as its input.
+    """
+    conn = _connect(job_dir)
+    try:
+        shards = conn.execute("SELECT shard_id, rows, status, output_rows FROM shards ORDER BY shard_id").fetchall()
+        failed = conn.execute("SELECT shard_id, error FROM shards WHERE status = 'failed' ORDER BY shard_id").fetchall()
+    finally:
+        conn.close()
+    if failed:
+        shard_id, error = failed[0]
+        raise RuntimeError(f"{len(failed)} shards failed (first: shard {shard_id}: {error})")
+    unfinished = [shard_id for shard_id, _, status, _ in shards if status != 'done']
+    if unfinished:
+        raise RuntimeError(f"{len(unfinished)} shards are not done yet (first: {unfinished[0]})")
+    with ResultWriter(output_path, output_format) as writer:
+        for shard_id, rows, _, output_rows in shards:
+            output = pd.read_pickle(_shard_path(job_dir, 'outputs', shard_id))
+            if len(output) != rows or output_rows != rows:
+                raise RuntimeError(f"Shard {shard_id} has {len(output)} output rows for {rows} input rows")
+            if rows:
+                writer.write(output)
+    return writer.rows
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Resumable sharded scoring of KYC document pairs.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    def add_work_options(command):
+        command.add_argument('--workers', type=int, default=1, help="worker processes on this host (default: 1)")
+        command.add_argument('--lease-seconds', type=float, default=600,
+                             help="how long a silent worker keeps its shard (default: 600)")
+
+    init = commands.add_parser('init', help="split a pair file into queued shards")
+    init.add_argument('input', help="pair file (.csv, .parquet, .jsonl)")
+    init.add_argument('job_dir', help="job directory")
+
+    work_command = commands.add_parser('work', help="claim and score shards until none are left")
+    work_command.add_argument('job_dir', help="job directory")
+    add_work_options(work_command)
+
+    status = commands.add_parser('status', help="print shard counts per status")
+    status.add_argument('job_dir', help="job directory")
+
+    retry = commands.add_parser('retry', help="queue failed shards again")
+    retry.add_argument('job_dir', help="job directory")
+
+    merge = commands.add_parser('merge', help="write the finished shards to one result file")
+    merge.add_argument('job_dir', help="job directory")
+    merge.add_argument('output', help="result file (.csv, .parquet, .jsonl)")
+
+    run = commands.add_parser('run', help="init (unless already done), work, then merge")
+    run.add_argument('input', help="pair file (.csv, .parquet, .jsonl)")
+    run.add_argument('job_dir', help="job directory")
+    run.add_argument('output', help="result file (.csv, .parquet, .jsonl)")
+    add_work_options(run)
+
+    for command in (init, run):
+        command.add_argument('--shard-size', type=int, default=100000, help="pairs per shard (default: 100000)")
+        command.add_argument('--chunk-size', type=int, default=10000,
+                             help="pairs scored between lease renewals (default: 10000)")
+        command.add_argument('--input-format', choices=FORMATS, help="override the input format")
+        command.add_argument('--id-column', default='id', help="column copied to the output (default: id)")
+    for command in (merge, run):
+        command.add_argument('--output-format', choices=FORMATS, help="override the output format")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == 'retry':
+        print(f"{retry_failed(args.job_dir)} failed shards queued again", file=sys.stderr)
+        return 0
+    if args.command in ('init', 'run'):
+        try:
+            shards = init_job(args.input, args.job_dir, args.shard_size, args.input_format, args.id_column,
+                              args.chunk_size)
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 2
+        print(f"{shards} shards queued in {args.job_dir}", file=sys.stderr)
+    if args.command in ('work', 'run'):
+        run_workers(args.job_dir, args.workers, args.lease_seconds)
+    if args.command in ('status', 'work', 'run'):
+        print(json.dumps(job_status(args.job_dir)), file=sys.stderr)
+    if args.command in ('merge', 'run'):
+        status = job_status(args.job_dir)
+        if args.command == 'run' and status['pending']['shards'] + status['running']['shards']:
+            print("Other workers are still scoring shards; run merge once they finish", file=sys.stderr)
+            return 1
+        if status['failed']['shards']:
+            shard_id, error = next(iter(status['failed_shards'].items()))
+            print(f"{status['failed']['shards']} shards failed (first: shard {shard_id}: {error}); "
+                  f"nothing was merged; fix the cause and use the retry command", file=sys.stderr)
+            return 1
+        rows = merge_job(args.job_dir, args.output, args.output_format)
+        print(f"{rows} rows written to {args.output}" +
+              (f", {status['error_rows']} of them could not be scored (see the error column)"
+               if status['error_rows'] else ''), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
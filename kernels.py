@@ -0,0 +1,230 @@
+"""Vectorized NumPy kernels for batch scoring.
+
+The scalar KYCMatcher methods remain the reference implementation; each kernel here
+reproduces one of them over whole columns so compare_batch does not need a Python call
+per row. Anything a kernel cannot decide exactly is left for the scalar code.
+"""
+import datetime
+
+import numpy as np
+
+
+PAD = -1
+
+# datetime64[D] counts days from 1970-01-01; ParsedDate ordinals count from 0001-01-01
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+_NAT = np.datetime64('NaT').astype(np.int64)
+
+# Marks pairs the name rules leave to the scalar matcher (fuzzy fallback, empty names)
+UNDECIDED = -1
+
+# Rules of KYCMatcher._match_name_rules in order, as named by instrumentation, and their scores
+NAME_RULES = ('exact', 'swapped', 'middle_name', 'containment', 'initials')
+_NAME_RULE_SCORES = np.array([100, 95, 80, 85, 80])
+
+
+def encode_tokens(names):
+    """Encode the space-separated tokens of each name against one shared vocabulary.
+
+    Returns (tokens, lengths, vocabulary): tokens is an int32 matrix with one row per name,
+    padded with PAD, and vocabulary lists the token string of each id.
+    """
+    vocabulary = {}
+    rows = [[vocabulary.setdefault(token, len(vocabulary)) for token in name.split()] for name in names]
+    width = max(map(len, rows), default=0) or 1
+    tokens = np.full((len(rows), width), PAD, dtype=np.int32)
+    for i, row in enumerate(rows):
+        tokens[i, :len(row)] = row
+    lengths = np.fromiter(map(len, rows), dtype=np.int32, count=len(rows))
+    return tokens, lengths, list(vocabulary)
+
+
+def _initials_match(tokens, dotted, stripped, other, other_valid, other_last, first_letters):
+    """Every dotted token of one name, stripped of dots, is the first letter of a non-last token of the other"""
+    initials = stripped[tokens]
+    letters = first_letters[other]
+    letters_ok = other_valid & (other != other_last[:, None])
+    found = ((initials[:, :, None] == letters[:, None, :]) & letters_ok[:, None, :]).any(axis=2)
+    return (found | ~dotted).all(axis=1)
+
+
+def name_rule_scores(names, index_a, index_b):
+    """Rule-based scores for the name pairs (names[index_a[k]], names[index_b[k]]).
+
+    names must be distinct strings from KYCMatcher.normalize_name. Returns an int array of
+    the scores of the rules picked by name_rules, with UNDECIDED where no rule applies or
+    where either name is empty.
+    """
+    return rule_scores(name_rules(names, index_a, index_b))
+
+
+def rule_scores(rules):
+    """Scores of the NAME_RULES indexes returned by name_rules, keeping UNDECIDED"""
+    return np.where(rules == UNDECIDED, UNDECIDED, _NAME_RULE_SCORES[rules])
+
+
+def name_rules(names, index_a, index_b):
+    """Index into NAME_RULES of the rule deciding each name pair, or UNDECIDED.
+
+    Applies the exact, swapped, middle name, containment and initials rules of
+    KYCMatcher._match_name_rules in the same order; arguments as for name_rule_scores.
+    """
+    index_a = np.asarray(index_a, dtype=np.intp)
+    index_b = np.asarray(index_b, dtype=np.intp)
+    rules = np.full(len(index_a), UNDECIDED, dtype=np.int64)
+    if not len(index_a):
+        return rules
+
+    tokens, lengths, vocabulary = encode_tokens(names)
+    # Per-token attributes for the initials rule; stripped tokens and first letters share ids
+    strings = {}
+    dotted = np.array(['.' in token for token in vocabulary] + [False], dtype=bool)
+    stripped = np.array([strings.setdefault(token.strip('.'), len(strings)) for token in vocabulary] + [-1])
+    first_letters = np.array([strings.setdefault(token[0].lower(), len(strings)) for token in vocabulary] + [-2])
+
+    a, b = tokens[index_a], tokens[index_b]
+    length_a, length_b = lengths[index_a], lengths[index_b]
+    valid_a, valid_b = a != PAD, b != PAD
+    # PAD indexes the trailing sentinel entries of the attribute arrays
+    dotted_a, dotted_b = dotted[a] & valid_a, dotted[b] & valid_b
+
+    exact = index_a == index_b
+    nonempty = (length_a > 0) & (length_b > 0)
+    rows = np.arange(len(index_a))
+    first_a, first_b = a[:, 0], b[:, 0]
+    last_a = a[rows, np.maximum(length_a - 1, 0)]
+    last_b = b[rows, np.maximum(length_b - 1, 0)]
+
+    same = (a[:, :, None] == b[:, None, :]) & valid_a[:, :, None] & valid_b[:, None, :]
+    swapped = nonempty & (same.any(axis=2) | ~valid_a).all(axis=1) & (same.any(axis=1) | ~valid_b).all(axis=1)
+    same_last = nonempty & (last_a == last_b)
+    middle_name = same_last & (length_a != length_b) & (first_a == first_b)
+
+    # Substring containment only needs checking where the earlier rules did not decide
+    open_rows = nonempty & ~(exact | swapped | middle_name)
+    contained = np.zeros(len(index_a), dtype=bool)
+    if open_rows.any():
+        strings_a = np.asarray(names, dtype=str)[index_a[open_rows]]
+        strings_b = np.asarray(names, dtype=str)[index_b[open_rows]]
+        contained[open_rows] = (np.char.find(strings_b, strings_a) >= 0) | (np.char.find(strings_a, strings_b) >= 0)
+
+    any_dot_a, any_dot_b = dotted_a.any(axis=1), dotted_b.any(axis=1)
+    initials = same_last & np.where(
+        any_dot_a,
+        _initials_match(a, dotted_a, stripped, b, valid_b, last_b, first_letters),
+        any_dot_b & _initials_match(b, dotted_b, stripped, a, valid_a, last_a, first_letters),
+    )
+
+    return np.select(
+        [exact, swapped, middle_name, contained, initials],
+        range(len(NAME_RULES)),
+        default=UNDECIDED,
+    )
+
+
+def category_codes(values):
+    """Case-insensitive integer codes for a column of strings (equal codes for equal values)"""
+    _, codes = np.unique(np.char.lower(np.asarray(values, dtype=str)), return_inverse=True)
+    return codes.reshape(-1)
+
+
+def gender_scores(codes_a, codes_b):
+    """100 where the gender codes agree, else 0 (as compare_documents)"""
+    return np.where(codes_a == codes_b, 100, 0)
+
+
+def date_arrays(parsed_dates):
+    """datetime64[D] arrays of ParsedDate values and of their month/day swapped dates, NaT where missing"""
+    dates = np.array([p.ordinal - _EPOCH_ORDINAL if p else _NAT for p in parsed_dates], dtype=np.int64)
+    swapped = np.array([p.swapped_ordinal - _EPOCH_ORDINAL if p and p.swapped_ordinal else _NAT
+                        for p in parsed_dates], dtype=np.int64)
+    return dates.view('datetime64[D]'), swapped.view('datetime64[D]')
+
+
+def dob_scores(dates_a, dates_b, swapped_b):
+    """DOB scores of KYCMatcher._score_parsed_dates: 100 exact, 50 month/day swap or same
+    day and month, 80 within 5 days, 0 otherwise or when either date is missing"""
+    given = ~(np.isnat(dates_a) | np.isnat(dates_b))
+    months_a = dates_a.astype('datetime64[M]')
+    months_b = dates_b.astype('datetime64[M]')
+    same_day_month = (
+        (months_a.astype(np.int64) % 12 == months_b.astype(np.int64) % 12)
+        & (dates_a - months_a == dates_b - months_b)
+    )
+    distance = np.abs((dates_a - dates_b).astype(np.int64))
+    return np.select(
+        [~given, dates_a == dates_b, dates_a == swapped_b, same_day_month, distance <= 5],
+        [0, 100, 50, 50, 80],
+        default=0,
+    )
+
+
+def postal_arrays(postal_codes):
+    """(values, widths) int64 arrays for postal code strings; width 0 marks a missing code.
+
+    Codes are compared as strings for equality, so the digit count is kept alongside the value.
+    """
+    values = np.array([int(code) if code else 0 for code in postal_codes], dtype=np.int64)
+    widths = np.array([len(code) if code else 0 for code in postal_codes], dtype=np.int64)
+    return values, widths
+
+
+def postal_scores(values_a, widths_a, values_b, widths_b):
+    """Postal code boost of KYCMatcher._adjust_address_score: 25 equal, 15 within 5, else 0"""
+    given = (widths_a > 0) & (widths_b > 0)
+    equal = given & (values_a == values_b) & (widths_a == widths_b)
+    near = given & (np.abs(values_a - values_b) <= 5)
+    return np.select([equal, near], [25, 15], default=0)
+
+
+def adjust_address_scores(base_scores, abbreviation_counts, postal_boosts):
+    """Vectorized KYCMatcher._adjust_address_score from the fuzzy scores and postal boosts"""
+    return np.minimum(100, np.maximum(base_scores - 2 * abbreviation_counts, 0) + postal_boosts)
+
+
+def overall_confidences(name, address, dob, gender, has_caution, genders_given, dobs_given, weights, penalties):
+    """KYCMatcher._overall_confidence over columns, with the same float operations in the same
+    order so every value is bit-for-bit the scalar result.
+
+    Weights and penalties may also be arrays shaped (configs, 1), giving one row of
+    confidences per configuration.
+    """
+    confidence = (
+        name * weights['name'] +
+        address * weights['address'] +
+        dob * weights['dob'] +
+        gender * weights['gender']
+    )
+    confidence = np.where((name < 50) | (address < 40), confidence * penalties['field_mismatch'], confidence)
+    confidence = np.where((gender == 0) & genders_given, confidence * penalties['gender_mismatch'], confidence)
+    confidence = np.where(dob == 50, confidence * penalties['dob_ambiguity'], confidence)
+    confidence = np.where((dob == 0) & dobs_given, confidence * penalties['dob_mismatch'], confidence)
+    return np.where(has_caution & (dob == 50), np.minimum(confidence, penalties['caution_cap']), confidence)
+
+
+def match_category_codes(confidence, has_caution, thresholds):
+    """Index into MATCH_CATEGORIES of KYCMatcher._match_category for each row (thresholds
+    may be arrays shaped (configs, 1) like the weights of overall_confidences)"""
+    return np.select(
+        [confidence >= thresholds['high'],
+         confidence >= thresholds['medium_to_high'],
+         (confidence >= thresholds['medium']) & has_caution,
+         confidence >= thresholds['medium'],
+         confidence >= thresholds['low_to_medium']],
+        [5, 4, 3, 2, 1],
+        default=0,
+    ).astype(np.uint8)
+
+
+def round_hundredths(values):
+    """Python's round(value, 2) * 100 as integers.
+
+    Scaling by 100 can land just beside a .5 boundary that round() resolves exactly, so
+    values near one are rounded with round() itself.
+    """
+    scaled = values * 100
+    hundredths = np.floor(scaled + 0.5)
+    near_half = np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6
+    for i in np.flatnonzero(near_half).tolist():
+        hundredths[i] = round(round(float(values[i]), 2) * 100)
+    return hundredths.astype(np.int64)
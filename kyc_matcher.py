@@ -0,0 +1,921 @@
+"""KYC document matching: name, address, DOB and gender scoring with no UI dependencies.
+
+Worker processes and CLIs import this module directly, so heavy libraries are only
+imported on first use: fuzzywuzzy when a fuzzy score is needed, dateutil for dates
+outside the fast-path formats (see dates.py), and NumPy/pandas by compare_batch.
+"""
+import datetime
+import hashlib
+import json
+import re
+import time
+from collections import namedtuple
+
+from dates import DateEngine
+from instrumentation import Instrumentation
+from lexicon import load_abbreviations, load_company_aliases
+from normalization import TextNormalizer
+
+_POSTAL_CODE = re.compile(r'\b\d{5,6}\b')
+
+# Bump whenever a change to the scoring rules should invalidate stored features and results
+RULES_VERSION = 2
+
+# Match categories in increasing order of confidence; CompactResults stores their index
+MATCH_CATEGORIES = (
+    "No match",
+    "Low-to-medium confidence match",
+    "Medium confidence match",
+    "Medium confidence match with caution",
+    "Medium-to-high confidence match",
+    "High confidence match",
+)
+
+# Normalized per-document features consumed by compare_features; the has_* flags record
+# whether the raw field was present, which the scoring rules depend on
+DocumentFeatures = namedtuple('DocumentFeatures', [
+    'name', 'name_parts', 'address', 'abbreviation_hits', 'postal_code', 'dob', 'gender',
+    'has_name', 'has_address', 'has_dob', 'has_gender',
+])
+
+
+# fuzzywuzzy.fuzz, imported by _fuzz on first use
+_fuzz_module = None
+
+
+def _fuzz():
+    global _fuzz_module
+    if _fuzz_module is None:
+        from fuzzywuzzy import fuzz
+        _fuzz_module = fuzz
+    return _fuzz_module
+
+
+class KYCMatcher:
+    def __init__(self, cache_size=65536):
+        # Common abbreviations for addresses
+        self.address_abbreviations = {
+            'st': 'street',
+            'rd': 'road',
+            'blvd': 'boulevard',
+            'ave': 'avenue',
+            'apt': 'apartment',
+            'blk': 'block',
+            'ngr': 'nagar',
+            'sec': 'sector',
+            'fl': 'floor',
+            'apts': 'apartments',
+            # India-specific state abbreviations
+            'ka': 'karnataka',
+            'mh': 'maharashtra',
+            'up': 'uttar pradesh',
+            'ap': 'andhra pradesh',
+            'tn': 'tamil nadu',
+            'dl': 'delhi',
+            'wb': 'west bengal',
+            'gj': 'gujarat',
+            'rj': 'rajasthan',
+            'mp': 'madhya pradesh',
+            # City abbreviations
+            'blr': 'bangalore',
+            'bang': 'bangalore',
+            'hyd': 'hyderabad',
+            'mum': 'mumbai',
+            'del': 'delhi',
+            'kol': 'kolkata',
+            'chn': 'chennai',
+        }
+        
+        # Common company name transformations
+        self.company_aliases = {
+            'facebook': ['meta', 'facebook inc', 'meta platforms', 'meta platforms inc'],
+            'google': ['alphabet', 'alphabet inc', 'google inc', 'google llc'],
+            'infosys': ['infosys limited', 'infosys ltd', 'infosys technologies'],
+            'tata': ['tcs', 'tata consultancy services', 'tata sons', 'tata group'],
+            'microsoft': ['ms', 'microsoft corporation', 'msft'],
+        }
+        
+        # Common salutations to remove
+        self.salutations = ['mr', 'mrs', 'ms', 'miss', 'dr', 'prof', 'shri', 'smt']
+        
+        # Suffixes for companies
+        self.company_suffixes = ['ltd', 'limited', 'inc', 'incorporated', 'llc', 'corp', 
+                                'corporation', 'pvt', 'private', 'gmbh', 'co']
+        
+        # Field weights of the overall confidence and the cut-offs of each match category
+        self.weights = {'name': 0.4, 'address': 0.3, 'dob': 0.2, 'gender': 0.1}
+        self.category_thresholds = {'high': 90, 'medium_to_high': 70, 'medium': 50, 'low_to_medium': 30}
+        # Confidence multipliers for critical mismatches (kept at most 1, which decide relies on)
+        # and the cap on the confidence of a cautioned pair with a DOB ambiguity
+        self.penalties = {'field_mismatch': 0.7, 'gender_mismatch': 0.8, 'dob_ambiguity': 0.7,
+                          'dob_mismatch': 0.7, 'caution_cap': 70}
+        
+        # Compiled normalizers with per-field LRU caches
+        self.cache_size = cache_size
+        self.refresh_normalizer()
+        self.date_engine = DateEngine(cache_size=cache_size)
+        
+        # Optional timing and decision counters, see enable_instrumentation
+        self.instrumentation = None
+
+    def refresh_normalizer(self):
+        """Rebuild the compiled normalizer (and drop its caches) after editing the lexicons"""
+        self.normalizer = TextNormalizer(self.salutations, self.address_abbreviations,
+                                         self.company_suffixes, self.company_aliases,
+                                         cache_size=self.cache_size)
+        self.normalizer_fingerprint = self.config_fingerprint()
+
+    def config_fingerprint(self):
+        """Hash of the current lexicons and rules version; changes whenever scores could change"""
+        config = {
+            'rules_version': RULES_VERSION,
+            'address_abbreviations': self.address_abbreviations,
+            'company_aliases': self.company_aliases,
+            'salutations': self.salutations,
+            'company_suffixes': self.company_suffixes,
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    def result_fingerprint(self):
+        """Hash of everything a compare_documents result depends on: the lexicons the normalizer
+        was built from, the rules version, the weights, penalties and category thresholds"""
+        config = {
+            'normalizer': self.normalizer_fingerprint,
+            'weights': self.weights,
+            'penalties': self.penalties,
+            'category_thresholds': self.category_thresholds,
+        }
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:16]
+
+    def load_lexicon_files(self, abbreviation_files=(), alias_files=()):
+        """Merge abbreviation/gazetteer files and company alias files into the lexicons.
+        
+        Abbreviation files (CSV/TSV rows of short form and expansion, or a JSON object)
+        may contain multi-word entries such as 'mg road'. Alias files hold alias and
+        canonical name rows, or a JSON object of canonical name to aliases.
+        """
+        for path in abbreviation_files:
+            self.address_abbreviations.update(load_abbreviations(path))
+        for path in alias_files:
+            for main_name, aliases in load_company_aliases(path).items():
+                known = self.company_aliases.setdefault(main_name, [])
+                known.extend(alias for alias in aliases if alias not in known)
+        self.refresh_normalizer()
+
+    def cache_stats(self):
+        """Return hit/miss statistics for the normalization and date caches"""
+        return dict(self.normalizer.cache_stats(), date=self.date_engine.stats())
+
+    def enable_instrumentation(self):
+        """Start collecting per-stage timings and decision counters; returns the Instrumentation"""
+        if self.instrumentation is None:
+            self.instrumentation = Instrumentation(self)
+        self.instrumentation.install()
+        return self.instrumentation
+
+    def disable_instrumentation(self):
+        """Stop collecting timings; the collected statistics stay on self.instrumentation"""
+        if self.instrumentation is not None:
+            self.instrumentation.uninstall()
+
+    def normalize_name(self, name):
+        """Normalize the name by removing salutations, extra spaces, and standardizing case"""
+        return self.normalizer.normalize_name(name)
+
+    def expand_initials(self, name):
+        """Create potential variations where initials are expanded"""
+        # This is a simplified version - a real implementation would use a name database
+        return name
+
+    def normalize_address(self, address):
+        """Normalize the address by expanding abbreviations and standardizing format"""
+        return self.normalizer.normalize_address(address)
+
+    def normalize_company_name(self, name):
+        """Normalize company names by removing legal suffixes and standardizing format"""
+        return self.normalizer.normalize_company_name(name)
+
+    def normalize_date(self, date_str):
+        """Try to parse and normalize date in YYYY-MM-DD format"""
+        parsed = self.date_engine.parse(date_str)
+        if parsed is None:
+            # Return None if we can't parse it
+            return None
+        return datetime.date(parsed.year, parsed.month, parsed.day).strftime('%Y-%m-%d')
+
+    def get_name_similarity(self, name1, name2):
+        """Calculate name similarity score with various metrics"""
+        if not name1 or not name2:
+            return 0
+            
+        # Normalize both names
+        norm1 = self.normalize_name(name1)
+        norm2 = self.normalize_name(name2)
+        
+        return self._score_normalized_names(norm1, norm2)
+
+    def _score_normalized_names(self, norm1, norm2):
+        """Score two names that have already been through normalize_name"""
+        return self._match_names(norm1, norm2)[0]
+
+    def _match_names(self, norm1, norm2):
+        """Return (score, branch) for two normalized names, branch being the rule that decided it"""
+        match = self._match_name_rules(norm1, norm2)
+        if match is not None:
+            return match
+        
+        # Use fuzzy matching as a fallback
+        return self._fuzzy_score(norm1, norm2), 'fuzzy'
+
+    def _match_name_rules(self, norm1, norm2):
+        """(score, branch) from the rule-based name checks, or None when only fuzzy matching can tell"""
+        # Direct comparison
+        if norm1 == norm2:
+            return 100, 'exact'
+        
+        # Split names into parts
+        name1_parts = norm1.split()
+        name2_parts = norm2.split()
+        
+        # Handle swapped names (e.g., "Kumar Rajeev" vs "Rajeev Kumar")
+        if set(name1_parts) == set(name2_parts):
+            return 95, 'swapped'
+        
+        # Check for missing middle name more accurately
+        if len(name1_parts) > len(name2_parts) or len(name2_parts) > len(name1_parts):
+            # Check if last names match
+            if name1_parts[-1] == name2_parts[-1]:
+                # Check if first names match
+                if name1_parts[0] == name2_parts[0]:
+                    # It's likely a middle name difference
+                    return 80, 'middle_name'
+                
+        # Check if one name is contained within the other
+        if norm1 in norm2 or norm2 in norm1:
+            return 85, 'containment'
+        
+        # Initial vs full name (e.g., "S. Ramesh" vs "Subramaniam Ramesh")
+        # Extract last names
+        name1_last = name1_parts[-1] if name1_parts else ""
+        name2_last = name2_parts[-1] if name2_parts else ""
+        
+        # If last names match and one name has initials
+        if name1_last == name2_last and ('.' in norm1 or '.' in norm2):
+            # Check if initials match first letters
+            has_matching_initials = True
+            if '.' in norm1:
+                initials = [p.strip('.') for p in norm1.split() if '.' in p]
+                other_name_parts = [p[0].lower() for p in norm2.split() if p != name2_last]
+                if not all(i in other_name_parts for i in initials):
+                    has_matching_initials = False
+            elif '.' in norm2:
+                initials = [p.strip('.') for p in norm2.split() if '.' in p]
+                other_name_parts = [p[0].lower() for p in norm1.split() if p != name1_last]
+                if not all(i in other_name_parts for i in initials):
+                    has_matching_initials = False
+                    
+            if has_matching_initials:
+                return 80, 'initials'
+        
+        return None
+
+    def _fuzzy_score(self, norm1, norm2):
+        """Best of the token sort and token set ratios for two normalized strings"""
+        fuzz = _fuzz()
+        token_sort_ratio = fuzz.token_sort_ratio(norm1, norm2)
+        token_set_ratio = fuzz.token_set_ratio(norm1, norm2)
+        
+        return max(token_sort_ratio, token_set_ratio)
+
+    def build_watchlist(self, names):
+        """Index a list of names (PEP or block list) for screen_name"""
+        from screening import WatchlistIndex
+        return WatchlistIndex(self, names)
+
+    def screen_name(self, name, watchlist, k=10, cutoff=80):
+        """Top k watchlist entries scoring at least cutoff with get_name_similarity(name, entry).
+
+        Returns ScreeningMatch(index, name, score) tuples, best first and by watchlist
+        position on ties. watchlist comes from build_watchlist.
+        """
+        return watchlist.top_k(name, k, cutoff)
+
+    def get_address_similarity(self, addr1, addr2):
+        """Calculate address similarity with component-wise comparison"""
+        if not addr1 or not addr2:
+            return 0
+            
+        # Normalize both addresses
+        norm1 = self.normalize_address(addr1)
+        norm2 = self.normalize_address(addr2)
+        
+        # Direct comparison
+        if norm1 == norm2:
+            return 100
+        
+        # Count the number of abbreviations
+        abbrev_count = len(self._abbreviation_hits(addr1) | self._abbreviation_hits(addr2))
+        
+        # Extract potential postal codes
+        postal_code1 = self._extract_postal_code(addr1)
+        postal_code2 = self._extract_postal_code(addr2)
+        
+        # Use fuzzy matching for the whole address
+        base_score = self._fuzzy_score(norm1, norm2)
+        
+        return self._adjust_address_score(base_score, abbrev_count, postal_code1, postal_code2)
+
+    def _abbreviation_hits(self, address):
+        """Frozenset of the address_abbreviations keys (by position) occurring anywhere in the raw address"""
+        return self.normalizer.lexicon.abbreviation_hits(address.lower())
+
+    @staticmethod
+    def _extract_postal_code(address):
+        """Return the first 5-6 digit postal code in the raw address, or None"""
+        postal_code = _POSTAL_CODE.search(address)
+        return postal_code.group() if postal_code else None
+
+    def _adjust_address_score(self, base_score, abbrev_count, pc1, pc2):
+        """Apply the abbreviation penalty and postal code boost to a fuzzy address score"""
+        postal_match = 0
+        if pc1 and pc2:
+            if pc1 == pc2:
+                postal_match = 25
+            elif abs(int(pc1) - int(pc2)) <= 5:  # Nearby postal codes
+                postal_match = 15
+        
+        # Slightly reduce score based on abbreviation usage
+        if abbrev_count > 0:
+            base_score = max(base_score - (abbrev_count * 2), 0)
+        
+        # Boost score if postal codes match
+        final_score = min(100, base_score + postal_match)
+        
+        return final_score
+
+    def compare_dates(self, date1, date2):
+        """Compare two dates and return similarity score"""
+        return self._score_parsed_dates(self.date_engine.parse(date1), self.date_engine.parse(date2))
+
+    def _score_parsed_dates(self, date1, date2):
+        """Score two ParsedDate values from the date engine"""
+        if not date1 or not date2:
+            return 0
+            
+        if date1.ordinal == date2.ordinal:
+            return 100
+            
+        # Check if month and day might be swapped (MM/DD vs DD/MM)
+        if date1.ordinal == date2.swapped_ordinal:
+            return 50  # Potential format confusion
+            
+        # Check for year difference only
+        if date1.month == date2.month and date1.day == date2.day:
+            return 50
+            
+        # Check for close dates (within 5 days)
+        if abs(date1.ordinal - date2.ordinal) <= 5:
+            return 80
+            
+        return 0
+
+    def compare_documents(self, doc_a, doc_b):
+        """Compare two documents and return a detailed comparison with confidence scores"""
+        # Name comparison (normalized once, shared with the middle name check)
+        name_a = doc_a.get('Name', '')
+        name_b = doc_b.get('Name', '')
+        norm_name_a = self.normalize_name(name_a)
+        norm_name_b = self.normalize_name(name_b)
+        name_similarity = self._score_normalized_names(norm_name_a, norm_name_b) if name_a and name_b else 0
+        
+        # Address comparison
+        address_similarity = self.get_address_similarity(doc_a.get('Address', ''), doc_b.get('Address', ''))
+        
+        # DOB comparison
+        dob_similarity = self.compare_dates(doc_a.get('DOB', ''), doc_b.get('DOB', ''))
+        
+        # Gender comparison
+        gender_match = 100 if doc_a.get('Gender', '').lower() == doc_b.get('Gender', '').lower() else 0
+        
+        return self._build_result(
+            name_similarity, len(norm_name_a.split()) != len(norm_name_b.split()),
+            address_similarity, dob_similarity, gender_match,
+            bool(doc_a.get('Gender') and doc_b.get('Gender')),
+            bool(doc_a.get('DOB') and doc_b.get('DOB')))
+
+    def decide(self, doc_a, doc_b, threshold=90):
+        """Whether compare_documents would rate the pair at or above threshold, doing as little work as possible.
+
+        The confidence never decreases as the name or address score grows, so after scoring the
+        cheap fields it is bounded by the lowest and highest possible name and address scores.
+        Fuzzy matching only runs while those bounds still straddle the threshold.
+        """
+        gender_match = 100 if doc_a.get('Gender', '').lower() == doc_b.get('Gender', '').lower() else 0
+        genders_given = bool(doc_a.get('Gender') and doc_b.get('Gender'))
+        dob_similarity = self.compare_dates(doc_a.get('DOB', ''), doc_b.get('DOB', ''))
+        dobs_given = bool(doc_a.get('DOB') and doc_b.get('DOB'))
+        # The caution cap only applies with a DOB ambiguity, which is itself a caution note
+        has_caution = dob_similarity == 50
+        # The bounds are not scored pairs: call the class's _overall_confidence so the
+        # instrumentation wrapper does not count each of them
+        overall_confidence = type(self)._overall_confidence
+        
+        def settle(name_range, address_range):
+            low = overall_confidence(self, name_range[0], address_range[0], dob_similarity, gender_match,
+                                     has_caution, genders_given, dobs_given)
+            if low >= threshold:
+                return True
+            high = overall_confidence(self, name_range[1], address_range[1], dob_similarity, gender_match,
+                                      has_caution, genders_given, dobs_given)
+            if high < threshold:
+                return False
+            return None
+        
+        instrumentation = self.instrumentation
+        if instrumentation is None or not instrumentation.installed:
+            return self._decide_fields(doc_a, doc_b, settle)
+        
+        # Instrumented: the time spent on bounds counts as one scoring event per decision
+        scoring_ns = [0]
+        
+        def timed_settle(name_range, address_range):
+            started = time.perf_counter_ns()
+            try:
+                return settle(name_range, address_range)
+            finally:
+                scoring_ns[0] += time.perf_counter_ns() - started
+        
+        try:
+            return self._decide_fields(doc_a, doc_b, timed_settle)
+        finally:
+            instrumentation.add_time('scoring', 1, scoring_ns[0])
+    
+    def _decide_fields(self, doc_a, doc_b, settle):
+        """Narrow the name and address bounds until settle returns a decision"""
+        decision = settle((0, 100), (0, 100))
+        if decision is not None:
+            return decision
+        
+        # Names: the rule-based checks are cheap, only the fuzzy fallback is left open
+        name_a = doc_a.get('Name', '')
+        name_b = doc_b.get('Name', '')
+        name_range = (0, 0)
+        name_pending = None
+        if name_a and name_b:
+            norm_name_a = self.normalize_name(name_a)
+            norm_name_b = self.normalize_name(name_b)
+            match = self._match_name_rules(norm_name_a, norm_name_b)
+            if match is not None:
+                name_range = (match[0], match[0])
+            else:
+                name_range = (0, 100)
+                name_pending = (norm_name_a, norm_name_b)
+        
+        # Addresses: the abbreviation and postal code adjustments bound the fuzzy score
+        address_a = doc_a.get('Address', '')
+        address_b = doc_b.get('Address', '')
+        address_range = (0, 0)
+        address_pending = None
+        if address_a and address_b:
+            norm_address_a = self.normalize_address(address_a)
+            norm_address_b = self.normalize_address(address_b)
+            if norm_address_a == norm_address_b:
+                address_range = (100, 100)
+            else:
+                abbrev_count = len(self._abbreviation_hits(address_a) | self._abbreviation_hits(address_b))
+                postal_codes = (self._extract_postal_code(address_a), self._extract_postal_code(address_b))
+                adjust = lambda score: self._adjust_address_score(score, abbrev_count, *postal_codes)
+                address_range = (adjust(0), adjust(100))
+                address_pending = (norm_address_a, norm_address_b, adjust)
+        
+        decision = settle(name_range, address_range)
+        if decision is not None:
+            return decision
+        
+        # Fuzzy scores are the max of two ratios: the token set ratio alone is a lower bound
+        fuzz = _fuzz()
+        if name_pending:
+            token_set_ratio = fuzz.token_set_ratio(*name_pending)
+            name_range = (token_set_ratio, 100)
+            decision = settle(name_range, address_range)
+            if decision is not None:
+                return decision
+            score = max(fuzz.token_sort_ratio(*name_pending), token_set_ratio)
+            name_range = (score, score)
+            decision = settle(name_range, address_range)
+            if decision is not None:
+                return decision
+        
+        norm_address_a, norm_address_b, adjust = address_pending
+        token_set_ratio = fuzz.token_set_ratio(norm_address_a, norm_address_b)
+        decision = settle(name_range, (adjust(token_set_ratio), adjust(100)))
+        if decision is not None:
+            return decision
+        score = adjust(max(fuzz.token_sort_ratio(norm_address_a, norm_address_b), token_set_ratio))
+        return settle(name_range, (score, score))
+
+    def document_features(self, doc):
+        """Derive everything compare_features needs from one document, so it can be computed once and reused"""
+        name = doc.get('Name', '')
+        address = doc.get('Address', '')
+        norm_name = self.normalize_name(name)
+        return DocumentFeatures(
+            name=norm_name,
+            name_parts=tuple(norm_name.split()),
+            address=self.normalize_address(address),
+            abbreviation_hits=self._abbreviation_hits(address) if address else frozenset(),
+            postal_code=self._extract_postal_code(address) if address else None,
+            dob=self.date_engine.parse(doc.get('DOB', '')),
+            gender=(doc.get('Gender') or '').lower(),
+            has_name=bool(name),
+            has_address=bool(address),
+            has_dob=bool(doc.get('DOB')),
+            has_gender=bool(doc.get('Gender')),
+        )
+
+    def compare_features(self, features_a, features_b):
+        """Compare two documents from their document_features; same result as compare_documents"""
+        name_similarity = 0
+        if features_a.has_name and features_b.has_name:
+            name_similarity = self._score_normalized_names(features_a.name, features_b.name)
+        
+        address_similarity = 0
+        if features_a.has_address and features_b.has_address:
+            if features_a.address == features_b.address:
+                address_similarity = 100
+            else:
+                address_similarity = self._adjust_address_score(
+                    self._fuzzy_score(features_a.address, features_b.address),
+                    len(features_a.abbreviation_hits | features_b.abbreviation_hits),
+                    features_a.postal_code, features_b.postal_code)
+        
+        dob_similarity = self._score_parsed_dates(features_a.dob, features_b.dob)
+        gender_match = 100 if features_a.gender == features_b.gender else 0
+        
+        return self._build_result(
+            name_similarity, len(features_a.name_parts) != len(features_b.name_parts),
+            address_similarity, dob_similarity, gender_match,
+            features_a.has_gender and features_b.has_gender,
+            features_a.has_dob and features_b.has_dob)
+
+    def compare_document_set(self, documents, threshold=70):
+        """Cross-check every document of one applicant and consolidate them into one verdict.
+        
+        documents is a mapping of document name (e.g. 'aadhaar', 'pan') to document, or a
+        sequence of documents (named doc_1, doc_2, ...). Each document is normalized once and
+        every pair is scored from the shared features, with the same result as
+        compare_documents. Two documents agree when their overall confidence reaches the
+        threshold. The verdict is 'consistent' when all pairs agree, 'odd_document_out' when
+        all pairs agree except those involving one document (named in odd_document_out), and
+        'inconsistent' otherwise.
+        """
+        if not hasattr(documents, 'items'):
+            documents = {f'doc_{i + 1}': doc for i, doc in enumerate(documents)}
+        names = list(documents)
+        features = [self.document_features(documents[name]) for name in names]
+        count = len(names)
+        
+        scores = [[100.0] * count for _ in range(count)]
+        pairs = []
+        for i in range(count):
+            for j in range(i + 1, count):
+                result = self.compare_features(features[i], features[j])
+                scores[i][j] = scores[j][i] = result['overall_confidence']
+                pairs.append(dict(result, doc_a=names[i], doc_b=names[j]))
+        
+        support = {
+            name: round(sum(scores[i][j] for j in range(count) if j != i) / (count - 1), 2) if count > 1 else 100.0
+            for i, name in enumerate(names)
+        }
+        disagreements = [(pair['doc_a'], pair['doc_b']) for pair in pairs if pair['overall_confidence'] < threshold]
+        
+        odd_document = None
+        if not disagreements:
+            verdict = 'consistent'
+            agreeing = names
+        else:
+            # A document is the odd one out if every disagreement involves it; prefer the least supported
+            candidates = [name for name in names if all(name in pair for pair in disagreements)]
+            candidates.sort(key=support.get)
+            if candidates and (len(candidates) == 1 or support[candidates[0]] < support[candidates[1]]):
+                verdict = 'odd_document_out'
+                odd_document = candidates[0]
+                agreeing = [name for name in names if name != odd_document]
+            else:
+                verdict = 'inconsistent'
+                agreeing = []
+        
+        agreeing_scores = [pair['overall_confidence'] for pair in pairs
+                           if pair['doc_a'] in agreeing and pair['doc_b'] in agreeing]
+        
+        explanations = []
+        if verdict == 'consistent':
+            explanations.append(f"All {count} documents agree (every pair at or above {threshold}%)")
+        elif verdict == 'odd_document_out':
+            explanations.append(f"{odd_document} disagrees with the other documents "
+                                f"(mean confidence {support[odd_document]}%), which agree with each other")
+        else:
+            explanations.append(f"{len(disagreements)} document pairs disagree and no single document explains it")
+        for doc_a, doc_b in disagreements:
+            explanations.append(f"{doc_a} vs {doc_b}: {scores[names.index(doc_a)][names.index(doc_b)]}%")
+        
+        return {
+            'documents': names,
+            'scores': scores,
+            'pairs': pairs,
+            'support': support,
+            'verdict': verdict,
+            'odd_document_out': odd_document,
+            'identity_confidence': min(agreeing_scores) if agreeing_scores else (100.0 if len(agreeing) == 1 else 0.0),
+            'explanations': explanations,
+        }
+
+    def _build_result(self, name_similarity, name_part_counts_differ, address_similarity, dob_similarity,
+                      gender_match, genders_given, dobs_given):
+        """Turn the field scores into the compare_documents result with explanations"""
+        results = {
+            'name_similarity': name_similarity,
+            'address_similarity': address_similarity,
+            'dob_similarity': dob_similarity,
+            'gender_match': gender_match,
+        }
+        explanations, caution_notes = self.explain_scores(
+            name_similarity, name_part_counts_differ, address_similarity, dob_similarity, gender_match)
+        
+        overall_confidence = self._overall_confidence(
+            name_similarity, address_similarity, dob_similarity, gender_match,
+            bool(caution_notes), genders_given, dobs_given)
+        match_category = self._match_category(overall_confidence, bool(caution_notes))
+        
+        # Add caution notes to explanations if present
+        if caution_notes:
+            explanations.append("CAUTION: " + "; ".join(caution_notes))
+        
+        return {
+            'detailed_scores': results,
+            'overall_confidence': round(overall_confidence, 2),
+            'match_category': match_category,
+            'explanations': explanations
+        }
+
+    @staticmethod
+    def explain_scores(name_similarity, name_part_counts_differ, address_similarity, dob_similarity, gender_match):
+        """Return (explanations, caution_notes) describing a pair's field scores"""
+        explanations = []
+        caution_notes = []
+        
+        if name_similarity >= 95:
+            explanations.append(f"Names match with high confidence ({name_similarity}%)")
+        elif name_similarity >= 80:
+            explanations.append(f"Names are likely to match ({name_similarity}%)")
+            
+            # Check for missing middle name more explicitly
+            if name_part_counts_differ:
+                caution_notes.append("Middle name discrepancy detected")
+                
+        elif name_similarity >= 60:
+            explanations.append(f"Names have some similarity ({name_similarity}%)")
+        else:
+            explanations.append(f"Names differ significantly ({name_similarity}%)")
+        
+        if address_similarity >= 95:
+            explanations.append(f"Addresses match with high confidence ({address_similarity}%)")
+        elif address_similarity >= 80:
+            explanations.append(f"Addresses are likely to match ({address_similarity}%)")
+        elif address_similarity >= 60:
+            explanations.append(f"Addresses have some similarity ({address_similarity}%)")
+        else:
+            explanations.append(f"Addresses differ significantly ({address_similarity}%)")
+        
+        if dob_similarity == 100:
+            explanations.append("DOB matches exactly")
+        elif dob_similarity == 50:
+            explanations.append("Possible DOB format confusion (MM/DD vs DD/MM)")
+            caution_notes.append("DOB ambiguity: possible MM/DD vs DD/MM format confusion")
+        elif dob_similarity > 0:
+            explanations.append(f"DOB has some similarity ({dob_similarity}%)")
+        else:
+            explanations.append("DOB does not match")
+        
+        if gender_match == 100:
+            explanations.append("Gender matches")
+        else:
+            explanations.append("Gender does not match")
+        
+        return explanations, caution_notes
+
+    def _overall_confidence(self, name_similarity, address_similarity, dob_similarity, gender_match,
+                            has_caution, genders_given, dobs_given):
+        """Combine the field scores into the (unrounded) overall confidence"""
+        # Calculate overall confidence score with weighted factors
+        # Names and addresses are most important, followed by DOB and gender
+        weights = self.weights
+        penalties = self.penalties
+        overall_confidence = (
+            name_similarity * weights['name'] +
+            address_similarity * weights['address'] +
+            dob_similarity * weights['dob'] +
+            gender_match * weights['gender']
+        )
+        
+        # Adjust confidence based on critical mismatches
+        if name_similarity < 50 or address_similarity < 40:
+            overall_confidence *= penalties['field_mismatch']  # Major penalty for significant mismatches
+        
+        if gender_match == 0 and genders_given:
+            overall_confidence *= penalties['gender_mismatch']  # Penalty for gender mismatch
+            
+        # Apply stronger penalty for DOB issues as this is critical for identification
+        if dob_similarity == 50:  # This is the MM/DD vs DD/MM case
+            overall_confidence *= penalties['dob_ambiguity']  # Stronger penalty for date format ambiguity
+            
+        if dob_similarity == 0 and dobs_given:
+            overall_confidence *= penalties['dob_mismatch']  # Stronger penalty for complete DOB mismatch
+        
+        # Special handling for Case 12 type scenarios (missing middle name + DOB format issue)
+        if has_caution and dob_similarity == 50:
+            overall_confidence = min(overall_confidence, penalties['caution_cap'])  # Cap at medium confidence
+        
+        return overall_confidence
+
+    def _match_category(self, overall_confidence, has_caution):
+        """Map an overall confidence onto a match category"""
+        thresholds = self.category_thresholds
+        match_category = "No match"
+        if overall_confidence >= thresholds['high']:
+            match_category = "High confidence match"
+        elif overall_confidence >= thresholds['medium_to_high']:
+            match_category = "Medium-to-high confidence match"
+        elif overall_confidence >= thresholds['medium']:
+            if has_caution:
+                match_category = "Medium confidence match with caution"
+            else:
+                match_category = "Medium confidence match"
+        elif overall_confidence >= thresholds['low_to_medium']:
+            match_category = "Low-to-medium confidence match"
+        
+        return match_category
+
+    def compare_batch(self, docs_a, docs_b):
+        """Compare two aligned batches of documents and return a DataFrame of score columns.
+        
+        docs_a and docs_b are DataFrames (or mappings of column name to sequence) with the
+        same Name/Address/DOB/Gender fields as compare_documents; row i of docs_a is compared
+        with row i of docs_b. Each distinct value is normalized once per batch and each distinct
+        normalized pair is scored once, so repeated values cost a dictionary lookup. Scores,
+        overall confidence and category match compare_documents row for row.
+        """
+        import pandas as pd
+        
+        index = docs_a.index if isinstance(docs_a, pd.DataFrame) else None
+        return self.compare_batch_compact(docs_a, docs_b).to_frame(index=index, compact=False)
+
+    def compare_batch_compact(self, docs_a, docs_b):
+        """compare_batch as CompactResults: small typed arrays with category codes and reason
+        flags, where explanations are only built for the rows that are looked at"""
+        from results import CompactResults
+        
+        return CompactResults.from_scores(self, **self.batch_field_scores(docs_a, docs_b))
+
+    def batch_field_scores(self, docs_a, docs_b):
+        """Field score arrays of a batch plus the flags the confidence depends on.
+        
+        This is the expensive part of compare_batch and does not depend on the weights,
+        penalties or category thresholds (see calibration.py).
+        """
+        import numpy as np
+        import pandas as pd
+        import kernels
+        
+        size = self._batch_length(docs_a)
+        if self._batch_length(docs_b) != size:
+            raise ValueError(f"Batch sizes differ: {size} vs {self._batch_length(docs_b)}")
+        names_a = self._batch_column(docs_a, 'Name', size)
+        names_b = self._batch_column(docs_b, 'Name', size)
+        addresses_a = self._batch_column(docs_a, 'Address', size)
+        addresses_b = self._batch_column(docs_b, 'Address', size)
+        dobs_a = self._batch_column(docs_a, 'DOB', size)
+        dobs_b = self._batch_column(docs_b, 'DOB', size)
+        genders_a = self._batch_column(docs_a, 'Gender', size)
+        genders_b = self._batch_column(docs_b, 'Gender', size)
+        
+        # Normalize every distinct value once per column
+        norm_names = {v: self.normalize_name(v) for v in set(names_a) | set(names_b)}
+        addresses, (address_codes_a, address_codes_b) = self._batch_codes(addresses_a, addresses_b)
+        norm_addresses = [self.normalize_address(v) for v in addresses]
+        abbreviation_hits = [self._abbreviation_hits(v) for v in addresses]
+        dobs, (dob_codes_a, dob_codes_b) = self._batch_codes(dobs_a, dobs_b)
+        
+        # Scores that only depend on normalized values are computed once per distinct pair
+        name_scores = self._score_name_pairs({
+            (norm_names[a], norm_names[b]) for a, b in zip(names_a, names_b) if a and b
+        })
+        address_fuzzy = {}
+        
+        name_column = []
+        middle_name_caution = []
+        for name_a, name_b in zip(names_a, names_b):
+            name_similarity = 0
+            caution = False
+            if name_a and name_b:
+                key = (norm_names[name_a], norm_names[name_b])
+                name_similarity = name_scores[key]
+                if 80 <= name_similarity < 95:
+                    caution = len(key[0].split()) != len(key[1].split())
+            name_column.append(name_similarity)
+            middle_name_caution.append(caution)
+        
+        # Fuzzy address scores for the rows whose normalized addresses differ
+        address_given = np.array([bool(a and b) for a, b in zip(addresses_a, addresses_b)], dtype=bool)
+        norm_address_ids = pd.factorize(np.array(norm_addresses, dtype=object))[0]
+        address_equal = norm_address_ids[address_codes_a] == norm_address_ids[address_codes_b]
+        base_scores = np.zeros(size, dtype=np.int64)
+        abbreviation_counts = np.zeros(size, dtype=np.int64)
+        for i in np.flatnonzero(address_given & ~address_equal).tolist():
+            code_a, code_b = address_codes_a[i], address_codes_b[i]
+            key = (norm_addresses[code_a], norm_addresses[code_b])
+            base_score = address_fuzzy.get(key)
+            if base_score is None:
+                base_score = address_fuzzy[key] = self._fuzzy_score(*key)
+            base_scores[i] = base_score
+            abbreviation_counts[i] = len(abbreviation_hits[code_a] | abbreviation_hits[code_b])
+        
+        # Postal codes, DOBs and genders are integer and categorical comparisons over whole columns
+        postal_values, postal_widths = kernels.postal_arrays([self._extract_postal_code(v) for v in addresses])
+        postal_boosts = kernels.postal_scores(
+            postal_values[address_codes_a], postal_widths[address_codes_a],
+            postal_values[address_codes_b], postal_widths[address_codes_b])
+        address_column = np.where(
+            address_given,
+            np.where(address_equal, 100,
+                     kernels.adjust_address_scores(base_scores, abbreviation_counts, postal_boosts)),
+            0)
+        
+        dates, swapped_dates = kernels.date_arrays([self.date_engine.parse(v) for v in dobs])
+        dob_column = kernels.dob_scores(dates[dob_codes_a], dates[dob_codes_b], swapped_dates[dob_codes_b])
+        
+        gender_codes = kernels.category_codes(genders_a + genders_b)
+        gender_column = kernels.gender_scores(gender_codes[:size], gender_codes[size:])
+        
+        return {
+            'name_similarity': np.array(name_column, dtype=np.int64),
+            'address_similarity': address_column,
+            'dob_similarity': dob_column,
+            'gender_match': gender_column,
+            'middle_name_discrepancy': np.array(middle_name_caution, dtype=bool),
+            'genders_given': np.array([bool(a and b) for a, b in zip(genders_a, genders_b)], dtype=bool),
+            'dobs_given': np.array([bool(a and b) for a, b in zip(dobs_a, dobs_b)], dtype=bool),
+        }
+
+    def _score_name_pairs(self, pairs):
+        """Score distinct normalized name pairs, running the name rules as vectorized kernels.
+        
+        Only the pairs no rule decides go through _match_names (and so the fuzzy fallback).
+        With instrumentation on, the kernel's rule decisions are added to the branch counters,
+        once per distinct pair like the fallback.
+        """
+        import numpy as np
+        import kernels
+        
+        pairs = list(pairs)
+        names = list({name for pair in pairs for name in pair})
+        positions = {name: i for i, name in enumerate(names)}
+        rules = kernels.name_rules(
+            names, [positions[a] for a, _ in pairs], [positions[b] for _, b in pairs])
+        if self.instrumentation is not None and self.instrumentation.installed:
+            decided = rules[rules != kernels.UNDECIDED]
+            self.instrumentation.add_name_branches(
+                zip(kernels.NAME_RULES, np.bincount(decided, minlength=len(kernels.NAME_RULES)).tolist()))
+        scores = kernels.rule_scores(rules)
+        return {
+            pair: self._match_names(*pair)[0] if score == kernels.UNDECIDED else int(score)
+            for pair, score in zip(pairs, scores.tolist())
+        }
+
+    @staticmethod
+    def _batch_codes(column_a, column_b):
+        """Distinct values of two aligned columns and the integer code of each row in both"""
+        import numpy as np
+        import pandas as pd
+        
+        codes, uniques = pd.factorize(np.array(column_a + column_b, dtype=object))
+        return list(uniques), (codes[:len(column_a)], codes[len(column_a):])
+
+    @staticmethod
+    def _batch_length(docs):
+        """Number of rows in a DataFrame or mapping of columns"""
+        import pandas as pd
+        
+        if isinstance(docs, pd.DataFrame):
+            return len(docs)
+        return max((len(column) for column in docs.values()), default=0)
+
+    @staticmethod
+    def _batch_column(docs, field, size):
+        """Return one field of a batch as a list of strings, with missing values as ''"""
+        import pandas as pd
+        
+        if field not in docs:
+            return [''] * size
+        return ['' if v is None or (not isinstance(v, str) and pd.isna(v)) else str(v)
+                for v in docs[field]]
@@ -0,0 +1,188 @@
+import csv
+import json
+import os
+import re
+from collections import deque
+
+_NON_WORD_CHARS = re.compile(r'[^\w\s]')
+
+# Up to this many patterns a scan of `pattern in text` per pattern (in C) beats a
+# pure-Python automaton walk; larger gazetteers switch to Aho-Corasick
+_LINEAR_SCAN_LIMIT = 64
+
+
+def tokenize(text):
+    """Lowercase text, replace punctuation with spaces and split it into tokens"""
+    return _NON_WORD_CHARS.sub(' ', text.lower()).split()
+
+
+class SubstringMatcher:
+    """Find which of a fixed set of patterns occur anywhere in a text.
+
+    Large pattern sets are compiled into an Aho-Corasick automaton, so a search walks
+    the text once and its cost depends on the text length (plus the number of hits),
+    not on the number of patterns.
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self.linear = len(self.patterns) <= _LINEAR_SCAN_LIMIT
+        if not self.linear:
+            self._build()
+
+    def _build(self):
+        goto = [{}]
+        outputs = [[]]
+        for pattern_id, pattern in enumerate(self.patterns):
+            node = 0
+            for char in pattern:
+                following = goto[node].get(char)
+                if following is None:
+                    following = len(goto)
+                    goto[node][char] = following
+                    goto.append({})
+                    outputs.append([])
+                node = following
+            outputs[node].append(pattern_id)
+
+        # Breadth-first failure links; each node inherits the outputs of its failure node
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in goto[node].items():
+                queue.append(child)
+                state = fail[node]
+                while state and char not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(char, 0)
+                outputs[child].extend(outputs[fail[child]])
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(o) for o in outputs]
+
+    def find(self, text):
+        """Return the frozenset of ids (indexes into patterns) of patterns found in text"""
+        if self.linear:
+            return frozenset(i for i, pattern in enumerate(self.patterns) if pattern in text)
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        found = set()
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if outputs[node]:
+                found.update(outputs[node])
+        return frozenset(found)
+
+
+class Lexicon:
+    """Compiled address abbreviation and company alias tables.
+
+    Abbreviations may span several words ('mg road' -> 'mahatma gandhi road'); address
+    tokens are expanded by longest match against a phrase table, so expansion costs
+    O(tokens x longest phrase) regardless of how many entries are loaded. Company
+    aliases are kept as a reverse map from every spelling to its canonical name.
+    """
+
+    def __init__(self, address_abbreviations, company_aliases):
+        self.address_abbreviations = dict(address_abbreviations)
+
+        # Abbreviation phrases keyed by their token tuple
+        self.phrases = {}
+        for short, full in self.address_abbreviations.items():
+            tokens = tuple(tokenize(short))
+            if tokens:
+                self.phrases.setdefault(tokens, full)
+        self.max_phrase_tokens = max((len(tokens) for tokens in self.phrases), default=1)
+        self.single_words = {tokens[0]: full for tokens, full in self.phrases.items() if len(tokens) == 1}
+
+        # Substring hits of the raw abbreviation keys drive the address abbreviation penalty
+        self.abbreviation_matcher = SubstringMatcher(self.address_abbreviations)
+
+        # The first canonical name listing a spelling wins, as in a linear scan of the aliases
+        self.company_aliases = {}
+        for main_name, aliases in company_aliases.items():
+            self.company_aliases.setdefault(main_name, main_name)
+            for alias in aliases:
+                self.company_aliases.setdefault(alias, main_name)
+
+    def expand_address_tokens(self, tokens):
+        """Replace abbreviations in a token list with their expansions, longest phrase first"""
+        if self.max_phrase_tokens == 1:
+            single_words = self.single_words
+            return [single_words.get(token, token) for token in tokens]
+        phrases = self.phrases
+        expanded = []
+        i = 0
+        while i < len(tokens):
+            for length in range(min(self.max_phrase_tokens, len(tokens) - i), 0, -1):
+                full = phrases.get(tuple(tokens[i:i + length]))
+                if full is not None:
+                    expanded.append(full)
+                    i += length
+                    break
+            else:
+                expanded.append(tokens[i])
+                i += 1
+        return expanded
+
+    def abbreviation_hits(self, text):
+        """Frozenset of ids of the abbreviation keys occurring anywhere in the (lowercased) text"""
+        return self.abbreviation_matcher.find(text)
+
+    def canonical_company(self, normalized):
+        """Canonical company name for a normalized spelling, or the spelling itself"""
+        return self.company_aliases.get(normalized, normalized)
+
+
+def _read_rows(path, header):
+    """Yield the first two columns of each CSV/TSV row, skipping comments and an optional header"""
+    delimiter = '\t' if os.path.splitext(path)[1].lower() in ('.tsv', '.tab') else ','
+    with open(path, newline='', encoding='utf-8') as f:
+        first = True
+        for row in csv.reader(f, delimiter=delimiter):
+            row = [cell.strip() for cell in row]
+            if not row or not row[0] or row[0].startswith('#'):
+                continue
+            if len(row) < 2:
+                raise ValueError(f"{path}: expected two columns, got {row!r}")
+            if first and tuple(cell.lower() for cell in row[:2]) == header:
+                first = False
+                continue
+            first = False
+            yield row[0], row[1]
+
+
+def load_abbreviations(path):
+    """Read an abbreviation or gazetteer file into a {short form: expansion} dict.
+
+    JSON files hold a single object; CSV/TSV files hold short form, expansion rows with
+    an optional 'abbreviation,expansion' header (lines starting with '#' are skipped).
+    Entries are lowercased.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f).items()
+    else:
+        entries = _read_rows(path, ('abbreviation', 'expansion'))
+    return {short.lower().strip(): full.lower().strip() for short, full in entries if short.strip()}
+
+
+def load_company_aliases(path):
+    """Read a company alias file into a {canonical name: [aliases]} dict.
+
+    JSON files map each canonical name to a list of aliases; CSV/TSV files hold
+    alias, canonical name rows with an optional 'alias,canonical' header. Entries are
+    lowercased.
+    """
+    if path.lower().endswith('.json'):
+        with open(path, encoding='utf-8') as f:
+            return {main.lower().strip(): [a.lower().strip() for a in aliases]
+                    for main, aliases in json.load(f).items()}
+    aliases = {}
+    for alias, main in _read_rows(path, ('alias', 'canonical')):
+        aliases.setdefault(main.lower(), []).append(alias.lower())
+    return aliases
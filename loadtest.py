@@ -0,0 +1,97 @@
+"""Local load test for service.py using keep-alive connections and synthetic pairs.
+
+    python service.py --port 8080 &
+    python loadtest.py --port 8080 --connections 32 --requests 20000
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+
+from service import LatencyTracker
+from kyc_matcher import KYCMatcher
+from synthetic import KYCPairGenerator
+
+
+async def _request(reader, writer, host, path, payload):
+    body = json.dumps(payload).encode()
+    writer.write((f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.decode('latin-1').split('\r\n')[1:]:
+        name, _, value = line.partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def _connection(host, port, path, payloads, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for payload in payloads:
+            started = time.perf_counter()
+            status = await _request(reader, writer, host, path, payload)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def run_load(host, port, connections, requests, bulk_size, seed):
+    generator = KYCPairGenerator(KYCMatcher().address_abbreviations, seed=seed)
+    pairs = [{'doc_a': p['doc_a'], 'doc_b': p['doc_b']} for p in generator.pairs(requests)]
+    if bulk_size:
+        path = '/compare/bulk'
+        payloads = [{'pairs': pairs[i:i + bulk_size]} for i in range(0, len(pairs), bulk_size)]
+    else:
+        path = '/compare'
+        payloads = pairs
+    per_connection = [payloads[i::connections] for i in range(connections)]
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*(_connection(host, port, path, chunk, latencies, errors)
+                           for chunk in per_connection if chunk))
+    elapsed = time.perf_counter() - started
+    ordered = sorted(latencies)
+    return {
+        'endpoint': path,
+        'connections': connections,
+        'requests': len(payloads),
+        'pairs': len(pairs),
+        'errors': len(errors),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(payloads) / elapsed, 1),
+        'pairs_per_second': round(len(pairs) / elapsed, 1),
+        'p50_ms': round(LatencyTracker.percentile(ordered, 50) * 1000, 3),
+        'p99_ms': round(LatencyTracker.percentile(ordered, 99) * 1000, 3),
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Load test the KYC scoring service.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--connections', type=int, default=16, help="concurrent keep-alive connections")
+    parser.add_argument('--requests', type=int, default=5000, help="synthetic pairs to send")
+    parser.add_argument('--bulk-size', type=int, default=0,
+                        help="send pairs to /compare/bulk in groups of this size (default: /compare)")
+    parser.add_argument('--seed', type=int, default=7)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    report = asyncio.run(run_load(args.host, args.port, args.connections, args.requests,
+                                  args.bulk_size, args.seed))
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
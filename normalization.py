@@ -0,0 +1,70 @@
+import re
+
+from caching import LRUCache
+from lexicon import Lexicon, tokenize
+
+# Precompiled character filter shared by every normalizer instance
+_NON_NAME_CHARS = re.compile(r'[^\w\s.]')  # keep periods so initials survive
+
+
+class TextNormalizer:
+    """Single-pass normalizers for names, addresses and company names.
+
+    Salutations and suffixes are compiled into sets and the address and company
+    lexicons into a Lexicon (phrase table and reverse alias map) once, and each
+    normalizer keeps a bounded LRU cache of results keyed by the raw string.
+    Build a new instance if the lexicons change.
+    """
+
+    def __init__(self, salutations, address_abbreviations, company_suffixes, company_aliases,
+                 cache_size=65536):
+        self.salutations = frozenset(salutations)
+        self.company_suffixes = frozenset(company_suffixes)
+        self.lexicon = Lexicon(address_abbreviations, company_aliases)
+
+        self.caches = {
+            'name': LRUCache(cache_size),
+            'address': LRUCache(cache_size),
+            'company': LRUCache(cache_size),
+        }
+
+    def normalize_name(self, name):
+        """Lowercase, drop punctuation other than periods and strip a leading salutation"""
+        if not name:
+            return ""
+        return self.caches['name'].get_or_compute(name, self._normalize_name)
+
+    def normalize_address(self, address):
+        """Lowercase, drop punctuation and expand address abbreviations"""
+        if not address:
+            return ""
+        return self.caches['address'].get_or_compute(address, self._normalize_address)
+
+    def normalize_company_name(self, name):
+        """Lowercase, drop punctuation and legal suffixes and resolve known aliases"""
+        if not name:
+            return ""
+        return self.caches['company'].get_or_compute(name, self._normalize_company_name)
+
+    def _normalize_name(self, name):
+        words = _NON_NAME_CHARS.sub(' ', name.lower()).split()
+        if words and words[0].replace('.', '') in self.salutations:
+            del words[0]
+        return ' '.join(words)
+
+    def _normalize_address(self, address):
+        return ' '.join(self.lexicon.expand_address_tokens(tokenize(address)))
+
+    def _normalize_company_name(self, name):
+        suffixes = self.company_suffixes
+        normalized = ' '.join([word for word in tokenize(name) if word not in suffixes])
+        return self.lexicon.canonical_company(normalized)
+
+    def cache_stats(self):
+        """Return the hit/miss statistics of each normalizer cache"""
+        return {kind: cache.stats() for kind, cache in self.caches.items()}
+
+    def clear_caches(self):
+        """Empty every normalizer cache"""
+        for cache in self.caches.values():
+            cache.clear()
@@ -0,0 +1,69 @@
+"""Cache of compare_documents results for document pairs that are scored again.
+
+Retries, re-screening and UI reruns send the same pairs over and over. ResultCache keys
+each result by the content hashes of both documents (in order, since scoring is not
+symmetric) and the matcher's result fingerprint, so reloading lexicons or changing the
+weights, penalties or category thresholds never serves a result computed under the old
+configuration.
+
+    cache = ResultCache(matcher, TTLCache(maxsize=100000, ttl=3600))
+    cache = ResultCache(matcher, DiskCache('results.db', ttl=86400))
+    result = cache.compare(doc_a, doc_b)
+
+Every call returns its own copy of the result, so a caller that edits it (say, adding
+a field to the response) does not change what later hits return.
+"""
+import hashlib
+
+from caching import TTLCache
+from feature_store import content_hash
+
+
+def _copy_result(result):
+    if result is None:
+        return None
+    return dict(result, detailed_scores=dict(result['detailed_scores']),
+                explanations=list(result['explanations']))
+
+
+class ResultCache:
+    """compare_documents through a TTLCache or DiskCache backend"""
+
+    def __init__(self, matcher, backend=None):
+        self.matcher = matcher
+        self.backend = backend if backend is not None else TTLCache()
+        self._config = None
+        self.fingerprint = None
+
+    def _current_fingerprint(self):
+        # Hashing the lexicons on every lookup would cost as much as a cache hit saves, so the
+        # fingerprint is only recomputed when the normalizer, weights, penalties or thresholds change
+        matcher = self.matcher
+        config = (matcher.normalizer_fingerprint, tuple(matcher.weights.items()),
+                  tuple(matcher.penalties.items()), tuple(matcher.category_thresholds.items()))
+        if config != self._config:
+            self._config = config
+            self.fingerprint = matcher.result_fingerprint()
+        return self.fingerprint
+
+    def key(self, doc_a, doc_b):
+        """Cache key of an ordered document pair under the current configuration"""
+        parts = (self._current_fingerprint(), content_hash(doc_a), content_hash(doc_b))
+        return hashlib.sha1(':'.join(parts).encode()).hexdigest()
+
+    def get(self, doc_a, doc_b):
+        """Cached result for the pair, or None"""
+        return _copy_result(self.backend.get(self.key(doc_a, doc_b)))
+
+    def put(self, doc_a, doc_b, result):
+        """Store a result computed elsewhere (e.g. in a worker process)"""
+        self.backend.put(self.key(doc_a, doc_b), result)
+
+    def compare(self, doc_a, doc_b):
+        """compare_documents, served from the cache when the pair was scored before"""
+        return _copy_result(self.backend.get_or_compute(
+            self.key(doc_a, doc_b), lambda _: self.matcher.compare_documents(doc_a, doc_b)))
+
+    def stats(self):
+        """Backend hit/miss statistics plus the fingerprint in use"""
+        return dict(self.backend.stats(), fingerprint=self.fingerprint)
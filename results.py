@@ -0,0 +1,165 @@
+"""Compact columnar form of batch scoring results.
+
+compare_documents returns a dict per pair with nested scores and explanation strings;
+across tens of millions of pairs the strings dominate memory. CompactResults keeps one
+small typed NumPy array per column instead (uint8 scores, the overall confidence in
+hundredths as uint16, a uint8 index into MATCH_CATEGORIES and uint8 reason flags) and
+rebuilds the full compare_documents result, explanations included, only for the rows
+that are looked at.
+"""
+import time
+
+import numpy as np
+
+import kernels
+from kyc_matcher import MATCH_CATEGORIES, KYCMatcher
+
+# Reason flags, combined bitwise in CompactResults.reasons
+MIDDLE_NAME_DISCREPANCY = 1
+DOB_AMBIGUITY = 2
+GENDER_MISMATCH = 4
+DOB_MISMATCH = 8
+NAME_MISMATCH = 16       # name similarity below 50
+ADDRESS_MISMATCH = 32    # address similarity below 40
+GENDER_MISSING = 64      # at least one document has no gender
+DOB_MISSING = 128        # at least one document has no DOB
+
+REASON_NAMES = {
+    MIDDLE_NAME_DISCREPANCY: 'middle_name_discrepancy',
+    DOB_AMBIGUITY: 'dob_ambiguity',
+    GENDER_MISMATCH: 'gender_mismatch',
+    DOB_MISMATCH: 'dob_mismatch',
+    NAME_MISMATCH: 'name_mismatch',
+    ADDRESS_MISMATCH: 'address_mismatch',
+    GENDER_MISSING: 'gender_missing',
+    DOB_MISSING: 'dob_missing',
+}
+
+SCORE_COLUMNS = ('name_similarity', 'address_similarity', 'dob_similarity', 'gender_match')
+
+
+class CompactResults:
+    """Batch results as parallel arrays; row i describes pair i of the batch"""
+
+    def __init__(self, name_similarity, address_similarity, dob_similarity, gender_match,
+                 confidence_hundredths, category_codes, reasons):
+        self.name_similarity = np.asarray(name_similarity, dtype=np.uint8)
+        self.address_similarity = np.asarray(address_similarity, dtype=np.uint8)
+        self.dob_similarity = np.asarray(dob_similarity, dtype=np.uint8)
+        self.gender_match = np.asarray(gender_match, dtype=np.uint8)
+        self.confidence_hundredths = np.asarray(confidence_hundredths, dtype=np.uint16)
+        self.category_codes = np.asarray(category_codes, dtype=np.uint8)
+        self.reasons = np.asarray(reasons, dtype=np.uint8)
+
+    @classmethod
+    def from_scores(cls, matcher, name_similarity, address_similarity, dob_similarity, gender_match,
+                    middle_name_discrepancy, genders_given, dobs_given):
+        """Derive confidence, category and reasons from field score arrays as compare_documents does"""
+        started = time.perf_counter_ns()
+        dob_ambiguity = dob_similarity == 50
+        has_caution = middle_name_discrepancy | dob_ambiguity
+        confidence = kernels.overall_confidences(
+            name_similarity, address_similarity, dob_similarity, gender_match,
+            has_caution, genders_given, dobs_given, matcher.weights, matcher.penalties)
+        reasons = (
+            middle_name_discrepancy * MIDDLE_NAME_DISCREPANCY
+            | dob_ambiguity * DOB_AMBIGUITY
+            | (gender_match == 0) * GENDER_MISMATCH
+            | (dob_similarity == 0) * DOB_MISMATCH
+            | (name_similarity < 50) * NAME_MISMATCH
+            | (address_similarity < 40) * ADDRESS_MISMATCH
+            | ~genders_given * GENDER_MISSING
+            | ~dobs_given * DOB_MISSING
+        )
+        category_codes = kernels.match_category_codes(confidence, has_caution, matcher.category_thresholds)
+        instrumentation = matcher.instrumentation
+        if instrumentation is not None and instrumentation.installed:
+            # The kernels bypass the wrapped _overall_confidence and _match_category
+            instrumentation.add_time('scoring', len(category_codes), time.perf_counter_ns() - started)
+            counts = np.bincount(category_codes, minlength=len(MATCH_CATEGORIES)).tolist()
+            instrumentation.add_categories((category, count) for category, count in zip(MATCH_CATEGORIES, counts)
+                                           if count)
+        return cls(name_similarity, address_similarity, dob_similarity, gender_match,
+                   kernels.round_hundredths(confidence), category_codes, reasons)
+
+    @classmethod
+    def concat(cls, parts):
+        """Join the results of consecutive batches"""
+        parts = list(parts)
+        return cls(*(np.concatenate([getattr(part, column) for part in parts]) for column in cls._columns()))
+
+    @staticmethod
+    def _columns():
+        return SCORE_COLUMNS + ('confidence_hundredths', 'category_codes', 'reasons')
+
+    def __len__(self):
+        return len(self.category_codes)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, column).nbytes for column in self._columns())
+
+    @property
+    def overall_confidence(self):
+        """Overall confidence as float64, equal to compare_documents' rounded value"""
+        return self.confidence_hundredths / 100
+
+    def match_categories(self):
+        """Category names of all rows (an object array of shared strings)"""
+        return np.array(MATCH_CATEGORIES, dtype=object)[self.category_codes]
+
+    def reason_names(self, i):
+        """Names of the reason flags set on row i"""
+        flags = int(self.reasons[i])
+        return [name for flag, name in REASON_NAMES.items() if flags & flag]
+
+    def explanations(self, i):
+        """The explanation strings compare_documents gives for row i"""
+        explanations, caution_notes = KYCMatcher.explain_scores(
+            int(self.name_similarity[i]), bool(self.reasons[i] & MIDDLE_NAME_DISCREPANCY),
+            int(self.address_similarity[i]), int(self.dob_similarity[i]), int(self.gender_match[i]))
+        if caution_notes:
+            explanations.append("CAUTION: " + "; ".join(caution_notes))
+        return explanations
+
+    def result(self, i):
+        """Row i as the full compare_documents result dict"""
+        return {
+            'detailed_scores': {column: int(getattr(self, column)[i]) for column in SCORE_COLUMNS},
+            'overall_confidence': int(self.confidence_hundredths[i]) / 100,
+            'match_category': MATCH_CATEGORIES[self.category_codes[i]],
+            'explanations': self.explanations(i),
+        }
+
+    def to_frame(self, index=None, compact=True):
+        """DataFrame of the arrays; compact=False gives compare_batch's columns and dtypes instead"""
+        import pandas as pd
+
+        if compact:
+            columns = {column: getattr(self, column) for column in self._columns()}
+        else:
+            columns = {column: getattr(self, column).astype(np.int64) for column in SCORE_COLUMNS}
+            columns['overall_confidence'] = self.overall_confidence
+            columns['match_category'] = self.match_categories().tolist()
+        return pd.DataFrame(columns, index=index)
+
+    def to_arrow(self):
+        """pyarrow Table of the compact columns, with the category as a dictionary column"""
+        import pyarrow as pa
+
+        columns = {column: pa.array(getattr(self, column)) for column in SCORE_COLUMNS}
+        columns['confidence_hundredths'] = pa.array(self.confidence_hundredths)
+        columns['match_category'] = pa.DictionaryArray.from_arrays(
+            pa.array(self.category_codes), pa.array(MATCH_CATEGORIES))
+        columns['reasons'] = pa.array(self.reasons)
+        return pa.table(columns)
+
+    def save(self, path):
+        """Write the arrays to an .npz file"""
+        np.savez(path, **{column: getattr(self, column) for column in self._columns()})
+
+    @classmethod
+    def load(cls, path):
+        """Read arrays written by save"""
+        with np.load(path) as data:
+            return cls(*(data[column] for column in cls._columns()))
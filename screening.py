@@ -0,0 +1,372 @@
+"""Top-k screening of names against large watchlists.
+
+A WatchlistIndex prepares a list of names (PEP lists, internal block lists) once so that
+each query only scores entries that could still reach the cutoff. Scores are exactly those
+of KYCMatcher.get_name_similarity(query, entry); pruning only ever uses upper bounds, so
+no entry that would qualify is skipped:
+
+* the exact, swapped, middle name and initials rules are hash lookups on normalized tokens,
+  and containment is a lookup of every substring of the query plus an intersection of the
+  posting lists of its character trigrams
+* the fuzzy token sort and token set ratios are first bounded for all entries at once by
+  length and by the padded character bigrams and tokens shared with the query, read from
+  posting lists; the survivors are then bounded by their shared characters and by the
+  longest common subsequence of the sorted names, computed bit-parallel in NumPy
+
+Candidates are scored best bound first, and scoring stops as soon as the next bound cannot
+beat the k-th match found so far.
+
+    watchlist = matcher.build_watchlist(names)
+    matcher.screen_name("Rajeev Kumar", watchlist, k=5, cutoff=85)
+"""
+from collections import namedtuple
+import heapq
+
+import numpy as np
+
+from kyc_matcher import _fuzz
+
+ScreeningMatch = namedtuple('ScreeningMatch', 'index name score')
+
+# Rule scores of KYCMatcher._match_name_rules
+_EXACT, _SWAPPED, _CONTAINMENT, _MIDDLE_NAME, _INITIALS = 100, 95, 85, 80, 80
+
+# Character classes left by fuzzywuzzy's full_process: letters, digits, '_' and space
+_CHAR_COLUMNS = np.full(128, 36, dtype=np.intp)
+_CHAR_COLUMNS[ord('a'):ord('z') + 1] = np.arange(26)
+_CHAR_COLUMNS[ord('0'):ord('9') + 1] = np.arange(26, 36)
+_CHAR_COLUMNS[ord(' ')] = 37
+_N_CHAR_COLUMNS = 38
+
+# Longest query the 64-bit LCS kernel handles; longer ones keep the coarser bounds
+_LCS_WORD = 64
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _bigram_keys(tokens):
+    """Padded character bigrams of the tokens, numbered by occurrence so that shared posting
+    hits count the multiset intersection"""
+    seen = {}
+    keys = []
+    for token in tokens:
+        padded = ' ' + token + ' '
+        for i in range(len(padded) - 1):
+            bigram = padded[i:i + 2]
+            seen[bigram] = seen.get(bigram, 0) + 1
+            keys.append((bigram, seen[bigram]))
+    return keys
+
+
+def _joined_length(tokens):
+    return sum(map(len, tokens)) + len(tokens) - 1
+
+
+def _char_counts(text):
+    return np.bincount(_CHAR_COLUMNS[np.frombuffer(text.encode('ascii'), dtype=np.uint8)],
+                       minlength=_N_CHAR_COLUMNS)
+
+
+def _intersect(arrays):
+    """Intersection of sorted id arrays, smallest first"""
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for other in arrays[1:]:
+        if not len(result):
+            break
+        positions = np.minimum(np.searchsorted(other, result), len(other) - 1)
+        result = result[other[positions] == result]
+    return result
+
+
+def _popcount(values):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values).astype(np.int64)
+    return np.unpackbits(values.view(np.uint8)).reshape(len(values), -1).sum(axis=1)
+
+
+def lcs_lengths(pattern, texts):
+    """Longest common subsequence of pattern (bytes, at most 64) with each row of texts.
+
+    texts is a uint8 matrix padded with zero bytes past each row's end. Uses the
+    bit-parallel recurrence of Hyyrö (2004) with one uint64 per row.
+    """
+    masks = np.zeros(256, dtype=np.uint64)
+    for i, byte in enumerate(pattern):
+        masks[byte] |= np.uint64(1 << i)
+    rows = np.full(len(texts), np.iinfo(np.uint64).max, dtype=np.uint64)
+    for column in range(texts.shape[1]):
+        matches = rows & masks[texts[:, column]]
+        rows = (rows + matches) | (rows - matches)
+    used = np.uint64((1 << len(pattern)) - 1)
+    return len(pattern) - _popcount(rows & used)
+
+
+def _add(postings, key, i):
+    postings.setdefault(key, []).append(i)
+
+
+def _freeze(postings):
+    return {key: np.array(ids, dtype=np.int32) for key, ids in postings.items()}
+
+
+class WatchlistIndex:
+    """Names prepared for KYCMatcher.screen_name.
+
+    Built with the matcher's normalizer; if the matcher's lexicons are reloaded the index
+    rebuilds itself on the next query.
+    """
+
+    def __init__(self, matcher, names):
+        self.matcher = matcher
+        self.names = list(names)
+        self._build()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _build(self):
+        fuzz_utils = _fuzz().utils
+        matcher = self.matcher
+        self.fingerprint = matcher.normalizer_fingerprint
+        size = len(self.names)
+        # Entries with an empty name (or nothing left after normalization) never score
+        self.norms = [matcher.normalize_name(name) if name else '' for name in self.names]
+
+        exact, token_sets, first_last, dotted_by_last, last_letters = {}, {}, {}, {}, {}
+        trigrams, tokens, bigrams = {}, {}, {}
+        self.set_lengths = np.zeros(size, dtype=np.int32)
+        self.full_lengths = np.zeros(size, dtype=np.int32)
+        self.char_counts = np.zeros((size, _N_CHAR_COLUMNS), dtype=np.uint16)
+        # Token sort strings (fuzzywuzzy's processed tokens, sorted and joined)
+        sorted_names = []
+        # Token set strings of the entries with a repeated token; for the rest they are
+        # the same as the token sort strings
+        self.set_strings = {}
+
+        for i, norm in enumerate(self.norms):
+            parts = norm.split()
+            if not parts:
+                sorted_names.append('')
+                continue
+            _add(exact, norm, i)
+            _add(token_sets, frozenset(parts), i)
+            _add(first_last, (parts[0], parts[-1]), i)
+            last = parts[-1]
+            if '.' in norm:
+                _add(dotted_by_last, last, i)
+            for letter in {p[0].lower() for p in parts if p != last}:
+                _add(last_letters, (last, letter), i)
+            for gram in _trigrams(norm):
+                _add(trigrams, gram, i)
+
+            processed = sorted(fuzz_utils.full_process(norm, force_ascii=True).split())
+            sorted_names.append(' '.join(processed))
+            if not processed:
+                continue
+            unique = sorted(set(processed))
+            self.set_lengths[i] = _joined_length(unique)
+            self.full_lengths[i] = _joined_length(processed)
+            if len(unique) < len(processed):
+                self.set_strings[i] = ' '.join(unique).encode('ascii')
+            self.char_counts[i] = _char_counts(sorted_names[-1])
+            for token in unique:
+                _add(tokens, token, i)
+            for key in _bigram_keys(processed):
+                _add(bigrams, key, i)
+
+        self.exact = exact
+        self.token_sets = token_sets
+        self.first_last = first_last
+        self.dotted_by_last = dotted_by_last
+        self.last_letters = _freeze(last_letters)
+        self.trigrams = _freeze(trigrams)
+
+        # The fuzzy bounds work on entries ordered by set length, so that each length is a
+        # contiguous range; order maps these slots back to watchlist positions
+        self.order = np.argsort(self.set_lengths, kind='stable')
+        slots = np.empty(size, dtype=np.int32)
+        slots[self.order] = np.arange(size)
+        self.tokens = {key: np.sort(slots[ids]) for key, ids in _freeze(tokens).items()}
+        self.bigrams = {key: np.sort(slots[ids]) for key, ids in _freeze(bigrams).items()}
+        self.set_strings = {int(slots[i]): text for i, text in self.set_strings.items()}
+        self.set_lengths = self.set_lengths[self.order]
+        self.full_lengths = self.full_lengths[self.order]
+        self.char_counts = self.char_counts[self.order]
+        self.length_starts = np.searchsorted(self.set_lengths, np.arange(self.set_lengths.max() + 2))
+        self.repeated = np.flatnonzero(self.full_lengths != self.set_lengths)
+        sorted_names = [sorted_names[i] for i in self.order.tolist()]
+        self.sorted_offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in sorted_names], out=self.sorted_offsets[1:])
+        self.sorted_bytes = np.frombuffer(''.join(sorted_names).encode('ascii'), dtype=np.uint8)
+
+    def _postings(self, postings, keys):
+        lists = [postings[key] for key in keys if key in postings]
+        return np.concatenate(lists) if lists else np.zeros(0, dtype=np.int32)
+
+    def _rule_candidates(self, norm, cutoff):
+        """(entry ids, rule score) for entries a name rule could score at or above the cutoff"""
+        parts = norm.split()
+        first, last = parts[0], parts[-1]
+        found = [
+            (self.exact.get(norm, ()), _EXACT),
+            (self.token_sets.get(frozenset(parts), ()), _SWAPPED),
+        ]
+        if cutoff <= _CONTAINMENT:
+            found.append((self._containment_candidates(norm), _CONTAINMENT))
+        if cutoff <= _MIDDLE_NAME:
+            found.append((self.first_last.get((first, last), ()), _MIDDLE_NAME))
+        if cutoff <= _INITIALS:
+            if '.' in norm:
+                # Every initial must be the first letter of a non-last token of the entry
+                initials = {p.strip('.') for p in parts if '.' in p}
+                lists = [self.last_letters.get((last, initial), np.zeros(0, dtype=np.int32))
+                         for initial in initials]
+                found.append((_intersect(lists), _INITIALS))
+            else:
+                found.append((self.dotted_by_last.get(last, ()), _INITIALS))
+        return found
+
+    def _containment_candidates(self, norm):
+        """Entries containing the name or contained in it"""
+        inside = [i for start in range(len(norm)) for end in range(start + 1, len(norm) + 1)
+                  for i in self.exact.get(norm[start:end], ())]
+        grams = _trigrams(norm)
+        if not grams:
+            return inside + [i for i, other in enumerate(self.norms) if other and norm in other]
+        lists = [self.trigrams.get(gram, np.zeros(0, dtype=np.int32)) for gram in grams]
+        return inside + _intersect(lists).tolist()
+
+    def _fuzzy_candidates(self, norm, cutoff):
+        """(entry ids, score bounds) for entries whose fuzzy score could reach the cutoff"""
+        none = np.zeros(0, dtype=np.intp), np.zeros(0)
+        processed = sorted(_fuzz().utils.full_process(norm, force_ascii=True).split())
+        if not processed:
+            return none
+        unique = sorted(set(processed))
+        set_length, full_length = _joined_length(unique), _joined_length(processed)
+        # Scores are int(round(100 * ratio)), so a ratio down to cutoff - 0.5 can still qualify
+        floor = cutoff - 0.5 - 1e-9
+
+        # Coarse pass. Any two compared strings total at least set_length plus the entry's
+        # set length, and the matching characters are at most the shorter string; this
+        # leaves one range of set lengths (plus entries with repeated tokens, whose sort
+        # strings are longer). Within it, strings with m matching characters share at least
+        # 3m - 1 - total character bigrams.
+        lengths = np.arange(len(self.length_starts) - 1)
+        totals = lengths + set_length
+        length_ok = (lengths > 0) & (200 * np.minimum(lengths, full_length) / totals >= floor)
+        needed = (3 * floor / 200 - 1) * totals - 1
+        coarse = [self.repeated]
+        if length_ok.any():
+            shortest, longest = np.flatnonzero(length_ok)[[0, -1]]
+            lo, hi = self.length_starts[shortest], self.length_starts[longest + 1]
+            window = []
+            for key in _bigram_keys(processed):
+                ids = self.bigrams.get(key)
+                if ids is not None:
+                    window.append(ids[np.searchsorted(ids, lo):np.searchsorted(ids, hi)])
+            shared_bigrams = np.bincount(np.concatenate(window or [np.zeros(0, dtype=np.int32)]) - lo,
+                                         minlength=hi - lo)
+            for length in range(shortest, longest + 1):
+                start, end = self.length_starts[length] - lo, self.length_starts[length + 1] - lo
+                coarse.append(np.flatnonzero(shared_bigrams[start:end] >= needed[length]) + start + lo)
+
+        # Token set ratio of the shared tokens against either side is known exactly: the
+        # shared-token string is a prefix of both combined strings
+        present = [t for t in unique if t in self.tokens]
+        token_ids = self._postings(self.tokens, present)
+        weights = np.repeat([len(t) + 1 for t in present], [len(self.tokens[t]) for t in present])
+        by_id = np.argsort(token_ids, kind='stable')
+        token_ids = token_ids[by_id]
+        firsts = np.flatnonzero(np.diff(token_ids, prepend=-1) > 0)
+        sharing = token_ids[firsts]
+        shared = np.add.reduceat(weights[by_id], firsts) - 1 if len(firsts) else np.zeros(0)
+        overlap = 200 * shared / (shared + np.minimum(self.set_lengths[sharing], set_length))
+        coarse.append(sharing[overlap >= floor])
+
+        candidates = np.sort(np.concatenate(coarse))
+        candidates = candidates[np.diff(candidates, prepend=-1) > 0]
+        if not len(candidates):
+            return none
+        overlaps = np.zeros(len(candidates))
+        positions = np.minimum(np.searchsorted(sharing, candidates), max(len(sharing) - 1, 0))
+        shares_token = sharing[positions] == candidates if len(sharing) else np.zeros(len(candidates), dtype=bool)
+        overlaps[shares_token] = overlap[positions[shares_token]]
+
+        # Finer bounds for the survivors: matching characters are also limited by the
+        # characters the two strings have in common
+        sort_string = ' '.join(processed)
+        matching = np.minimum(self.char_counts[candidates], _char_counts(sort_string).astype(np.uint16))
+        other_pairs = 200 * matching.sum(axis=1, dtype=np.int32) / (self.set_lengths[candidates] + set_length)
+        keep = np.maximum(overlaps, other_pairs) >= floor
+        candidates, shares_token, overlaps, other_pairs = (
+            candidates[keep], shares_token[keep], overlaps[keep], other_pairs[keep])
+        if not len(candidates):
+            return none
+        if len(sort_string) <= _LCS_WORD:
+            # The token sort ratio is bounded by the LCS of the sorted strings, and so is the
+            # token set ratio of entries sharing no token, whose combined strings are then
+            # the sorted token sets
+            sort_bound = self._lcs_ratios(sort_string.encode('ascii'), candidates)
+            set_string = ' '.join(unique)
+            if set_string == sort_string and not np.isin(candidates, self.repeated).any():
+                set_bound = sort_bound
+            else:
+                set_bound = self._lcs_ratios(set_string.encode('ascii'), candidates, token_sets=True)
+            other_pairs = np.maximum(sort_bound, np.where(shares_token, other_pairs, set_bound))
+        limits = np.floor(np.maximum(overlaps, other_pairs) + 0.5 + 1e-9)
+        keep = limits >= cutoff
+        return self.order[candidates[keep]], limits[keep]
+
+    def _lcs_ratios(self, pattern, candidates, token_sets=False):
+        """200 * LCS / total length of pattern against the candidates' token sort (or set) strings"""
+        starts = self.sorted_offsets[candidates]
+        lengths = self.sorted_offsets[candidates + 1] - starts
+        columns = np.arange(lengths.max())
+        present = columns < lengths[:, None]
+        texts = np.zeros(present.shape, dtype=np.uint8)
+        texts[present] = self.sorted_bytes[(starts[:, None] + columns)[present]]
+        if token_sets:
+            for row in np.flatnonzero(np.isin(candidates, self.repeated)):
+                text = self.set_strings[int(candidates[row])]
+                texts[row] = 0
+                texts[row, :len(text)] = np.frombuffer(text, dtype=np.uint8)
+                lengths[row] = len(text)
+        return 200 * lcs_lengths(pattern, texts) / (lengths + len(pattern))
+
+    def top_k(self, name, k=10, cutoff=80):
+        """The k best-scoring entries with a score of at least cutoff, best first (ties by position)"""
+        if cutoff <= 0:
+            raise ValueError("cutoff must be positive")
+        if self.matcher.normalizer_fingerprint != self.fingerprint:
+            self._build()
+        norm = self.matcher.normalize_name(name) if name else ''
+        if k <= 0 or not norm.split():
+            return []
+
+        # Candidates with an upper bound of their score, visited best bound first; an entry
+        # found by several rules comes up first with its highest bound
+        found = self._rule_candidates(norm, cutoff) + [self._fuzzy_candidates(norm, cutoff)]
+        ids = np.concatenate([np.asarray(candidates, dtype=np.intp) for candidates, _ in found])
+        limits = np.concatenate([np.broadcast_to(np.asarray(score, dtype=float), len(candidates))
+                                 for candidates, score in found])
+        order = np.lexsort((ids, -limits))
+
+        best = []  # min-heap of (score, -index)
+        seen = set()
+        for i, limit in zip(ids[order].tolist(), limits[order].tolist()):
+            if len(best) == k and (limit, -i) < best[0]:
+                break
+            if i in seen:
+                continue
+            seen.add(i)
+            score = self.matcher._score_normalized_names(norm, self.norms[i])
+            if score >= cutoff:
+                if len(best) < k:
+                    heapq.heappush(best, (score, -i))
+                elif (score, -i) > best[0]:
+                    heapq.heapreplace(best, (score, -i))
+        return [ScreeningMatch(-neg, self.names[-neg], score) for score, neg in sorted(best, reverse=True)]
@@ -0,0 +1,411 @@
+"""HTTP scoring service around KYCMatcher, built on asyncio with no extra dependencies.
+
+Endpoints (JSON in, JSON out; HTTP/1.1 keep-alive):
+    POST /compare        {"doc_a": {...}, "doc_b": {...}}  -> compare_documents result
+    POST /compare/bulk   {"pairs": [{"doc_a": ..., "doc_b": ...}, ...]}  -> {"results": [...]}
+                         (a pair that fails to score gets {"error": ...} in its place)
+    POST /compare/set    {"documents": {"aadhaar": {...}, "pan": {...}, ...}, "threshold": 70}
+                         -> compare_document_set result for one applicant
+    GET  /stats          request counts, p50/p99 latency and micro-batch sizes
+    GET  /health
+
+Repeated pairs (client retries, re-screening) can be answered from a result cache kept
+in the server process, in memory or in a SQLite file (--result-cache-size/-ttl/-path).
+
+Concurrent /compare requests are grouped into micro-batches (up to --max-batch-size
+pairs, waiting at most --max-wait-ms for the batch to fill) and scored in a process
+pool, so fuzzy matching never runs on the event loop.
+
+    python service.py --port 8080 --workers 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from caching import DiskCache, TTLCache
+from result_cache import ResultCache
+from kyc_matcher import KYCMatcher
+
+FIELDS = ('Name', 'Address', 'DOB', 'Gender')
+MAX_BODY_BYTES = 8 * 2 ** 20
+MAX_HEADER_BYTES = 64 * 2 ** 10
+MAX_SET_DOCUMENTS = 50
+IDLE_TIMEOUT_SECONDS = 30
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# Matcher owned by each pool worker, built once in _init_worker
+_matcher = None
+
+# Stands in for the result of a pair that failed to score, so the rest of its batch still succeeds
+PairError = namedtuple('PairError', 'message')
+
+
+def _init_worker(cache_size):
+    global _matcher
+    _matcher = KYCMatcher(cache_size=cache_size)
+
+
+def score_pairs(pairs):
+    """Score (doc_a, doc_b) tuples with this process's matcher; a pair that raises gets a PairError"""
+    if _matcher is None:
+        _init_worker(65536)
+    results = []
+    for doc_a, doc_b in pairs:
+        try:
+            results.append(_matcher.compare_documents(doc_a, doc_b))
+        except Exception as e:
+            results.append(PairError(f"{type(e).__name__}: {e}"))
+    return results
+
+
+def score_document_set(documents, threshold):
+    """compare_document_set with this process's matcher"""
+    if _matcher is None:
+        _init_worker(65536)
+    return _matcher.compare_document_set(documents, threshold)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def parse_pair(payload):
+    """Validate a {"doc_a": {...}, "doc_b": {...}} object and return (doc_a, doc_b)"""
+    if not isinstance(payload, dict):
+        raise HTTPError(400, "Each pair must be a JSON object with doc_a and doc_b")
+    return tuple(parse_document(payload.get(key), key) for key in ('doc_a', 'doc_b'))
+
+
+def parse_document(doc, key):
+    """Validate one document object and return it with every field as a string"""
+    if not isinstance(doc, dict):
+        raise HTTPError(400, f"{key} must be a JSON object")
+    cleaned = {}
+    for field in FIELDS:
+        value = doc.get(field)
+        if value is None:
+            value = ''
+        if not isinstance(value, str):
+            raise HTTPError(400, f"{key}.{field} must be a string")
+        cleaned[field] = value
+    return cleaned
+
+
+def parse_document_set(payload):
+    """Validate a {"documents": {...}, "threshold": ...} object and return (documents, threshold)"""
+    documents = payload.get('documents') if isinstance(payload, dict) else None
+    if not isinstance(documents, dict) or not documents:
+        raise HTTPError(400, "Body must be {\"documents\": {\"name\": {...}, ...}}")
+    if len(documents) > MAX_SET_DOCUMENTS:
+        raise HTTPError(400, f"At most {MAX_SET_DOCUMENTS} documents per set")
+    threshold = payload.get('threshold', 70)
+    if isinstance(threshold, bool) or not isinstance(threshold, (int, float)):
+        raise HTTPError(400, "threshold must be a number")
+    return {name: parse_document(doc, f"documents.{name}") for name, doc in documents.items()}, threshold
+
+
+class LatencyTracker:
+    """Rolling window of request latencies per endpoint"""
+
+    def __init__(self, window=10000):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    @staticmethod
+    def percentile(sorted_samples, p):
+        if not sorted_samples:
+            return 0.0
+        index = min(len(sorted_samples) - 1, int(round(p / 100 * (len(sorted_samples) - 1))))
+        return sorted_samples[index]
+
+    def summary(self):
+        summary = {}
+        for endpoint, samples in self.samples.items():
+            ordered = sorted(samples)
+            summary[endpoint] = {
+                'requests': self.counts[endpoint],
+                'p50_ms': round(self.percentile(ordered, 50) * 1000, 3),
+                'p99_ms': round(self.percentile(ordered, 99) * 1000, 3),
+                'max_ms': round(ordered[-1] * 1000, 3),
+            }
+        return summary
+
+
+class MicroBatcher:
+    """Group concurrent single-pair requests into small batches for the worker pool"""
+
+    def __init__(self, executor, max_batch_size=64, max_wait=0.002):
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.batched_pairs = 0
+        self._collector = None
+        self._in_flight = set()
+
+    def start(self):
+        self._collector = asyncio.ensure_future(self._collect())
+
+    async def stop(self):
+        if self._collector:
+            self._collector.cancel()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+
+    async def submit(self, pair):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((pair, future))
+        return await future
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                if not self.queue.empty():
+                    batch.append(self.queue.get_nowait())
+                    continue
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            task = asyncio.ensure_future(self._dispatch(batch))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch):
+        self.batches += 1
+        self.batched_pairs += len(batch)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, score_pairs, [pair for pair, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, PairError):
+                future.set_exception(HTTPError(500, result.message))
+            else:
+                future.set_result(result)
+
+
+class ScoringService:
+    """Minimal HTTP/1.1 server exposing the matcher over JSON"""
+
+    def __init__(self, workers=None, max_batch_size=64, max_wait_ms=2.0, bulk_chunk_size=500,
+                 cache_size=65536, result_cache=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.bulk_chunk_size = bulk_chunk_size
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                            initargs=(cache_size,))
+        self.batcher = MicroBatcher(self.executor, max_batch_size, max_wait_ms / 1000)
+        self.latency = LatencyTracker()
+        self.result_cache = result_cache
+        self.started = time.time()
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), IDLE_TIMEOUT_SECONDS)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._send(writer, 413, {'error': "Request headers too large"}, keep_alive=False)
+                    break
+                started = time.perf_counter()
+                keep_alive = True
+                try:
+                    method, path, version, headers = self._parse_head(head)
+                    keep_alive = self._wants_keep_alive(version, headers)
+                    body = await self._read_body(reader, headers)
+                    endpoint, status, payload = await self._route(method, path, body)
+                except HTTPError as e:
+                    endpoint, status, payload = 'error', e.status, {'error': e.message}
+                except Exception as e:
+                    endpoint, status, payload = 'error', 500, {'error': f"{type(e).__name__}: {e}"}
+                await self._send(writer, status, payload, keep_alive)
+                self.latency.record(endpoint, time.perf_counter() - started)
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _parse_head(head):
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, path, version = lines[0].split(' ', 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(':')
+                headers[name.strip().lower()] = value.strip()
+        return method.upper(), path.split('?', 1)[0], version, headers
+
+    @staticmethod
+    def _wants_keep_alive(version, headers):
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+
+    @staticmethod
+    async def _read_body(reader, headers):
+        if 'transfer-encoding' in headers:
+            raise HTTPError(411, "Chunked bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        return await reader.readexactly(length) if length else b''
+
+    async def _route(self, method, path, body):
+        if path == '/health':
+            return 'health', 200, {'status': 'ok'}
+        if path == '/stats':
+            return 'stats', 200, self.stats()
+        if path not in ('/compare', '/compare/bulk', '/compare/set'):
+            raise HTTPError(404, f"No such endpoint: {path}")
+        if method != 'POST':
+            raise HTTPError(405, f"{path} only accepts POST")
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON") from None
+
+        if path == '/compare/set':
+            documents, threshold = parse_document_set(payload)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, score_document_set, documents, threshold)
+            return 'compare_set', 200, result
+
+        if path == '/compare':
+            pair = parse_pair(payload)
+            result = self.result_cache.get(*pair) if self.result_cache else None
+            if result is None:
+                result = await self.batcher.submit(pair)
+                if self.result_cache:
+                    self.result_cache.put(*pair, result)
+            return 'compare', 200, result
+
+        pairs = payload.get('pairs') if isinstance(payload, dict) else None
+        if not isinstance(pairs, list):
+            raise HTTPError(400, "Bulk body must be {\"pairs\": [...]}")
+        pairs = [parse_pair(pair) for pair in pairs]
+        results = [self.result_cache.get(*pair) for pair in pairs] if self.result_cache else [None] * len(pairs)
+        missing = [i for i, result in enumerate(results) if result is None]
+        loop = asyncio.get_running_loop()
+        chunks = [missing[i:i + self.bulk_chunk_size] for i in range(0, len(missing), self.bulk_chunk_size)]
+        scored = await asyncio.gather(*(loop.run_in_executor(self.executor, score_pairs, [pairs[i] for i in chunk])
+                                        for chunk in chunks))
+        for chunk, chunk_results in zip(chunks, scored):
+            for i, result in zip(chunk, chunk_results):
+                if isinstance(result, PairError):
+                    results[i] = {'error': result.message}
+                    continue
+                results[i] = result
+                if self.result_cache:
+                    self.result_cache.put(*pairs[i], result)
+        return 'compare_bulk', 200, {'results': results}
+
+    @staticmethod
+    async def _send(writer, status, payload, keep_alive):
+        body = json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    def stats(self):
+        batches = self.batcher.batches
+        return {
+            'uptime_seconds': round(time.time() - self.started, 1),
+            'workers': self.workers,
+            'latency': self.latency.summary(),
+            'micro_batches': batches,
+            'mean_micro_batch_size': round(self.batcher.batched_pairs / batches, 2) if batches else 0.0,
+            'result_cache': self.result_cache.stats() if self.result_cache else None,
+        }
+
+    async def serve(self, host='127.0.0.1', port=8080):
+        self.batcher.start()
+        server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        print(f"Serving on http://{host}:{port} with {self.workers} workers", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.batcher.stop()
+            self.executor.shutdown()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Serve KYCMatcher over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1', help="bind address (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8080, help="port (default: 8080)")
+    parser.add_argument('--workers', type=int, default=None, help="scoring processes (default: CPU count)")
+    parser.add_argument('--max-batch-size', type=int, default=64, help="pairs per micro-batch (default: 64)")
+    parser.add_argument('--max-wait-ms', type=float, default=2.0,
+                        help="longest a request waits for its micro-batch to fill (default: 2)")
+    parser.add_argument('--result-cache-size', type=int, default=0,
+                        help="cache up to this many pair results (default: 0, disabled)")
+    parser.add_argument('--result-cache-ttl', type=float, default=None,
+                        help="seconds before a cached result expires (default: never)")
+    parser.add_argument('--result-cache-path', help="keep the result cache in this SQLite file instead of memory")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    result_cache = None
+    if args.result_cache_size:
+        if args.result_cache_path:
+            backend = DiskCache(args.result_cache_path, maxsize=args.result_cache_size, ttl=args.result_cache_ttl)
+        else:
+            backend = TTLCache(maxsize=args.result_cache_size, ttl=args.result_cache_ttl)
+        # Same default configuration as the workers' matchers, so the fingerprints agree
+        result_cache = ResultCache(KYCMatcher(), backend)
+    service = ScoringService(workers=args.workers, max_batch_size=args.max_batch_size,
+                             max_wait_ms=args.max_wait_ms, result_cache=result_cache)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
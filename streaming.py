@@ -0,0 +1,176 @@
+"""Bounded-memory streaming scorer for pair files larger than RAM.
+
+The pipeline is a chain of generators: records are read lazily one at a time,
+grouped into small batches, scored with KYCMatcher.compare_batch (in this process or a
+worker pool) and written out incrementally. At most max_in_flight batches exist at any
+moment, so memory use depends on the batch size and not on the file size. A record that
+cannot be scored comes out with empty scores and the exception in its error column, and
+the stream carries on. A throughput and RSS report is printed when the run finishes.
+
+    python streaming.py huge_pairs.jsonl scores.jsonl --batch-size 2000 --workers 8
+"""
+import argparse
+import csv
+import json
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from batch_runner import ResultWriter, _init_worker, detect_format, iter_jsonl_records, score_chunk
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def iter_pair_records(path, fmt=None):
+    """Yield flat pair records (Name_a, ..., Gender_b) from a pair file one at a time"""
+    fmt = fmt or detect_format(path)
+    if fmt == 'csv':
+        with open(path, newline='') as f:
+            yield from csv.DictReader(f)
+    elif fmt == 'jsonl':
+        yield from iter_jsonl_records(path)
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=1024):
+            yield from batch.to_pylist()
+
+
+def batched(records, batch_size):
+    """Group an iterable of records into lists of at most batch_size"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_scores(records, batch_size=1000, workers=1, max_in_flight=None, id_column='id',
+                  cache_size=65536):
+    """Score an iterable of flat pair records lazily, yielding one result frame per batch.
+
+    Results come out in input order. Records are only pulled from the input when fewer
+    than max_in_flight batches (default: twice the worker count) are waiting to be
+    scored or consumed, which keeps a slow consumer from letting the input run ahead.
+    """
+    max_in_flight = max_in_flight or workers * 2
+    batches = (pd.DataFrame(batch) for batch in batched(records, batch_size))
+    if workers == 1:
+        _init_worker(cache_size)
+        for frame in batches:
+            yield score_chunk(frame, id_column)
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(cache_size,)) as pool:
+        pending = deque()
+        for frame in batches:
+            pending.append(pool.submit(score_chunk, frame, id_column))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _current_rss_mb():
+    """Resident set size of this process in MB, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * resource.getpagesize() / 2 ** 20 if resource else None
+
+
+def _peak_rss_mb(who):
+    if resource is None:
+        return None
+    peak = resource.getrusage(who).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+class StreamReport:
+    """Track rows, throughput and memory of a streaming run"""
+
+    def __init__(self, workers=1):
+        self.workers = workers
+        self.started = time.perf_counter()
+        self.rows = 0
+        self.batches = 0
+        self.max_rss_mb = _current_rss_mb()
+
+    def update(self, frame):
+        self.rows += len(frame)
+        self.batches += 1
+        rss = _current_rss_mb()
+        if rss is not None:
+            self.max_rss_mb = max(self.max_rss_mb or 0, rss)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        peak = _peak_rss_mb(resource.RUSAGE_SELF) if resource else None
+        worker_peak = _peak_rss_mb(resource.RUSAGE_CHILDREN) if resource and self.workers > 1 else None
+        return {
+            'rows': self.rows,
+            'batches': self.batches,
+            'seconds': round(elapsed, 3),
+            'pairs_per_second': round(self.rows / elapsed, 1) if elapsed else 0.0,
+            'max_sampled_rss_mb': round(self.max_rss_mb, 1) if self.max_rss_mb is not None else None,
+            'peak_rss_mb': round(peak, 1) if peak is not None else None,
+            'worker_peak_rss_mb': round(worker_peak, 1) if worker_peak is not None else None,
+        }
+
+
+def run_stream(input_path, output_path, batch_size=1000, workers=1, max_in_flight=None,
+               input_format=None, output_format=None, id_column='id', cache_size=65536):
+    """Stream input_path through the scorer into output_path and return a StreamReport summary"""
+    report = StreamReport(workers)
+    records = iter_pair_records(input_path, input_format)
+    with ResultWriter(output_path, output_format) as writer:
+        for frame in stream_scores(records, batch_size=batch_size, workers=workers,
+                                   max_in_flight=max_in_flight, id_column=id_column,
+                                   cache_size=cache_size):
+            writer.write(frame)
+            report.update(frame)
+    return report.summary()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Stream KYC document pairs through the matcher in bounded memory.")
+    parser.add_argument('input', help="pair file (.csv, .parquet, .jsonl)")
+    parser.add_argument('output', help="result file (.csv, .parquet, .jsonl)")
+    parser.add_argument('--batch-size', type=int, default=1000, help="pairs per batch (default: 1000)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes (default: 1, in-process)")
+    parser.add_argument('--max-in-flight', type=int, default=None,
+                        help="batches read ahead of the writer (default: 2 x workers)")
+    parser.add_argument('--input-format', choices=('csv', 'jsonl', 'parquet'), help="override the input format")
+    parser.add_argument('--output-format', choices=('csv', 'jsonl', 'parquet'), help="override the output format")
+    parser.add_argument('--id-column', default='id', help="column copied to the output (default: id)")
+    parser.add_argument('--cache-size', type=int, default=65536,
+                        help="entries per normalization cache in each process (default: 65536)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.batch_size < 1 or args.workers < 1:
+        print("--batch-size and --workers must be positive", file=sys.stderr)
+        return 2
+    summary = run_stream(args.input, args.output, batch_size=args.batch_size, workers=args.workers,
+                         max_in_flight=args.max_in_flight, input_format=args.input_format,
+                         output_format=args.output_format, id_column=args.id_column,
+                         cache_size=args.cache_size)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,407 +1,158 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import re
-import datetime
-from fuzzywuzzy import fuzz
-from fuzzywuzzy import process
+import hashlib
 import json
-import dateutil.parser
-import string
+import os
+import tempfile
+import threading
 
-class KYCMatcher:
-    def __init__(self):
-        # Common abbreviations for addresses
-        self.address_abbreviations = {
-            'st': 'street',
-            'rd': 'road',
-            'blvd': 'boulevard',
-            'ave': 'avenue',
-            'apt': 'apartment',
-            'blk': 'block',
-            'ngr': 'nagar',
-            'sec': 'sector',
-            'fl': 'floor',
-            'apts': 'apartments',
-            # India-specific state abbreviations
-            'ka': 'karnataka',
-            'mh': 'maharashtra',
-            'up': 'uttar pradesh',
-            'ap': 'andhra pradesh',
-            'tn': 'tamil nadu',
-            'dl': 'delhi',
-            'wb': 'west bengal',
-            'gj': 'gujarat',
-            'rj': 'rajasthan',
-            'mp': 'madhya pradesh',
-            # City abbreviations
-            'blr': 'bangalore',
-            'bang': 'bangalore',
-            'hyd': 'hyderabad',
-            'mum': 'mumbai',
-            'del': 'delhi',
-            'kol': 'kolkata',
-            'chn': 'chennai',
-        }
-        
-        # Common company name transformations
-        self.company_aliases = {
-            'facebook': ['meta', 'facebook inc', 'meta platforms', 'meta platforms inc'],
-            'google': ['alphabet', 'alphabet inc', 'google inc', 'google llc'],
-            'infosys': ['infosys limited', 'infosys ltd', 'infosys technologies'],
-            'tata': ['tcs', 'tata consultancy services', 'tata sons', 'tata group'],
-            'microsoft': ['ms', 'microsoft corporation', 'msft'],
-        }
-        
-        # Common salutations to remove
-        self.salutations = ['mr', 'mrs', 'ms', 'miss', 'dr', 'prof', 'shri', 'smt']
-        
-        # Suffixes for companies
-        self.company_suffixes = ['ltd', 'limited', 'inc', 'incorporated', 'llc', 'corp', 
-                                'corporation', 'pvt', 'private', 'gmbh', 'co']
+from batch_runner import detect_format, read_pair_chunks, split_pairs
+from kyc_matcher import MATCH_CATEGORIES, KYCMatcher
 
-    def normalize_name(self, name):
-        """Normalize the name by removing salutations, extra spaces, and standardizing case"""
-        if not name:
-            return ""
-            
-        # Convert to lowercase
-        normalized = name.lower().strip()
-        
-        # Remove punctuation except periods in initials
-        normalized = re.sub(r'[^\w\s.]', ' ', normalized)
-        
-        # Remove salutations
-        words = normalized.split()
-        if words and words[0].replace('.', '') in self.salutations:
-            words = words[1:]
-        normalized = ' '.join(words)
-        
-        # Clean up extra whitespace
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        
-        return normalized
+BULK_CHUNK_SIZE = 2000
 
-    def expand_initials(self, name):
-        """Create potential variations where initials are expanded"""
-        # This is a simplified version - a real implementation would use a name database
-        return name
 
-    def normalize_address(self, address):
-        """Normalize the address by expanding abbreviations and standardizing format"""
-        if not address:
-            return ""
-            
-        # Convert to lowercase
-        normalized = address.lower().strip()
-        
-        # Remove punctuation
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
-        
-        # Expand abbreviations
-        words = normalized.split()
-        for i, word in enumerate(words):
-            if word in self.address_abbreviations:
-                words[i] = self.address_abbreviations[word]
-        normalized = ' '.join(words)
-        
-        # Clean up extra whitespace
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        
-        return normalized
+@st.cache_resource
+def load_matcher():
+    """One KYCMatcher (and its lexicons) shared by every rerun and session"""
+    return KYCMatcher()
 
-    def normalize_company_name(self, name):
-        """Normalize company names by removing legal suffixes and standardizing format"""
-        if not name:
-            return ""
-            
-        normalized = name.lower().strip()
-        normalized = re.sub(r'[^\w\s]', ' ', normalized)
-        
-        # Remove common company suffixes
-        words = normalized.split()
-        filtered_words = [word for word in words if word not in self.company_suffixes]
-        normalized = ' '.join(filtered_words)
-        
-        # Check for known company aliases
-        for main_name, aliases in self.company_aliases.items():
-            if normalized in aliases or normalized == main_name:
-                return main_name
-        
-        return normalized.strip()
 
-    def normalize_date(self, date_str):
-        """Try to parse and normalize date in YYYY-MM-DD format"""
-        if not date_str:
-            return None
-            
+@st.cache_resource
+def matcher_lock():
+    """Serializes use of the shared matcher, whose caches are not thread-safe"""
+    return threading.Lock()
+
+
+def read_uploaded_pairs(uploaded):
+    """DataFrame of the pairs in an uploaded CSV/JSONL/Parquet file"""
+    fmt = detect_format(uploaded.name)
+    fd, path = tempfile.mkstemp(suffix='.' + fmt)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(uploaded.getvalue())
+        frame = pd.concat(read_pair_chunks(path, 100000, fmt), ignore_index=True)
+    finally:
+        os.remove(path)
+    split_pairs(frame)  # fail early on missing columns
+    return frame
+
+
+class BulkScoringJob:
+    """Scores an uploaded pair file chunk by chunk in a background thread.
+
+    The thread only appends finished chunks; reruns read whatever is done so far, so
+    widget interactions never score anything again.
+    """
+
+    def __init__(self, frame, matcher, lock, chunk_size=BULK_CHUNK_SIZE):
+        self.frame = frame
+        self.matcher = matcher
+        self.lock = lock
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.scored = 0
+        self.error = None
+        self.cancelled = False
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    @property
+    def total(self):
+        return len(self.frame)
+
+    @property
+    def done(self):
+        return not self.thread.is_alive()
+
+    def _run(self):
         try:
-            # Try parsing the date
-            parsed_date = dateutil.parser.parse(date_str)
-            return parsed_date.strftime('%Y-%m-%d')
-        except:
-            # Return None if we can't parse it
-            return None
+            for start in range(0, self.total, self.chunk_size):
+                if self.cancelled:
+                    return
+                chunk = self.frame.iloc[start:start + self.chunk_size]
+                docs_a, docs_b = split_pairs(chunk)
+                with self.lock:
+                    scores = self.matcher.compare_batch(docs_a, docs_b)
+                scores.index = chunk.index
+                self.chunks.append(scores)
+                self.scored += len(chunk)
+        except Exception as e:
+            self.error = e
 
-    def get_name_similarity(self, name1, name2):
-        """Calculate name similarity score with various metrics"""
-        if not name1 or not name2:
-            return 0
-            
-        # Normalize both names
-        norm1 = self.normalize_name(name1)
-        norm2 = self.normalize_name(name2)
-        
-        # Direct comparison
-        if norm1 == norm2:
-            return 100
-        
-        # Split names into parts
-        name1_parts = norm1.split()
-        name2_parts = norm2.split()
-        
-        # Handle swapped names (e.g., "Kumar Rajeev" vs "Rajeev Kumar")
-        if set(name1_parts) == set(name2_parts):
-            return 95
-        
-        # Check for missing middle name more accurately
-        if len(name1_parts) > len(name2_parts) or len(name2_parts) > len(name1_parts):
-            # Check if last names match
-            if name1_parts[-1] == name2_parts[-1]:
-                # Check if first names match
-                if name1_parts[0] == name2_parts[0]:
-                    # It's likely a middle name difference
-                    return 80
-                
-        # Check if one name is contained within the other
-        if norm1 in norm2 or norm2 in norm1:
-            return 85
-        
-        # Initial vs full name (e.g., "S. Ramesh" vs "Subramaniam Ramesh")
-        # Extract last names
-        name1_last = name1_parts[-1] if name1_parts else ""
-        name2_last = name2_parts[-1] if name2_parts else ""
-        
-        # If last names match and one name has initials
-        if name1_last == name2_last and ('.' in norm1 or '.' in norm2):
-            # Check if initials match first letters
-            has_matching_initials = True
-            if '.' in norm1:
-                initials = [p.strip('.') for p in norm1.split() if '.' in p]
-                other_name_parts = [p[0].lower() for p in norm2.split() if p != name2_last]
-                if not all(i in other_name_parts for i in initials):
-                    has_matching_initials = False
-            elif '.' in norm2:
-                initials = [p.strip('.') for p in norm2.split() if '.' in p]
-                other_name_parts = [p[0].lower() for p in norm1.split() if p != name1_last]
-                if not all(i in other_name_parts for i in initials):
-                    has_matching_initials = False
-                    
-            if has_matching_initials:
-                return 80
-        
-        # Use fuzzy matching as a fallback
-        token_sort_ratio = fuzz.token_sort_ratio(norm1, norm2)
-        token_set_ratio = fuzz.token_set_ratio(norm1, norm2)
-        
-        return max(token_sort_ratio, token_set_ratio)
+    def results(self):
+        """Input columns joined with the scores of every pair scored so far"""
+        chunks = list(self.chunks)
+        if not chunks:
+            return pd.DataFrame()
+        scores = pd.concat(chunks)
+        return self.frame.loc[scores.index].join(scores)
 
-    def get_address_similarity(self, addr1, addr2):
-        """Calculate address similarity with component-wise comparison"""
-        if not addr1 or not addr2:
-            return 0
-            
-        # Normalize both addresses
-        norm1 = self.normalize_address(addr1)
-        norm2 = self.normalize_address(addr2)
-        
-        # Direct comparison
-        if norm1 == norm2:
-            return 100
-        
-        # Count the number of abbreviations
-        abbrev_count = 0
-        for word in self.address_abbreviations:
-            if word in addr1.lower() or word in addr2.lower():
-                abbrev_count += 1
-        
-        # Extract potential postal codes
-        postal_code1 = re.search(r'\b\d{5,6}\b', addr1)
-        postal_code2 = re.search(r'\b\d{5,6}\b', addr2)
-        
-        postal_match = 0
-        if postal_code1 and postal_code2:
-            pc1 = postal_code1.group()
-            pc2 = postal_code2.group()
-            if pc1 == pc2:
-                postal_match = 25
-            elif abs(int(pc1) - int(pc2)) <= 5:  # Nearby postal codes
-                postal_match = 15
-        
-        # Use fuzzy matching for the whole address
-        token_sort_ratio = fuzz.token_sort_ratio(norm1, norm2)
-        token_set_ratio = fuzz.token_set_ratio(norm1, norm2)
-        
-        base_score = max(token_sort_ratio, token_set_ratio)
-        
-        # Slightly reduce score based on abbreviation usage
-        if abbrev_count > 0:
-            base_score = max(base_score - (abbrev_count * 2), 0)
-        
-        # Boost score if postal codes match
-        final_score = min(100, base_score + postal_match)
-        
-        return final_score
 
-    def compare_dates(self, date1, date2):
-        """Compare two dates and return similarity score"""
-        norm_date1 = self.normalize_date(date1)
-        norm_date2 = self.normalize_date(date2)
-        
-        if not norm_date1 or not norm_date2:
-            return 0
-            
-        if norm_date1 == norm_date2:
-            return 100
-            
-        # Check for potential date format swaps (MM/DD vs DD/MM)
+def show_bulk_results(job):
+    """Progress bar, filters and table of a bulk job; reruns on its own while the job runs"""
+    if job.error is not None:
+        st.error(f"Scoring failed after {job.scored} pairs: {job.error}")
+    elif job.done:
+        st.success(f"Scored {job.scored} pairs.")
+    st.progress(job.scored / job.total if job.total else 1.0,
+                text=f"{job.scored} / {job.total} pairs scored")
+
+    table = job.results()
+    if not table.empty:
+        col1, col2 = st.columns(2)
+        with col1:
+            categories = st.multiselect("Match categories:", MATCH_CATEGORIES, default=MATCH_CATEGORIES)
+        with col2:
+            max_confidence = st.slider("Maximum overall confidence:", 0, 100, 100)
+        table = table[table['match_category'].isin(categories) & (table['overall_confidence'] <= max_confidence)]
+        st.write(f"{len(table)} pairs shown. Click a column header to sort.")
+        st.dataframe(table)
+        st.download_button("Download results (CSV)", table.to_csv(index=False), "kyc_results.csv",
+                           "text/csv", disabled=not job.done, on_click="ignore")
+
+    if job.done and st.session_state.get('bulk_job_refreshing'):
+        # The job just finished: one full rerun switches the fragment off its timer
+        st.session_state['bulk_job_refreshing'] = False
+        st.rerun()
+
+
+def bulk_upload_page(matcher):
+    st.header("Bulk Upload")
+    st.write("""
+    Upload a file of document pairs (CSV, JSONL or Parquet) with the fields suffixed by document:
+    Name_a, Address_a, DOB_a, Gender_a, Name_b, ... JSONL lines may instead nest the documents as
+    {"doc_a": {...}, "doc_b": {...}}. Pairs are scored in the background and appear as they finish.
+    """)
+
+    uploaded = st.file_uploader("Pair file:", type=["csv", "jsonl", "json", "ndjson", "parquet"])
+    if uploaded is None:
+        return
+
+    # Keyed by file content: reruns with the same upload reuse the running or finished job
+    upload_key = hashlib.sha1(uploaded.getvalue()).hexdigest()
+    job = st.session_state.get('bulk_job')
+    if st.session_state.get('bulk_job_key') != upload_key:
+        if job is not None:
+            job.cancelled = True
         try:
-            d1 = datetime.datetime.strptime(norm_date1, '%Y-%m-%d')
-            d2 = datetime.datetime.strptime(norm_date2, '%Y-%m-%d')
-            
-            # Check if month and day might be swapped
-            swapped_date2 = f"{d2.year}-{d2.day:02d}-{d2.month:02d}"
-            if norm_date1 == swapped_date2:
-                return 50  # Potential format confusion
-                
-            # Check for year difference only
-            if d1.month == d2.month and d1.day == d2.day:
-                return 50
-                
-            # Check for close dates (within 5 days)
-            delta = abs((d1 - d2).days)
-            if delta <= 5:
-                return 80
-                
-        except:
-            pass
-            
-        return 0
+            frame = read_uploaded_pairs(uploaded)
+        except Exception as e:
+            st.error(f"Could not read {uploaded.name}: {e}")
+            st.session_state['bulk_job_key'] = st.session_state['bulk_job'] = None
+            return
+        job = BulkScoringJob(frame, matcher, matcher_lock()).start()
+        st.session_state['bulk_job'] = job
+        st.session_state['bulk_job_key'] = upload_key
+        st.session_state['bulk_job_refreshing'] = True
+    if job is None:
+        return
+
+    st.fragment(show_bulk_results, run_every=None if job.done else 1.0)(job)
 
-    def compare_documents(self, doc_a, doc_b):
-        """Compare two documents and return a detailed comparison with confidence scores"""
-        results = {}
-        explanations = []
-        caution_notes = []
-        
-        # Name comparison
-        name_similarity = self.get_name_similarity(doc_a.get('Name', ''), doc_b.get('Name', ''))
-        results['name_similarity'] = name_similarity
-        
-        if name_similarity >= 95:
-            explanations.append(f"Names match with high confidence ({name_similarity}%)")
-        elif name_similarity >= 80:
-            explanations.append(f"Names are likely to match ({name_similarity}%)")
-            
-            # Check for missing middle name more explicitly
-            name1_parts = self.normalize_name(doc_a.get('Name', '')).split()
-            name2_parts = self.normalize_name(doc_b.get('Name', '')).split()
-            
-            if abs(len(name1_parts) - len(name2_parts)) > 0:
-                caution_notes.append("Middle name discrepancy detected")
-                
-        elif name_similarity >= 60:
-            explanations.append(f"Names have some similarity ({name_similarity}%)")
-        else:
-            explanations.append(f"Names differ significantly ({name_similarity}%)")
-        
-        # Address comparison
-        address_similarity = self.get_address_similarity(doc_a.get('Address', ''), doc_b.get('Address', ''))
-        results['address_similarity'] = address_similarity
-        
-        if address_similarity >= 95:
-            explanations.append(f"Addresses match with high confidence ({address_similarity}%)")
-        elif address_similarity >= 80:
-            explanations.append(f"Addresses are likely to match ({address_similarity}%)")
-        elif address_similarity >= 60:
-            explanations.append(f"Addresses have some similarity ({address_similarity}%)")
-        else:
-            explanations.append(f"Addresses differ significantly ({address_similarity}%)")
-        
-        # DOB comparison
-        dob_similarity = self.compare_dates(doc_a.get('DOB', ''), doc_b.get('DOB', ''))
-        results['dob_similarity'] = dob_similarity
-        
-        if dob_similarity == 100:
-            explanations.append("DOB matches exactly")
-        elif dob_similarity == 50:
-            explanations.append("Possible DOB format confusion (MM/DD vs DD/MM)")
-            caution_notes.append("DOB ambiguity: possible MM/DD vs DD/MM format confusion")
-        elif dob_similarity > 0:
-            explanations.append(f"DOB has some similarity ({dob_similarity}%)")
-        else:
-            explanations.append("DOB does not match")
-        
-        # Gender comparison
-        gender_match = 100 if doc_a.get('Gender', '').lower() == doc_b.get('Gender', '').lower() else 0
-        results['gender_match'] = gender_match
-        
-        if gender_match == 100:
-            explanations.append("Gender matches")
-        else:
-            explanations.append("Gender does not match")
-        
-        # Calculate overall confidence score with weighted factors
-        # Names and addresses are most important, followed by DOB and gender
-        overall_confidence = (
-            name_similarity * 0.4 +
-            address_similarity * 0.3 +
-            dob_similarity * 0.2 +
-            gender_match * 0.1
-        )
-        
-        # Adjust confidence based on critical mismatches
-        if name_similarity < 50 or address_similarity < 40:
-            overall_confidence *= 0.7  # Major penalty for significant mismatches
-        
-        if gender_match == 0 and doc_a.get('Gender') and doc_b.get('Gender'):
-            overall_confidence *= 0.8  # Penalty for gender mismatch
-            
-        # Apply stronger penalty for DOB issues as this is critical for identification
-        if dob_similarity == 50:  # This is the MM/DD vs DD/MM case
-            overall_confidence *= 0.7  # Stronger penalty for date format ambiguity
-            
-        if dob_similarity == 0 and doc_a.get('DOB') and doc_b.get('DOB'):
-            overall_confidence *= 0.7  # Stronger penalty for complete DOB mismatch
-        
-        # Special handling for Case 12 type scenarios (missing middle name + DOB format issue)
-        if caution_notes and dob_similarity == 50:
-            overall_confidence = min(overall_confidence, 70)  # Cap at medium confidence
-                
-        # Determine match category
-        match_category = "No match"
-        if overall_confidence >= 90:
-            match_category = "High confidence match"
-        elif overall_confidence >= 70:
-            match_category = "Medium-to-high confidence match"
-        elif overall_confidence >= 50:
-            if caution_notes:
-                match_category = "Medium confidence match with caution"
-            else:
-                match_category = "Medium confidence match"
-        elif overall_confidence >= 30:
-            match_category = "Low-to-medium confidence match"
-        
-        # Add caution notes to explanations if present
-        if caution_notes:
-            explanations.append("CAUTION: " + "; ".join(caution_notes))
-        
-        return {
-            'detailed_scores': results,
-            'overall_confidence': round(overall_confidence, 2),
-            'match_category': match_category,
-            'explanations': explanations
-        }
 
 # Streamlit app
 def main():
@@ -414,7 +165,12 @@ def main():
     for why documents are considered matching or non-matching.
     """)
     
-    matcher = KYCMatcher()
+    matcher = load_matcher()
+    
+    mode = st.sidebar.radio("Mode:", ["Single Comparison", "Bulk Upload"])
+    if mode == "Bulk Upload":
+        bulk_upload_page(matcher)
+        return
     
     st.header("Document Comparison")
     
@@ -544,7 +300,8 @@ def main():
     # Process comparison when button is clicked
     if st.button("Compare Documents"):
         if (doc_a.get("Name") or doc_a.get("Address")) and (doc_b.get("Name") or doc_b.get("Address")):
-            results = matcher.compare_documents(doc_a, doc_b)
+            with matcher_lock():
+                results = matcher.compare_documents(doc_a, doc_b)
             
             st.header("Comparison Results")
             
@@ -596,4 +353,4 @@ def main():
             st.error("Please enter at least name or address information for both documents.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,171 @@
+import random
+
+# Name and place lists for realistic Indian KYC records
+MALE_FIRST_NAMES = ['Rajeev', 'Sunil', 'Ashok', 'Ramesh', 'Vikram', 'Arun', 'Suresh', 'Manoj', 'Anil',
+                    'Rahul', 'Sanjay', 'Deepak', 'Prakash', 'Naveen', 'Harish', 'Ganesh', 'Kiran',
+                    'Mahesh', 'Rakesh', 'Subramaniam', 'Venkatesh', 'Arjun', 'Siddharth', 'Imran']
+FEMALE_FIRST_NAMES = ['Anita', 'Priya', 'Sunita', 'Kavita', 'Lakshmi', 'Meena', 'Pooja', 'Neha',
+                      'Divya', 'Shalini', 'Rekha', 'Asha', 'Geeta', 'Radha', 'Sneha', 'Swati',
+                      'Aishwarya', 'Deepa', 'Farah', 'Nandini']
+MIDDLE_NAMES = ['Kumar', 'Prasad', 'Rani', 'Devi', 'Lal', 'Chandra', 'Mohan', 'Raj', 'Nath', 'Bala']
+SURNAMES = ['Sharma', 'Mehta', 'Kumar', 'Nair', 'Iyer', 'Reddy', 'Patel', 'Gupta', 'Singh', 'Rao',
+            'Menon', 'Joshi', 'Verma', 'Das', 'Pillai', 'Chatterjee', 'Desai', 'Kulkarni', 'Shah',
+            'Bhat', 'Mishra', 'Agarwal', 'Naidu', 'Khan']
+MALE_SALUTATIONS = ['Mr.', 'Dr.', 'Shri', 'Prof.']
+FEMALE_SALUTATIONS = ['Mrs.', 'Ms.', 'Smt.', 'Dr.', 'Miss']
+
+# (city, state, first three pincode digits, localities)
+CITIES = [
+    ('Bangalore', 'Karnataka', '560', ['Koramangala', 'Indiranagar', 'Jayanagar', 'Rajaji Nagar']),
+    ('Mumbai', 'Maharashtra', '400', ['Andheri', 'Vashi', 'Dadar', 'Borivali']),
+    ('Delhi', 'Delhi', '110', ['Shakti Nagar', 'Malviya Nagar', 'Lajpat Nagar', 'Dwarka']),
+    ('Chennai', 'Tamil Nadu', '600', ['Anna Nagar', 'T Nagar', 'Adyar', 'Velachery']),
+    ('Hyderabad', 'Andhra Pradesh', '500', ['Banjara Hills', 'Ameerpet', 'Kukatpally']),
+    ('Kolkata', 'West Bengal', '700', ['Salt Lake', 'Ballygunge', 'Behala']),
+    ('Ahmedabad', 'Gujarat', '380', ['Navrangpura', 'Satellite', 'Maninagar']),
+    ('Jaipur', 'Rajasthan', '302', ['Malviya Nagar', 'Vaishali Nagar', 'Mansarovar']),
+    ('Lucknow', 'Uttar Pradesh', '226', ['Gomti Nagar', 'Aliganj', 'Hazratganj']),
+    ('Bhopal', 'Madhya Pradesh', '462', ['Arera Colony', 'Kolar Road', 'Shahpura']),
+]
+STREET_NAMES = ['MG', 'Station', 'Church', 'Temple', 'Lake', 'Park', 'Nehru', 'Gandhi', 'Residency', 'Hill']
+STREET_TYPES = ['Road', 'Street', 'Avenue']
+BUILDING_NAMES = ['Ashirwad', 'Shanti', 'Sai Krupa', 'Green Park', 'Lotus', 'Sunrise', 'Gokul']
+
+DOB_FORMATS = ('{d:02d}/{m:02d}/{y}', '{d:02d}-{m:02d}-{y}', '{y}-{m:02d}-{d:02d}')
+
+# Mismatch families; 'different_person' pairs are true non-matches
+FAMILIES = ('exact', 'middle_name', 'swapped_order', 'initials', 'address_abbreviation', 'dob_swap',
+            'postal_drift', 'mixed', 'different_person')
+
+
+class KYCPairGenerator:
+    """Seeded generator of synthetic KYC document pairs covering the known mismatch families.
+
+    Address abbreviations are drawn from the matcher's own address_abbreviations table, so
+    pairs exercise exactly the expansions the matcher knows about.
+    """
+
+    def __init__(self, address_abbreviations, seed=0, family_weights=None):
+        self.random = random.Random(seed)
+        self.family_weights = family_weights or {family: 1 for family in FAMILIES}
+        # Reverse the expansion table: full word(s) -> every abbreviation that expands to them
+        self.abbreviations = {}
+        for short, full in address_abbreviations.items():
+            self.abbreviations.setdefault(full, []).append(short)
+
+    def person(self):
+        """Return a fresh random identity as a dict of name parts, address parts and DOB"""
+        rnd = self.random
+        gender = rnd.choice(['Male', 'Female'])
+        first = rnd.choice(MALE_FIRST_NAMES if gender == 'Male' else FEMALE_FIRST_NAMES)
+        city, state, pin_prefix, localities = rnd.choice(CITIES)
+        return {
+            'first': first,
+            'middle': rnd.choice(MIDDLE_NAMES) if rnd.random() < 0.6 else None,
+            'last': rnd.choice(SURNAMES),
+            'gender': gender,
+            'house': str(rnd.randint(1, 999)),
+            'building': f"{rnd.choice(BUILDING_NAMES)} Apartments" if rnd.random() < 0.5 else None,
+            'unit': rnd.choice([None, None, f"Block {rnd.randint(1, 9)}", f"Sector {rnd.randint(1, 40)}",
+                                f"Floor {rnd.randint(1, 12)}"]),
+            'street': f"{rnd.choice(STREET_NAMES)} {rnd.choice(STREET_TYPES)}",
+            'locality': rnd.choice(localities),
+            'city': city,
+            'state': state,
+            'pincode': f"{pin_prefix}{rnd.randint(1, 99):03d}",
+            'dob': (rnd.randint(1940, 2004), rnd.randint(1, 12), rnd.randint(1, 28)),
+        }
+
+    def document(self, person, name=None, address=None, dob=None):
+        """Render a person as a KYC document dict, optionally overriding fields"""
+        rnd = self.random
+        if name is None:
+            parts = [person['first'], person['middle'], person['last']]
+            name = ' '.join(p for p in parts if p)
+            if rnd.random() < 0.2:
+                salutations = MALE_SALUTATIONS if person['gender'] == 'Male' else FEMALE_SALUTATIONS
+                name = f"{rnd.choice(salutations)} {name}"
+        if address is None:
+            address = self.address(person)
+        if dob is None:
+            y, m, d = person['dob']
+            dob = rnd.choice(DOB_FORMATS).format(d=d, m=m, y=y)
+        return {'Name': name, 'Address': address, 'DOB': dob, 'Gender': person['gender']}
+
+    def address(self, person, abbreviate=False, pincode=None):
+        parts = [person['house'], person['building'], person['unit'], person['street'], person['locality'],
+                 person['city'], person['state'], pincode or person['pincode']]
+        address = ', '.join(p for p in parts if p)
+        return self.abbreviate(address) if abbreviate else address
+
+    def abbreviate(self, address):
+        """Replace known words (e.g. 'Road', 'Karnataka', 'Bangalore') with random abbreviations"""
+        rnd = self.random
+        # Longest expansions first so 'Uttar Pradesh' is replaced before 'Pradesh' could be
+        for full in sorted(self.abbreviations, key=len, reverse=True):
+            target = full.title()
+            if target in address and rnd.random() < 0.8:
+                short = rnd.choice(self.abbreviations[full])
+                address = address.replace(target, rnd.choice([short.upper(), short.title() + '.']))
+        return address
+
+    def initials_name(self, person):
+        rnd = self.random
+        initials = [person['first'][0] + '.']
+        if person['middle']:
+            initials.append(person['middle'][0] + '.')
+        name = ' '.join(initials + [person['last']])
+        if rnd.random() < 0.5:
+            salutations = MALE_SALUTATIONS if person['gender'] == 'Male' else FEMALE_SALUTATIONS
+            name = f"{rnd.choice(salutations)} {name}"
+        return name
+
+    def pair(self, family):
+        """Return (doc_a, doc_b) for a mismatch family"""
+        rnd = self.random
+        person = self.person()
+        if family == 'middle_name' and not person['middle']:
+            person['middle'] = rnd.choice(MIDDLE_NAMES)
+        if family in ('dob_swap', 'mixed'):
+            # Keep the day a valid month so the DD/MM swap is readable both ways
+            y, m, d = person['dob']
+            person['dob'] = (y, m, rnd.randint(1, 12))
+        doc_a = self.document(person)
+
+        if family == 'exact':
+            doc_b = dict(doc_a)
+        elif family == 'middle_name':
+            doc_b = self.document(person, name=f"{person['first']} {person['last']}")
+        elif family == 'swapped_order':
+            doc_b = self.document(person, name=f"{person['last']} {person['first']}")
+            doc_a = self.document(person, name=f"{person['first']} {person['last']}")
+        elif family == 'initials':
+            doc_b = self.document(person, name=self.initials_name(person))
+        elif family == 'address_abbreviation':
+            doc_b = self.document(person, address=self.address(person, abbreviate=True))
+        elif family == 'dob_swap':
+            y, m, d = person['dob']
+            doc_a = self.document(person, dob=f"{d:02d}/{m:02d}/{y}")
+            doc_b = self.document(person, dob=f"{m:02d}/{d:02d}/{y}")
+        elif family == 'postal_drift':
+            drifted = f"{int(person['pincode']) + rnd.choice([-5, -3, -1, 1, 2, 4, 5]):06d}"
+            doc_b = self.document(person, address=self.address(person, pincode=drifted))
+        elif family == 'mixed':
+            y, m, d = person['dob']
+            doc_b = self.document(person, name=self.initials_name(person),
+                                  address=self.address(person, abbreviate=True),
+                                  dob=f"{m:02d}-{d:02d}-{y}" if rnd.random() < 0.5 else None)
+        elif family == 'different_person':
+            doc_b = self.document(self.person())
+        else:
+            raise ValueError(f"Unknown mismatch family: {family}")
+        return doc_a, doc_b
+
+    def pairs(self, n):
+        """Yield n dicts with doc_a, doc_b, the mismatch family and whether the pair is a true match"""
+        families = list(self.family_weights)
+        weights = [self.family_weights[f] for f in families]
+        for _ in range(n):
+            family = self.random.choices(families, weights)[0]
+            doc_a, doc_b = self.pair(family)
+            yield {'doc_a': doc_a, 'doc_b': doc_b, 'family': family, 'is_match': family != 'different_person'}
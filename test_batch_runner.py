@@ -0,0 +1,40 @@
+"""A pair that fails to score must not stop a file run.
+
+    python -m unittest test_batch_runner
+"""
+import unittest
+
+import pandas as pd
+
+import batch_runner
+
+PAIRS = pd.DataFrame({
+    'id': ['a', 'b', 'c'],
+    'Name_a': ['Anita Sharma', 'Mr.', 'Rajeev Kumar'],
+    'Address_a': ['123 MG Road, Bangalore'] * 3,
+    'DOB_a': ['15/08/1985'] * 3,
+    'Gender_a': ['F', 'F', 'M'],
+    'Name_b': ['Anita R. Sharma', 'Anita Sharma', 'Kumar Rajeev'],
+    'Address_b': ['123 MG Rd, Bangalore'] * 3,
+    'DOB_b': ['1985-08-15'] * 3,
+    'Gender_b': ['F', 'F', 'M'],
+})
+
+
+class PoisonedRowTest(unittest.TestCase):
+
+    def test_only_the_failing_row_loses_its_scores(self):
+        scores = batch_runner.score_chunk(PAIRS)
+        self.assertEqual(list(scores['id']), ['a', 'b', 'c'])
+        self.assertEqual(list(scores['error'][[0, 2]]), ['', ''])
+        self.assertIn('IndexError', scores['error'][1])
+        self.assertTrue(scores.loc[1, list(batch_runner.SCORE_COLUMNS)].isna().all())
+
+        clean = batch_runner.score_chunk(PAIRS.drop(index=1).reset_index(drop=True))
+        columns = list(batch_runner.SCORE_COLUMNS)
+        self.assertEqual(scores.loc[[0, 2], columns].values.tolist(), clean[columns].values.tolist())
+        self.assertEqual(list(clean['error']), ['', ''])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+"""Shards with unscorable pairs still finish; shards that cannot be processed fail instead of
+blocking the job; a job directory is only resumed with the job's own input and settings.
+
+    python -m unittest test_jobs
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+import jobs
+
+GOOD = {'Name_a': 'Anita Sharma', 'DOB_a': '15/08/1985', 'Name_b': 'Anita R. Sharma', 'DOB_b': '1985-08-15'}
+
+
+class JobFailureTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.job_dir = os.path.join(self.directory, 'job')
+        self.input = os.path.join(self.directory, 'pairs.csv')
+        records = [dict(GOOD, id=str(i)) for i in range(6)]
+        records[4]['Name_a'] = 'Mr.'
+        pd.DataFrame(records).to_csv(self.input, index=False)
+        self.assertEqual(jobs.init_job(self.input, self.job_dir, shard_size=3, chunk_size=2), 2)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_unscorable_pair_keeps_its_row(self):
+        self.assertEqual(jobs.work(self.job_dir), 2)
+        status = jobs.job_status(self.job_dir)
+        self.assertEqual(status['done']['shards'], 2)
+        self.assertEqual(status['error_rows'], 1)
+
+        output = os.path.join(self.directory, 'scores.csv')
+        self.assertEqual(jobs.merge_job(self.job_dir, output), 6)
+        scores = pd.read_csv(output, dtype=str, keep_default_na=False)
+        self.assertEqual(list(scores['id']), [str(i) for i in range(6)])
+        self.assertIn('IndexError', scores['error'][4])
+        self.assertEqual(scores['name_similarity'][4], '')
+
+    def test_broken_shard_fails_after_max_attempts(self):
+        with open(jobs._shard_path(self.job_dir, 'inputs', 1), 'wb') as f:
+            f.write(b'not a pickle')
+        self.assertEqual(jobs.work(self.job_dir), 1)
+        status = jobs.job_status(self.job_dir)
+        self.assertEqual(status['failed']['shards'], 1)
+        self.assertIn('UnpicklingError', status['failed_shards'][1])
+        self.assertEqual(status['pending']['shards'] + status['running']['shards'], 0)
+        with self.assertRaisesRegex(RuntimeError, 'shard 1'):
+            jobs.merge_job(self.job_dir, os.path.join(self.directory, 'scores.csv'))
+
+    def test_resume_with_other_settings_is_refused(self):
+        self.assertEqual(jobs.init_job(self.input, self.job_dir, shard_size=3, chunk_size=2), 2)
+        other = os.path.join(self.directory, 'other.csv')
+        shutil.copy(self.input, other)
+        with self.assertRaisesRegex(ValueError, 'other.csv'):
+            jobs.init_job(other, self.job_dir, shard_size=3, chunk_size=2)
+        with self.assertRaisesRegex(ValueError, 'shard_size'):
+            jobs.init_job(self.input, self.job_dir, shard_size=4, chunk_size=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+"""A pair that fails to score must not fail the other requests batched with it.
+
+    python -m unittest test_service
+"""
+import asyncio
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import service
+
+VALID = {
+    'doc_a': {'Name': 'Anita Sharma', 'Address': '123 MG Road, Bangalore', 'DOB': '15/08/1985', 'Gender': 'F'},
+    'doc_b': {'Name': 'Anita R. Sharma', 'Address': '123 MG Rd, Bangalore', 'DOB': '1985-08-15', 'Gender': 'F'},
+}
+# "Mr." normalizes to an empty name, which compare_documents cannot score
+POISONED = {'doc_a': {'Name': 'Mr.'}, 'doc_b': {'Name': 'Anita Sharma'}}
+
+
+class PoisonedPairTest(unittest.TestCase):
+
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_score_pairs_marks_only_the_failing_pair(self):
+        results = service.score_pairs([service.parse_pair(VALID), service.parse_pair(POISONED)])
+        self.assertEqual(results[0]['match_category'], "High confidence match")
+        self.assertIsInstance(results[1], service.PairError)
+
+    def test_micro_batch_with_a_poisoned_request(self):
+        async def run():
+            batcher = service.MicroBatcher(self.executor, max_batch_size=64, max_wait=0.05)
+            batcher.start()
+            try:
+                payloads = [VALID] * 5 + [POISONED]
+                return await asyncio.gather(*(batcher.submit(service.parse_pair(p)) for p in payloads),
+                                            return_exceptions=True), batcher.batches
+            finally:
+                await batcher.stop()
+
+        results, batches = asyncio.run(run())
+        self.assertEqual(batches, 1)
+        for result in results[:5]:
+            self.assertEqual(result['match_category'], "High confidence match")
+        self.assertIsInstance(results[5], service.HTTPError)
+        self.assertEqual(results[5].status, 500)
+
+    def test_bulk_request_with_a_poisoned_pair(self):
+        scoring = service.ScoringService(workers=1)
+        scoring.executor.shutdown()
+        scoring.executor = self.executor
+        body = json.dumps({'pairs': [VALID, POISONED, VALID]}).encode()
+        _, status, payload = asyncio.run(scoring._route('POST', '/compare/bulk', body))
+        self.assertEqual(status, 200)
+        results = payload['results']
+        self.assertEqual(results[0], results[2])
+        self.assertEqual(results[0]['match_category'], "High confidence match")
+        self.assertIn('IndexError', results[1]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+"""A record that fails to score must not end the stream.
+
+    python -m unittest test_streaming
+"""
+import unittest
+
+import pandas as pd
+
+import streaming
+
+GOOD = {'Name_a': 'Anita Sharma', 'DOB_a': '15/08/1985', 'Name_b': 'Anita R. Sharma', 'DOB_b': '1985-08-15'}
+POISONED = dict(GOOD, Name_a='Mr.')
+
+
+class PoisonedRecordTest(unittest.TestCase):
+
+    def check(self, workers):
+        records = [dict(GOOD, id=str(i)) for i in range(7)]
+        records[3] = dict(POISONED, id='3')
+        frames = list(streaming.stream_scores(iter(records), batch_size=2, workers=workers))
+        scores = pd.concat(frames, ignore_index=True)
+        self.assertEqual(list(scores['id']), [str(i) for i in range(7)])
+        errors = list(scores['error'])
+        self.assertIn('IndexError', errors.pop(3))
+        self.assertEqual(errors, [''] * 6)
+        self.assertEqual(scores['match_category'].drop(index=3).nunique(), 1)
+
+    def test_in_process(self):
+        self.check(workers=1)
+
+    def test_worker_pool(self):
+        self.check(workers=2)
+
+
+if __name__ == '__main__':
+    unittest.main()